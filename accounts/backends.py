@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .users import with_email
+
+
+class EmailBackend(ModelBackend):
+    """Authenticate with email and password, matching the email case-insensitively"""
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        user = with_email(email).order_by('pk').first()
+        if user is None:
+            # Run the hasher anyway so a missing account takes as long as a wrong password
+            get_user_model()().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
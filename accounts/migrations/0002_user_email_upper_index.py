@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 14:40
+
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+INDEX_NAME = 'auth_user_email_upper_idx'
+
+
+def _index():
+    return models.Index(Upper('email'), name=INDEX_NAME)
+
+
+def add_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('auth', 'User'), _index())
+
+
+def remove_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), _index())
+
+
+# auth.User belongs to django.contrib.auth, so its UPPER(email) index (used by
+# accounts.backends.EmailBackend) is created here instead of in a model Meta
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
@@ -0,0 +1,51 @@
+"""
+Email lookups and username allocation for sign-up and login.
+
+Emails are compared case-insensitively as UPPER(email), the expression
+indexed by auth_user_email_upper_idx (accounts migration 0002), so
+lookups stay index scans. allocate_username() finds a free username with
+one aggregate over the base name's existing suffixes instead of probing
+base1, base2, ... one query at a time.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.db.models import Case, Count, IntegerField, Max, Q, Value, When
+from django.db.models.functions import Cast, Substr, Upper
+
+MAX_SUFFIX_DIGITS = 9  # keeps the cast suffix inside an integer column
+USERNAME_BASE_LENGTH = 150 - MAX_SUFFIX_DIGITS
+
+
+def with_email(email):
+    """Users whose email matches, ignoring case"""
+    User = get_user_model()
+    return User._default_manager.annotate(email_upper=Upper('email')).filter(email_upper=email.upper())
+
+
+def username_base(email):
+    """The part of an email a new username is built from"""
+    base = re.sub(r'[^\w.@+-]', '', email.split('@')[0])[:USERNAME_BASE_LENGTH]
+    return base or 'user'
+
+
+def allocate_username(base):
+    """`base` if it is free, otherwise base + one more than the highest numeric suffix in use"""
+    User = get_user_model()
+    suffixed = Q(username__regex=rf'^{re.escape(base)}[0-9]{{1,{MAX_SUFFIX_DIGITS}}}$')
+    taken = (
+        User._default_manager
+        .filter(username__startswith=base)  # range scan on the username index
+        .filter(Q(username=base) | suffixed)
+        .aggregate(
+            base_taken=Count('pk', filter=Q(username=base)),
+            # CASE keeps the bare base name out of the integer cast
+            top=Max(Case(
+                When(username=base, then=Value(0)),
+                default=Cast(Substr('username', len(base) + 1), IntegerField()),
+            )),
+        )
+    )
+    if not taken['base_taken']:
+        return base
+    return f'{base}{taken["top"] + 1}'
@@ -3,12 +3,13 @@ from django.contrib.auth import login as auth_login, logout as auth_logout, auth
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.mail import send_mail
+from django.db import transaction
 from django.urls import reverse
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth.tokens import default_token_generator
-from django.conf import settings
+from notifications.outbox import enqueue
+from .users import allocate_username, username_base, with_email
 
 def login(request):
     if request.user.is_authenticated:
@@ -19,8 +20,7 @@ def login(request):
         password = request.POST.get('password', '').strip()
         
         try:
-            user = User.objects.get(email=email)
-            user = authenticate(request, username=user.username, password=password)
+            user = authenticate(request, email=email, password=password)
             
             if user is not None:
                 if user.is_active:
@@ -29,10 +29,10 @@ def login(request):
                     return redirect('dashboard')
                 else:
                     messages.error(request, 'Your account is not active. Please verify your email.')
+            elif not with_email(email).exists():
+                messages.error(request, 'No account found with this email.')
             else:
                 messages.error(request, 'Invalid email or password.')
-        except User.DoesNotExist:
-            messages.error(request, 'No account found with this email.')
         except Exception as e:
             messages.error(request, f'Login error: {str(e)}')
     
@@ -50,18 +50,17 @@ def register(request):
             return redirect('register')
         
         # Check if user already exists
-        if User.objects.filter(email=email).exists():
-            user = User.objects.get(email=email)
-            
+        user = with_email(email).order_by('pk').first()
+        if user is not None:
             # Generate and send magic link again
             token = default_token_generator.make_token(user)
             uid = urlsafe_base64_encode(force_bytes(user.pk))
             magic_link = f"{request.build_absolute_uri(reverse('verify_email', kwargs={'uidb64': uid, 'token': token}))}"
             
             try:
-                send_mail(
+                enqueue(
                     subject='Your Campus Find Magic Link',
-                    message=f'''Hello,
+                    body=f'''Hello,
 
 Click the link below to verify your email and access your dashboard:
 
@@ -71,9 +70,7 @@ This link will expire in 24 hours.
 
 Best regards,
 Campus Find Team''',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[email],
-                    fail_silently=False,
+                    recipients=[email],
                 )
                 messages.success(request, 'Magic link sent to your email!')
                 return redirect('register')
@@ -83,33 +80,24 @@ Campus Find Team''',
         
         # Create new user with email as username
         try:
-            username = email.split('@')[0]
-            # Ensure unique username
-            base_username = username
-            counter = 1
-            while User.objects.filter(username=username).exists():
-                username = f"{base_username}{counter}"
-                counter += 1
-            
-            user = User.objects.create_user(username=username, email=email)
-            user.is_active = False  # Deactivate until email is verified
-            user.save()
-        except Exception as e:
-            messages.error(request, 'Error creating account. Please try again.')
-            return redirect('register')
-        
-        # Generate magic link token
-        token = default_token_generator.make_token(user)
-        uid = urlsafe_base64_encode(force_bytes(user.pk))
-        
-        # Create magic link
-        magic_link = f"{request.build_absolute_uri(reverse('verify_email', kwargs={'uidb64': uid, 'token': token}))}"
-        
-        # Send email with magic link
-        try:
-            send_mail(
-                subject='Your Campus Find Magic Link',
-                message=f'''Hello,
+            with transaction.atomic():
+                # One query, however many users share the base name
+                username = allocate_username(username_base(email))
+                user = User.objects.create_user(username=username, email=email)
+                user.is_active = False  # Deactivate until email is verified
+                user.save()
+                
+                # Generate magic link token
+                token = default_token_generator.make_token(user)
+                uid = urlsafe_base64_encode(force_bytes(user.pk))
+                
+                # Create magic link
+                magic_link = f"{request.build_absolute_uri(reverse('verify_email', kwargs={'uidb64': uid, 'token': token}))}"
+                
+                # Queue the magic link email; it commits with the new account
+                enqueue(
+                    subject='Your Campus Find Magic Link',
+                    body=f'''Hello,
 
 Click the link below to verify your email and access your dashboard:
 
@@ -121,16 +109,13 @@ If you didn't request this, please ignore this email.
 
 Best regards,
 Campus Find Team''',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[email],
-                fail_silently=False,
-            )
-            messages.success(request, 'Check your email for a magic link to verify your account!')
+                    recipients=[email],
+                )
         except Exception as e:
-            messages.error(request, f'Error sending email: {str(e)}')
-            user.delete()  # Delete user if email fails
+            messages.error(request, 'Error creating account. Please try again.')
             return redirect('register')
         
+        messages.success(request, 'Check your email for a magic link to verify your account!')
         return redirect('register')
     
     return render(request, 'accounts/register.html')
@@ -175,7 +160,7 @@ def profile(request):
         bio = request.POST.get('bio', '').strip()
         
         # Check if email is already taken by another user
-        if email != request.user.email and User.objects.filter(email=email).exists():
+        if email.upper() != request.user.email.upper() and with_email(email).exists():
             messages.error(request, 'This email is already in use.')
             return redirect('profile')
         
@@ -211,12 +196,10 @@ def dashboard(request):
     """User dashboard with property listings"""
     from houses.models import House
     from booking.models import Booking
+    from booking.summaries import get_user_summary
     
     # Get landlord's properties
-    properties = House.objects.filter(landlord=request.user).order_by('-created_at')
-    
-    # Check if user is a landlord (has properties)
-    is_landlord = properties.exists()
+    properties = House.objects.filter(landlord=request.user).with_primary_image().order_by('-created_at')
     
     # Get tenant bookings
     tenant_bookings = Booking.objects.filter(tenant=request.user).order_by('-created_at')
@@ -224,18 +207,22 @@ def dashboard(request):
     # Get landlord bookings (bookings for their properties)
     landlord_bookings = Booking.objects.filter(property__landlord=request.user).order_by('-created_at')
     
-    # Get stats
+    # Get stats (one query per table, cached per user)
+    summary = get_user_summary(request.user)
     stats = {
-        'total_properties': properties.count(),
-        'available_properties': properties.filter(is_available=True).count(),
-        'total_photos': sum(p.images.count() for p in properties),
-        'tenant_bookings': tenant_bookings.count(),
-        'pending_tenant_bookings': tenant_bookings.filter(status='pending').count(),
-        'approved_tenant_bookings': tenant_bookings.filter(status='approved').count(),
-        'landlord_bookings': landlord_bookings.count(),
-        'pending_landlord_bookings': landlord_bookings.filter(status='pending').count(),
+        'total_properties': summary['total_properties'],
+        'available_properties': summary['available_properties'],
+        'total_photos': summary['total_photos'],
+        'tenant_bookings': summary['tenant_bookings']['total'],
+        'pending_tenant_bookings': summary['tenant_bookings']['pending'],
+        'approved_tenant_bookings': summary['tenant_bookings']['approved'],
+        'landlord_bookings': summary['landlord_bookings']['total'],
+        'pending_landlord_bookings': summary['landlord_bookings']['pending'],
     }
     
+    # Check if user is a landlord (has properties)
+    is_landlord = stats['total_properties'] > 0
+    
     context = {
         'properties': properties,
         'stats': stats,
@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import StatusCount
+
+
+# Counters are maintained by signals; fix drift with `manage.py reconcile_booking_counters`
+@admin.register(StatusCount)
+class StatusCountAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'status', 'count', 'updated_at')
+    list_filter = ('kind',)
+    readonly_fields = ('kind', 'status', 'count', 'updated_at')
@@ -0,0 +1,71 @@
+"""
+Running totals of bookings and mover bookings per status.
+
+StatusCount rows are adjusted with F() updates whenever a booking is
+created, changes status or is deleted (see booking/signals.py and the bulk
+transitions in booking.models), so /metrics can report them without a
+COUNT over the booking tables. `manage.py reconcile_booking_counters`
+recomputes the rows to correct any drift.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+
+BOOKING = 'booking'
+MOVER_BOOKING = 'mover_booking'
+
+
+def _apply(kind, status, delta):
+    from .models import StatusCount
+
+    if not delta:
+        return
+    rows = StatusCount.objects.filter(kind=kind, status=status)
+    if not rows.update(count=F('count') + delta):
+        StatusCount.objects.get_or_create(kind=kind, status=status)
+        rows.update(count=F('count') + delta)
+
+
+def record_status_change(kind, before, after, count=1):
+    """Move `count` bookings of `kind` from status `before` to `after` (either may be None)"""
+    if before == after:
+        return
+    if before is not None:
+        _apply(kind, before, -count)
+    if after is not None:
+        _apply(kind, after, count)
+
+
+def get_status_counts():
+    """{kind: {status: count}} with every known status present"""
+    from .models import Booking, MoverBooking, StatusCount
+
+    counts = {
+        BOOKING: {status: 0 for status, _label in Booking.STATUS_CHOICES},
+        MOVER_BOOKING: {status: 0 for status, _label in MoverBooking.STATUS_CHOICES},
+    }
+    for kind, status, count in StatusCount.objects.values_list('kind', 'status', 'count'):
+        counts.setdefault(kind, {})[status] = count
+    return counts
+
+
+def reconcile():
+    """Recompute every StatusCount row; return {(kind, status): (old, new)} for rows that drifted"""
+    from .models import Booking, MoverBooking, StatusCount
+
+    actual = {}
+    for kind, model in ((BOOKING, Booking), (MOVER_BOOKING, MoverBooking)):
+        for row in model.objects.order_by().values('status').annotate(total=Count('pk')):
+            actual[kind, row['status']] = row['total']
+
+    drift = {}
+    with transaction.atomic():
+        existing = {(row.kind, row.status): row for row in StatusCount.objects.select_for_update()}
+        for key in set(existing) | set(actual):
+            new = actual.get(key, 0)
+            row = existing.get(key) or StatusCount(kind=key[0], status=key[1])
+            if row.count != new or row.pk is None:
+                if row.count != new:
+                    drift[key] = (row.count, new)
+                row.count = new
+                row.save()
+    return drift
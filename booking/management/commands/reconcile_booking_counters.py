@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from booking.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-status booking counters from Booking and MoverBooking (run periodically, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        drift = reconcile()
+        for (kind, status), (old, new) in sorted(drift.items()):
+            self.stdout.write(f'{kind} {status}: {old} -> {new}')
+        self.stdout.write(self.style.SUCCESS(f'Corrected {len(drift)} booking counter(s)'))
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 13:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_moverbooking_tenant_moverbooking_tenant_email_and_more'),
+        ('houses', '0007_recent_ordering_indexes'),
+        ('movers', '0003_recent_ordering_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['tenant', '-created_at', '-id'], name='booking_tenant_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['property', '-created_at', '-id'], name='booking_property_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moverbooking',
+            index=models.Index(fields=['mover', '-created_at', '-id'], name='moverbooking_mover_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moverbooking',
+            index=models.Index(fields=['tenant', '-created_at', '-id'], name='moverbooking_tenant_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 18:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0005_moverbooking_coordinates'),
+        ('movers', '0005_moverservice_daily_capacity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moverbooking',
+            name='move_date',
+            field=models.DateField(blank=True, help_text='Day the move is scheduled for', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='moverbooking',
+            index=models.Index(fields=['mover', 'move_date', 'status'], name='moverbooking_mover_day_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 19:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_status_counts(apps, schema_editor):
+    StatusCount = apps.get_model('booking', 'StatusCount')
+    db_alias = schema_editor.connection.alias
+    rows = []
+    for kind, model_name in (('booking', 'Booking'), ('mover_booking', 'MoverBooking')):
+        model = apps.get_model('booking', model_name)
+        for row in model.objects.using(db_alias).order_by().values('status').annotate(total=Count('pk')):
+            rows.append(StatusCount(kind=kind, status=row['status'], count=row['total']))
+    StatusCount.objects.using(db_alias).bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0006_moverbooking_move_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('booking', 'Booking'), ('mover_booking', 'Mover booking')], max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'status')},
+            },
+        ),
+        migrations.RunPython(backfill_status_counts, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,81 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from houses.inventory import release_units, reserve_units
 from houses.models import House
 from movers.models import MoverService
+from notifications.emails import booking_status_changed
+from .counters import BOOKING, record_status_change
+from .summaries import invalidate_summaries
 
 User = get_user_model()
 
+
+class BookingQuerySet(models.QuerySet):
+    def approve(self):
+        """Approve the pending bookings here, reserving one unit per booking
+
+        Each property's units are taken in a single conditional UPDATE; if a
+        property has too few units left, none of its bookings are approved.
+        Approved tenants are notified through the outbox.
+        Returns {property_id: (approved_count, units_remaining or None)}.
+        """
+        pending = self.filter(status='pending')
+        users = {}
+        for property_id, tenant_id, landlord_id in pending.values_list('property_id', 'tenant_id', 'property__landlord_id'):
+            users.setdefault(property_id, {landlord_id}).add(tenant_id)
+        results = {}
+        for property_id, user_ids in users.items():
+            with transaction.atomic():
+                # Locked, so the bookings notified below are exactly the ones the update approves
+                bookings = list(pending.filter(property_id=property_id).select_related('property').select_for_update(of=('self',)))
+                approved = Booking.objects.filter(pk__in=[booking.pk for booking in bookings]).update(status='approved', updated_at=timezone.now())
+                remaining = reserve_units(property_id, approved) if approved else None
+                if approved and remaining is None:
+                    transaction.set_rollback(True)
+                    approved = 0
+                else:
+                    # update() sends no signals, so adjust the counters here
+                    invalidate_summaries(*user_ids)
+                    record_status_change(BOOKING, 'pending', 'approved', approved)
+                    for booking in bookings:
+                        booking.status = 'approved'
+                        booking_status_changed(booking)
+            results[property_id] = (approved, remaining)
+        return results
+
+    def cancel(self):
+        """Cancel the pending/approved bookings here, returning approved units to their property
+
+        Returns the number of bookings cancelled.
+        """
+        return self._close('cancelled')
+
+    def reject(self):
+        """Reject the pending/approved bookings here, returning approved units to their property
+
+        Returns the number of bookings rejected.
+        """
+        return self._close('rejected')
+
+    def _close(self, new_status):
+        closed = 0
+        bookings = self.filter(status__in=['pending', 'approved']).values_list(
+            'pk', 'property_id', 'status', 'tenant_id', 'property__landlord_id'
+        )
+        for booking_id, property_id, status, tenant_id, landlord_id in bookings:
+            with transaction.atomic():
+                # Conditional on the status we read, so a concurrent change can't release a unit twice
+                if not Booking.objects.filter(pk=booking_id, status=status).update(status=new_status, updated_at=timezone.now()):
+                    continue
+                if status == 'approved':
+                    release_units(property_id)
+                invalidate_summaries(tenant_id, landlord_id)
+                record_status_change(BOOKING, status, new_status)
+            closed += 1
+        return closed
+
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -36,13 +107,28 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = BookingQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         unique_together = ('tenant', 'property')  # Prevent duplicate bookings
+        indexes = [
+            models.Index(fields=['tenant', '-created_at', '-id'], name='booking_tenant_recent_idx'),
+            models.Index(fields=['property', '-created_at', '-id'], name='booking_property_recent_idx'),
+        ]
     
     def __str__(self):
         return f"Booking for {self.property.title} by {self.tenant.email}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The status the StatusCount rows currently include (see booking.counters);
+        # with status deferred, booking.signals looks it up before saving
+        if 'status' in instance.__dict__:
+            instance._counted_status = instance.status
+        return instance
+
 
 class MoverBooking(models.Model):
     STATUS_CHOICES = [
@@ -61,6 +147,11 @@ class MoverBooking(models.Model):
     # Location Details
     pickup_location = models.CharField(max_length=300, help_text="Current location (where items are being moved from)")
     dropoff_location = models.CharField(max_length=300, help_text="New location (where items are being moved to)")
+    pickup_latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    pickup_longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    dropoff_latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    dropoff_longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    move_date = models.DateField(null=True, blank=True, help_text="Day the move is scheduled for")
     
     # Tenant Contact Info
     tenant_name = models.CharField(max_length=200, blank=True, default='')
@@ -83,6 +174,21 @@ class MoverBooking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['mover', '-created_at', '-id'], name='moverbooking_mover_recent_idx'),
+            models.Index(fields=['tenant', '-created_at', '-id'], name='moverbooking_tenant_recent_idx'),
+            # Per-day schedules and slot counts (movers.scheduling)
+            models.Index(fields=['mover', 'move_date', 'status'], name='moverbooking_mover_day_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'status' in instance.__dict__:
+            instance._counted_status = instance.status
+        return instance
+    
     def save(self, *args, **kwargs):
         # Calculate total cost: base_rate + (distance_km * rate_per_km)
         self.total_cost = self.base_rate + (self.distance_km * self.rate_per_km)
@@ -90,3 +196,23 @@ class MoverBooking(models.Model):
     
     def __str__(self):
         return f"Moving booking by {self.tenant_name} with {self.mover.name if self.mover else 'Unknown'}"
+
+
+class StatusCount(models.Model):
+    """Bookings per status, maintained by booking.signals (see booking/counters.py)"""
+    KIND_CHOICES = [
+        ('booking', 'Booking'),
+        ('mover_booking', 'Mover booking'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20)
+    # Plain integer, like houses.CategoryStat: drift must never make a booking save fail
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('kind', 'status')
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.status}: {self.count}"
@@ -0,0 +1,67 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from houses.models import House, HouseImage
+from movers.models import MoverService
+from .counters import BOOKING, MOVER_BOOKING, record_status_change
+from .models import Booking, MoverBooking
+from .summaries import invalidate_summaries
+
+
+def _landlord_id(house_id):
+    return House.objects.filter(pk=house_id).values_list('landlord_id', flat=True).first()
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    """Tenant and landlord both see this booking in their counters"""
+    invalidate_summaries(instance.tenant_id, _landlord_id(instance.property_id))
+
+
+@receiver(post_save, sender=MoverBooking)
+@receiver(post_delete, sender=MoverBooking)
+def mover_booking_changed(sender, instance, **kwargs):
+    owner_id = MoverService.objects.filter(pk=instance.mover_id).values_list('owner_id', flat=True).first()
+    invalidate_summaries(instance.tenant_id, owner_id)
+
+
+@receiver(post_save, sender=House)
+@receiver(post_delete, sender=House)
+def house_changed(sender, instance, **kwargs):
+    invalidate_summaries(instance.landlord_id)
+
+
+@receiver(post_save, sender=HouseImage)
+@receiver(post_delete, sender=HouseImage)
+def house_image_changed(sender, instance, **kwargs):
+    """Photo totals come from House.image_count"""
+    invalidate_summaries(_landlord_id(instance.house_id))
+
+
+COUNTER_KINDS = {Booking: BOOKING, MoverBooking: MOVER_BOOKING}
+
+
+@receiver(pre_save, sender=Booking)
+@receiver(pre_save, sender=MoverBooking)
+def booking_saving(sender, instance, raw=False, **kwargs):
+    """Make sure the status the counters hold is known before the row changes"""
+    if raw or instance._state.adding or hasattr(instance, '_counted_status'):
+        return
+    instance._counted_status = sender.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=MoverBooking)
+def booking_status_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = None if created else instance._counted_status
+    record_status_change(COUNTER_KINDS[sender], before, instance.status)
+    instance._counted_status = instance.status
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=MoverBooking)
+def booking_status_deleted(sender, instance, **kwargs):
+    record_status_change(COUNTER_KINDS[sender], getattr(instance, '_counted_status', instance.status), None)
@@ -0,0 +1,87 @@
+"""
+Per-user status counters for the booking pages and the dashboard.
+
+Every counter a user's pages show comes from one conditional-aggregate
+query per table (House, Booking, MoverBooking). The result is cached per
+user and dropped by booking/signals.py whenever a booking, listing or
+photo changes, and explicitly by the bulk updates in booking.models.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+SUMMARY_CACHE_TIMEOUT = 5 * 60
+
+BOOKING_STATUSES = ['pending', 'approved', 'rejected', 'cancelled']
+MOVER_BOOKING_STATUSES = ['pending', 'confirmed', 'rejected', 'completed', 'cancelled']
+
+
+def summary_cache_key(user_id):
+    return f'booking:summary:{user_id}'
+
+
+def _role_counts(role_q, statuses):
+    aggregates = {'total': Count('pk', filter=role_q)}
+    for status in statuses:
+        aggregates[status] = Count('pk', filter=role_q & Q(status=status))
+    return aggregates
+
+
+def _by_role(queryset, roles, statuses):
+    """{role: {'total', <status>...}} from a single aggregate over `queryset`"""
+    aggregates = {}
+    for role, role_q in roles.items():
+        for name, aggregate in _role_counts(role_q, statuses).items():
+            aggregates[f'{role}__{name}'] = aggregate
+    row = queryset.aggregate(**aggregates)
+    return {
+        role: {name: row[f'{role}__{name}'] for name in ['total'] + statuses}
+        for role in roles
+    }
+
+
+def build_summary(user):
+    from houses.models import House
+    from .models import Booking, MoverBooking
+
+    summary = House.objects.filter(landlord=user).aggregate(
+        total_properties=Count('pk'),
+        available_properties=Count('pk', filter=Q(is_available=True)),
+        total_photos=Coalesce(Sum('image_count'), 0),
+    )
+    summary.update(_by_role(
+        Booking.objects.filter(Q(tenant=user) | Q(property__landlord=user)),
+        {'tenant_bookings': Q(tenant=user), 'landlord_bookings': Q(property__landlord=user)},
+        BOOKING_STATUSES,
+    ))
+    summary.update(_by_role(
+        MoverBooking.objects.filter(Q(tenant=user) | Q(mover__owner=user)),
+        {'tenant_mover_bookings': Q(tenant=user), 'mover_bookings': Q(mover__owner=user)},
+        MOVER_BOOKING_STATUSES,
+    ))
+    return summary
+
+
+def get_user_summary(user, cached=True):
+    """Property, booking and mover booking counters for a user
+
+    {'total_properties', 'available_properties', 'total_photos',
+     'tenant_bookings', 'landlord_bookings', 'tenant_mover_bookings',
+     'mover_bookings'}, the last four being {'total', <status>: count}.
+    """
+    if not cached:
+        return build_summary(user)
+    key = summary_cache_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_summary(user)
+        cache.set(key, summary, SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def invalidate_summaries(*user_ids):
+    """Drop the cached summaries of these users once the transaction commits"""
+    keys = [summary_cache_key(user_id) for user_id in set(user_ids) if user_id is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
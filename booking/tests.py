@@ -1,3 +1,202 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from houses.models import House
+from movers.models import MoverService
+from movers.scheduling import confirm_booking
+from roomify.tests import LOCMEM_CACHES, make_house
+
+from .counters import BOOKING, MOVER_BOOKING, get_status_counts, reconcile
+from .models import Booking, MoverBooking
+
+
+def make_booking(tenant, house, **fields):
+    values = {
+        'move_in_date': date.today() + timedelta(days=30),
+        'tenant_name': 'Tenant',
+        'tenant_phone': '0711000000',
+        'tenant_email': 'tenant@example.com',
+    }
+    values.update(fields)
+    return Booking.objects.create(tenant=tenant, property=house, **values)
+
+
+def make_mover_booking(tenant, mover, **fields):
+    values = {
+        'pickup_location': 'Kahawa West',
+        'dropoff_location': 'Westlands',
+        'distance_km': Decimal('12.00'),
+        'base_rate': Decimal('1500.00'),
+        'total_cost': Decimal('2100.00'),
+        'move_date': date.today() + timedelta(days=7),
+    }
+    values.update(fields)
+    return MoverBooking.objects.create(tenant=tenant, mover=mover, **values)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StatusCounterSignalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = User.objects.create_user('landlord', password='x')
+        cls.tenant = User.objects.create_user('tenant', password='x')
+        cls.house = make_house(cls.landlord, total_units=3, available_units=3)
+
+    def counts(self, kind=BOOKING):
+        return {status: count for status, count in get_status_counts()[kind].items() if count}
+
+    def test_create_status_change_and_delete_move_the_counters(self):
+        booking = make_booking(self.tenant, self.house)
+        self.assertEqual(self.counts(), {'pending': 1})
+
+        booking.status = 'rejected'
+        booking.save()
+        self.assertEqual(self.counts(), {'rejected': 1})
+
+        booking.delete()
+        self.assertEqual(self.counts(), {})
+        self.assertEqual(reconcile(), {})
+
+    def test_saving_an_instance_loaded_without_status(self):
+        booking = make_booking(self.tenant, self.house)
+        deferred = Booking.objects.only('pk').get(pk=booking.pk)
+        deferred.status = 'cancelled'
+        deferred.save()
+        self.assertEqual(self.counts(), {'cancelled': 1})
+        self.assertEqual(reconcile(), {})
+
+    def test_mover_bookings_have_their_own_counters(self):
+        owner = User.objects.create_user('mover', password='x')
+        mover = MoverService.objects.create(owner=owner, name='Crew', description='Moves', location='Nairobi', phone='0722000000')
+        mover_booking = make_mover_booking(self.tenant, mover)
+        mover_booking.status = 'confirmed'
+        mover_booking.save()
+        self.assertEqual(self.counts(MOVER_BOOKING), {'confirmed': 1})
+        self.assertEqual(self.counts(BOOKING), {})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BookingTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = User.objects.create_user('landlord', password='x')
+        cls.tenant = User.objects.create_user('tenant', password='x')
+
+    def setUp(self):
+        self.house = make_house(self.landlord, total_units=2, available_units=2)
+
+    def make_bookings(self, count):
+        """One booking each from `count` different tenants"""
+        tenants = [User.objects.create_user(f'tenant{index}', password='x') for index in range(count)]
+        return [make_booking(tenant, self.house) for tenant in tenants]
+
+    def available_units(self):
+        return House.objects.values_list('available_units', flat=True).get(pk=self.house.pk)
+
+    def test_approve_takes_a_unit_per_booking(self):
+        bookings = self.make_bookings(2)
+        results = Booking.objects.filter(pk__in=[booking.pk for booking in bookings]).approve()
+        self.assertEqual(results, {self.house.pk: (2, 0)})
+        self.assertEqual(self.available_units(), 0)
+
+    def test_approve_approves_nothing_when_units_run_short(self):
+        bookings = self.make_bookings(3)
+        results = Booking.objects.filter(pk__in=[booking.pk for booking in bookings]).approve()
+        self.assertEqual(results, {self.house.pk: (0, None)})
+        self.assertEqual(self.available_units(), 2)
+        self.assertFalse(Booking.objects.filter(status='approved').exists())
+
+    def test_rejecting_an_approved_booking_returns_its_unit(self):
+        booking = make_booking(self.tenant, self.house)
+        Booking.objects.filter(pk=booking.pk).approve()
+        self.assertEqual(self.available_units(), 1)
+
+        self.client.force_login(self.landlord)
+        self.client.post(reverse('reject_booking', args=[booking.pk]))
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'rejected')
+        self.assertEqual(self.available_units(), 2)
+        self.assertEqual(reconcile(), {})
+
+    def test_cancel_and_reject_leave_closed_bookings_alone(self):
+        booking = make_booking(self.tenant, self.house, status='rejected')
+        self.assertEqual(Booking.objects.filter(pk=booking.pk).cancel(), 0)
+        self.assertEqual(Booking.objects.filter(pk=booking.pk).reject(), 0)
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'rejected')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MoverCapacityTests(TestCase):
+    def test_confirm_stops_at_daily_capacity(self):
+        owner = User.objects.create_user('mover', password='x')
+        tenant = User.objects.create_user('tenant', password='x')
+        mover = MoverService.objects.create(
+            owner=owner, name='Crew', description='Moves', location='Nairobi', phone='0722000000', daily_capacity=1,
+        )
+        first, second = make_mover_booking(tenant, mover), make_mover_booking(tenant, mover)
+        self.assertTrue(confirm_booking(first))
+        self.assertFalse(confirm_booking(second))
+        self.assertEqual(MoverBooking.objects.get(pk=second.pk).status, 'pending')
+        self.assertEqual(second.status, 'pending')
+        self.assertEqual(reconcile(), {})
+
+    def test_confirm_leaves_a_booking_cancelled_meanwhile_alone(self):
+        owner = User.objects.create_user('mover', password='x')
+        tenant = User.objects.create_user('tenant', password='x')
+        mover = MoverService.objects.create(owner=owner, name='Crew', description='Moves', location='Nairobi', phone='0722000000')
+        booking = make_mover_booking(tenant, mover)
+        stale = MoverBooking.objects.get(pk=booking.pk)
+        booking.status = 'cancelled'
+        booking.save()
+
+        self.assertFalse(confirm_booking(stale))
+        self.assertEqual(stale.status, 'cancelled')
+        self.assertEqual(MoverBooking.objects.get(pk=booking.pk).status, 'cancelled')
+        self.assertEqual(reconcile(), {})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MoverQuoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('mover', password='x')
+        cls.tenant = User.objects.create_user('tenant', password='x', email='tenant@example.com')
+        cls.mover = MoverService.objects.create(owner=owner, name='Crew', description='Moves', location='Nairobi', phone='0722000000')
+
+    def setUp(self):
+        self.client.force_login(self.tenant)
+        self.form = {
+            'tenant_name': 'Tenant',
+            'tenant_phone': '0711000000',
+            'tenant_email': 'tenant@example.com',
+            'pickup_location': 'Kahawa West',
+            'dropoff_location': 'Westlands',
+            'move_date': (date.today() + timedelta(days=3)).isoformat(),
+            'distance_km': '1',
+        }
+        self.points = {'pickup_lat': '-1.1833', 'pickup_lng': '36.9167', 'dropoff_lat': '-1.2676', 'dropoff_lng': '36.8108'}
+
+    def test_a_move_without_coordinates_is_refused(self):
+        response = self.client.post(reverse('book_mover', args=[self.mover.pk]), self.form)
+        self.assertRedirects(response, reverse('book_mover', args=[self.mover.pk]), fetch_redirect_response=False)
+
+    def test_the_quote_stays_server_side_and_is_booked_once(self):
+        response = self.client.post(reverse('book_mover', args=[self.mover.pk]), {**self.form, **self.points})
+        self.assertNotIn('tenant', response.url)
+        quote_id = response.url.split('quote=')[1]
+
+        self.client.post(reverse('confirm_mover_booking'), {'quote': quote_id})
+        self.client.post(reverse('confirm_mover_booking'), {'quote': quote_id})
+        mover_booking = MoverBooking.objects.get()
+        # Priced from the coordinates (about 15 km apart), not the submitted distance_km
+        self.assertGreater(mover_booking.distance_km, 10)
+        self.assertEqual(mover_booking.tenant_phone, '0711000000')
+
+    def test_another_user_cannot_use_the_quote(self):
+        response = self.client.post(reverse('book_mover', args=[self.mover.pk]), {**self.form, **self.points})
+        self.client.force_login(User.objects.create_user('other', password='x'))
+        self.client.post(reverse('confirm_mover_booking'), {'quote': response.url.split('quote=')[1]})
+        self.assertFalse(MoverBooking.objects.exists())
@@ -21,5 +21,6 @@ urlpatterns = [
     # Landlord Property Booking URLs
     path('manage/', views.manage_bookings, name='manage_bookings'),
     path('approve/<int:booking_id>/', views.approve_booking, name='approve_booking'),
+    path('approve/bulk/', views.bulk_approve_bookings, name='bulk_approve_bookings'),
     path('reject/<int:booking_id>/', views.reject_booking, name='reject_booking'),
 ]
@@ -1,15 +1,91 @@
+import secrets
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Avg
+from django.core.cache import caches
+from django.db.models import Q
+from django.views.decorators.http import require_POST
+from roomify.pagination import paginate
 from houses.models import House
 from movers.models import MoverService
+from movers.quotes import parse_point, quote, route_distance
+from movers.scheduling import confirm_booking, has_capacity, slot_availability
+from notifications.emails import booking_status_changed, mover_booking_requested, mover_booking_status_changed
 from .models import Booking, MoverBooking
+from .summaries import get_user_summary
+
+
+def _move_quote(request, mover):
+    """Price the move in request.POST from its pickup and dropoff coordinates, measuring the route server-side
+
+    Returns (quote, coordinate field values for MoverBooking), or None when
+    either point is missing or invalid; a client-supplied distance is never used.
+    """
+    pickup = parse_point(request.POST.get('pickup_lat'), request.POST.get('pickup_lng'))
+    dropoff = parse_point(request.POST.get('dropoff_lat'), request.POST.get('dropoff_lng'))
+    if not (pickup and dropoff):
+        return None
+    coordinates = {
+        'pickup_latitude': Decimal(f'{pickup[0]:.6f}'),
+        'pickup_longitude': Decimal(f'{pickup[1]:.6f}'),
+        'dropoff_latitude': Decimal(f'{dropoff[0]:.6f}'),
+        'dropoff_longitude': Decimal(f'{dropoff[1]:.6f}'),
+    }
+    return quote(mover, route_distance(pickup, dropoff).distance_km), coordinates
+
+
+MISSING_LOCATIONS = 'Please pick the pickup and drop-off locations from the suggestions so we can measure the move.'
+
+
+# The quote shown on the confirm page is kept server-side, in the cache that holds sessions
+# (it doesn't evict), and referred to by an opaque id, so the tenant's contact details never
+# appear in URLs, logs or Referer headers and no session row is written per booking step
+PENDING_MOVER_BOOKING_KEY = 'booking:pending_mover_booking:{}'
+PENDING_MOVER_BOOKING_TIMEOUT = 60 * 60
+
+
+def _pending_mover_bookings():
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def _store_mover_booking(user, data):
+    """Keep the quote for this user and return the id the confirm page refers to it by"""
+    quote_id = secrets.token_urlsafe(16)
+    _pending_mover_bookings().set(
+        PENDING_MOVER_BOOKING_KEY.format(quote_id), {**data, 'user_id': user.pk}, PENDING_MOVER_BOOKING_TIMEOUT,
+    )
+    return quote_id
+
+
+def _load_mover_booking(user, quote_id):
+    """The pending booking stored for this user, or None if the id is missing, unknown or expired"""
+    if not quote_id:
+        return None
+    data = _pending_mover_bookings().get(PENDING_MOVER_BOOKING_KEY.format(quote_id))
+    return data if data and data.get('user_id') == user.pk else None
+
+
+def _discard_mover_booking(quote_id):
+    _pending_mover_bookings().delete(PENDING_MOVER_BOOKING_KEY.format(quote_id))
+
+
+def _parse_move_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
 
 @login_required(login_url='register')
 def property_detail(request, pk):
     """Display property details and booking form"""
-    property = get_object_or_404(House, pk=pk)
+    property = get_object_or_404(House.objects.with_images(), pk=pk)
     
     # Check if tenant has already booked this property
     existing_booking = Booking.objects.filter(tenant=request.user, property=property).first()
@@ -32,6 +108,15 @@ def create_booking(request, property_id):
     
     if request.method == 'POST':
         try:
+            # Price a requested move before anything is saved, so a missing location books nothing
+            mover_id = request.POST.get('mover_id')
+            if mover_id:
+                mover = get_object_or_404(MoverService, pk=mover_id)
+                move_quote = _move_quote(request, mover)
+                if move_quote is None:
+                    messages.error(request, MISSING_LOCATIONS)
+                    return redirect('create_booking', property_id=property.pk)
+
             booking = Booking.objects.create(
                 tenant=request.user,
                 property=property,
@@ -44,14 +129,12 @@ def create_booking(request, property_id):
             )
             
             # Check if mover booking is requested
-            mover_id = request.POST.get('mover_id')
             if mover_id:
-                mover = get_object_or_404(MoverService, pk=mover_id)
                 pickup_location = request.POST.get('pickup_location', '').strip()
                 dropoff_location = request.POST.get('dropoff_location', '').strip()
-                distance_km = float(request.POST.get('distance_km', 0))
+                price, coordinates = move_quote
                 
-                if pickup_location and dropoff_location and distance_km > 0:
+                if pickup_location and dropoff_location and price.distance_km > 0:
                     # Get mover's current rating
                     rating = mover.rating_summary.get('average', 0)
                     
@@ -60,10 +143,12 @@ def create_booking(request, property_id):
                         mover=mover,
                         pickup_location=pickup_location,
                         dropoff_location=dropoff_location,
-                        distance_km=distance_km,
-                        base_rate=float(mover.rate_per_km),
-                        rate_per_km=50,  # Default rate per km
+                        distance_km=price.distance_km,
+                        base_rate=price.base_rate,
+                        rate_per_km=price.rate_per_km,
                         mover_rating=rating,
+                        move_date=_parse_move_date(request.POST.get('move_in_date')),
+                        **coordinates,
                     )
             
             messages.success(request, 'Booking request sent! The landlord will review it soon.')
@@ -73,9 +158,7 @@ def create_booking(request, property_id):
             return redirect('property_detail', pk=property.pk)
     
     # Get available movers
-    movers = MoverService.objects.annotate(
-        avg_rating=Avg('ratings__score')
-    ).order_by('-avg_rating')
+    movers = MoverService.objects.order_by('-rating_avg', '-rating_count', '-id')
     
     context = {
         'property': property,
@@ -86,13 +169,11 @@ def create_booking(request, property_id):
 @login_required(login_url='register')
 def my_bookings(request):
     """View tenant's bookings"""
-    bookings = Booking.objects.filter(tenant=request.user).select_related('property')
+    bookings = Booking.objects.filter(tenant=request.user).select_related('property__primary_image')
     
     context = {
         'bookings': bookings,
-        'pending': bookings.filter(status='pending').count(),
-        'approved': bookings.filter(status='approved').count(),
-        'rejected': bookings.filter(status='rejected').count(),
+        **get_user_summary(request.user)['tenant_bookings'],
     }
     return render(request, 'booking/my_bookings.html', context)
 
@@ -102,21 +183,10 @@ def cancel_booking(request, booking_id):
     booking = get_object_or_404(Booking, pk=booking_id, tenant=request.user)
     
     if request.method == 'POST':
-        if booking.status == 'pending':
-            booking.status = 'cancelled'
-            booking.save()
+        if booking.status in ('pending', 'approved'):
+            # An approved booking's unit goes back to the property
+            Booking.objects.filter(pk=booking.pk).cancel()
             messages.success(request, 'Booking cancelled successfully!')
-        elif booking.status == 'approved':
-            # If approved booking is cancelled, increase available units
-            booking.status = 'cancelled'
-            booking.save()
-            
-            if booking.property.available_units < booking.property.total_units:
-                booking.property.available_units += 1
-                booking.property.save()  # This will auto-update is_available via save method
-                messages.success(request, f'Booking cancelled! Property now has {booking.property.available_units} unit(s) available.')
-            else:
-                messages.success(request, 'Booking cancelled!')
         else:
             messages.error(request, 'You can only cancel pending or approved bookings!')
         return redirect('my_bookings')
@@ -136,23 +206,27 @@ def book_mover(request, mover_id):
             tenant_email = request.POST.get('tenant_email', '').strip()
             pickup_location = request.POST.get('pickup_location', '').strip()
             dropoff_location = request.POST.get('dropoff_location', '').strip()
-            distance_km = float(request.POST.get('distance_km', 0))
+            move_date = _parse_move_date(request.POST.get('move_date'))
+            move_quote = _move_quote(request, mover)
             
-            if not all([tenant_name, tenant_phone, tenant_email, pickup_location, dropoff_location, distance_km > 0]):
+            if not all([tenant_name, tenant_phone, tenant_email, pickup_location, dropoff_location, move_date]):
                 messages.error(request, 'Please fill in all required fields.')
                 return redirect('book_mover', mover_id=mover_id)
             
+            if move_quote is None:
+                messages.error(request, MISSING_LOCATIONS)
+                return redirect('book_mover', mover_id=mover_id)
+            price, coordinates = move_quote
+            
+            if move_date < date.today() or not has_capacity(mover, move_date):
+                messages.error(request, f'{mover.name} has no free slots on {move_date:%b %d}. Please pick another day.')
+                return redirect('book_mover', mover_id=mover_id)
+            
             # Get mover's current rating
             rating = mover.rating_summary.get('average', 0)
             
-            # Calculate total cost
-            base_rate = float(mover.rate_per_km)
-            rate_per_km = 50
-            total_cost = base_rate + (distance_km * rate_per_km)
-            distance_charge = distance_km * rate_per_km
-            
-            # Store serializable data in session for confirmation
-            request.session['pending_mover_booking'] = {
+            # Only the quote's opaque id goes into the confirm page's URL and form
+            quote_id = _store_mover_booking(request.user, {
                 'mover_id': mover_id,
                 'mover_name': mover.name,
                 'mover_location': mover.location,
@@ -162,36 +236,55 @@ def book_mover(request, mover_id):
                 'tenant_email': tenant_email,
                 'pickup_location': pickup_location,
                 'dropoff_location': dropoff_location,
-                'distance_km': float(distance_km),
-                'base_rate': float(base_rate),
-                'rate_per_km': float(rate_per_km),
-                'distance_charge': float(distance_charge),
-                'total_cost': float(total_cost),
+                'distance_km': float(price.distance_km),
+                'base_rate': float(price.base_rate),
+                'rate_per_km': float(price.rate_per_km),
+                'distance_charge': float(price.distance_charge),
+                'total_cost': float(price.total_cost),
                 'mover_rating': float(rating),
-            }
+                'move_date': move_date.isoformat(),
+                'coordinates': {field: str(value) for field, value in coordinates.items()},
+            })
             
-            return redirect('confirm_mover_booking')
+            return redirect(f"{reverse('confirm_mover_booking')}?quote={quote_id}")
         except Exception as e:
             messages.error(request, f'Error booking mover: {str(e)}')
             return redirect('book_mover', mover_id=mover_id)
     
-    context = {'mover': mover}
+    context = {
+        'mover': mover,
+        'slots': slot_availability(mover, date.today()),
+    }
     return render(request, 'booking/book_mover.html', context)
 
 
 @login_required(login_url='register')
 def confirm_mover_booking(request):
     """Confirm mover booking"""
-    mover_booking_data = request.session.get('pending_mover_booking')
+    quote_id = request.POST.get('quote') or request.GET.get('quote', '')
+    mover_booking_data = _load_mover_booking(request.user, quote_id)
     
     if not mover_booking_data:
-        messages.error(request, 'No pending mover booking found.')
+        messages.error(request, 'This quote has expired or is invalid. Please book the mover again.')
         return redirect('movers_list')
     
     if request.method == 'POST':
         try:
             # Get mover
             mover = MoverService.objects.get(pk=mover_booking_data['mover_id'])
+            move_date = _parse_move_date(mover_booking_data.get('move_date'))
+            
+            # The same quote can be posted twice (e.g. a double click); book it once
+            if MoverBooking.objects.filter(
+                tenant=request.user,
+                mover=mover,
+                move_date=move_date,
+                pickup_location=mover_booking_data['pickup_location'],
+                dropoff_location=mover_booking_data['dropoff_location'],
+                status__in=['pending', 'confirmed'],
+            ).exists():
+                messages.info(request, f'You have already booked {mover.name} for this move.')
+                return redirect('my_mover_bookings')
             
             # Create mover booking record
             mover_booking = MoverBooking.objects.create(
@@ -206,21 +299,22 @@ def confirm_mover_booking(request):
                 base_rate=mover_booking_data['base_rate'],
                 rate_per_km=mover_booking_data['rate_per_km'],
                 mover_rating=mover_booking_data['mover_rating'],
+                move_date=move_date,
                 status='pending',
+                **mover_booking_data.get('coordinates', {}),
             )
+            mover_booking_requested(mover_booking)
+            _discard_mover_booking(quote_id)
             
             messages.success(request, f'Booking confirmed! {mover.name} will review and contact you.')
             
-            # Clear session
-            del request.session['pending_mover_booking']
-            
             # Redirect to tenant's mover bookings
             return redirect('my_mover_bookings')
         except Exception as e:
             messages.error(request, f'Error confirming booking: {str(e)}')
-            return redirect('confirm_mover_booking')
+            return redirect(f"{reverse('confirm_mover_booking')}?quote={quote_id}")
     
-    context = {'mover_booking': mover_booking_data}
+    context = {'mover_booking': mover_booking_data, 'quote_token': quote_id}
     return render(request, 'booking/confirm_mover_booking.html', context)
 
 
@@ -229,13 +323,17 @@ def confirm_mover_booking(request):
 def manage_bookings(request):
     """Landlord view bookings for their properties"""
     # Get all bookings for properties owned by this landlord
-    bookings = Booking.objects.filter(property__landlord=request.user).select_related('property', 'tenant')
+    bookings = Booking.objects.filter(property__landlord=request.user).select_related('property__primary_image', 'tenant')
+    page = paginate(request, bookings)
+    counts = get_user_summary(request.user)['landlord_bookings']
     
     context = {
-        'bookings': bookings,
-        'pending': bookings.filter(status='pending').count(),
-        'approved': bookings.filter(status='approved').count(),
-        'rejected': bookings.filter(status='rejected').count(),
+        'bookings': page.object_list,
+        'page': page,
+        'total_count': counts['total'],
+        'pending': counts['pending'],
+        'approved': counts['approved'],
+        'rejected': counts['rejected'],
     }
     return render(request, 'booking/manage_bookings.html', context)
 
@@ -245,22 +343,35 @@ def approve_booking(request, booking_id):
     booking = get_object_or_404(Booking, pk=booking_id, property__landlord=request.user)
     
     if request.method == 'POST':
-        booking.status = 'approved'
-        booking.save()
-        
-        # Decrease available units when booking is approved
-        if booking.property.available_units > 0:
-            booking.property.available_units -= 1
-            booking.property.save()  # This will auto-update is_available via save method
-            
-            if booking.property.available_units == 0:
+        approved, remaining = Booking.objects.filter(pk=booking.pk).approve().get(booking.property_id, (0, None))
+        if approved:
+            if remaining == 0:
                 messages.success(request, 'Booking approved! All units are now booked.')
             else:
-                messages.success(request, f'Booking approved! {booking.property.available_units} unit(s) remaining.')
+                messages.success(request, f'Booking approved! {remaining} unit(s) remaining.')
+        elif booking.status != 'pending':
+            messages.error(request, 'Only pending bookings can be approved.')
         else:
-            messages.warning(request, 'Booking approved but no units were available to decrease.')
-        
+            messages.error(request, 'No units are left to approve this booking.')
         return redirect('manage_bookings')
+    
+    return render(request, 'booking/booking_detail.html', {'booking': booking, 'action': 'approve'})
+
+@login_required(login_url='register')
+@require_POST
+def bulk_approve_bookings(request):
+    """Approve several pending bookings at once, one inventory update per property"""
+    booking_ids = [pk for pk in request.POST.getlist('booking_ids') if pk.isdigit()]
+    results = Booking.objects.filter(pk__in=booking_ids, property__landlord=request.user).approve()
+    approved = sum(count for count, _remaining in results.values())
+    short = sum(1 for count, _remaining in results.values() if not count)
+    if approved:
+        messages.success(request, f'Approved {approved} booking(s).')
+    if short:
+        messages.warning(request, f'{short} property(ies) did not have enough units left; those bookings are still pending.')
+    if not results:
+        messages.error(request, 'Select at least one pending booking to approve.')
+    return redirect('manage_bookings')
 
 
 # Mover Booking views for tenants
@@ -271,9 +382,7 @@ def my_mover_bookings(request):
     
     context = {
         'mover_bookings': mover_bookings,
-        'pending': mover_bookings.filter(status='pending').count(),
-        'confirmed': mover_bookings.filter(status='confirmed').count(),
-        'rejected': mover_bookings.filter(status='rejected').count(),
+        **get_user_summary(request.user)['tenant_mover_bookings'],
     }
     return render(request, 'booking/my_mover_bookings.html', context)
 
@@ -306,11 +415,12 @@ def mover_manage_bookings(request):
         .order_by('-created_at')
     )
 
+    page = paginate(request, mover_bookings)
+
     context = {
-        'mover_bookings': mover_bookings,
-        'pending': mover_bookings.filter(status='pending').count(),
-        'confirmed': mover_bookings.filter(status='confirmed').count(),
-        'rejected': mover_bookings.filter(status='rejected').count(),
+        'mover_bookings': page.object_list,
+        'page': page,
+        **get_user_summary(request.user)['mover_bookings'],
     }
     return render(request, 'booking/mover_manage_bookings.html', context)
 
@@ -321,12 +431,16 @@ def approve_mover_booking(request, booking_id):
     mover_booking = get_object_or_404(MoverBooking, pk=booking_id, mover__owner=request.user)
     
     if request.method == 'POST':
-        if mover_booking.status == 'pending':
-            mover_booking.status = 'confirmed'
-            mover_booking.save()
-            messages.success(request, f'Booking approved! Tenant will be notified.')
-        else:
+        if mover_booking.status != 'pending':
             messages.error(request, 'Only pending bookings can be approved.')
+        elif not confirm_booking(mover_booking):
+            if mover_booking.status != 'pending':
+                messages.error(request, 'Only pending bookings can be approved.')
+            else:
+                messages.error(request, f'You are fully booked on {mover_booking.move_date:%b %d}. Reject or reschedule another job first.')
+        else:
+            mover_booking_status_changed(mover_booking)
+            messages.success(request, f'Booking approved! Tenant will be notified.')
         return redirect('mover_manage_bookings')
     
     return render(request, 'booking/approve_mover_booking.html', {'mover_booking': mover_booking})
@@ -341,6 +455,7 @@ def reject_mover_booking(request, booking_id):
         if mover_booking.status == 'pending':
             mover_booking.status = 'rejected'
             mover_booking.save()
+            mover_booking_status_changed(mover_booking)
             messages.success(request, 'Booking rejected!')
         else:
             messages.error(request, 'Only pending bookings can be rejected.')
@@ -356,9 +471,13 @@ def reject_booking(request, booking_id):
     booking = get_object_or_404(Booking, pk=booking_id, property__landlord=request.user)
     
     if request.method == 'POST':
-        booking.status = 'rejected'
-        booking.save()
-        messages.success(request, 'Booking rejected!')
+        # An approved booking's unit goes back to the property
+        if Booking.objects.filter(pk=booking.pk).reject():
+            booking.status = 'rejected'
+            booking_status_changed(booking)
+            messages.success(request, 'Booking rejected!')
+        else:
+            messages.error(request, 'Only pending or approved bookings can be rejected.')
         return redirect('manage_bookings')
     
     return render(request, 'booking/booking_detail.html', {'booking': booking, 'action': 'reject'})
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import House, HouseImage
+from .models import CategoryStat, House, HouseImage
 
 # Inline model for house images
 class HouseImageInline(admin.TabularInline):
@@ -19,3 +19,9 @@ class HouseAdmin(admin.ModelAdmin):
 @admin.register(HouseImage)
 class HouseImageAdmin(admin.ModelAdmin):
     list_display = ('house', 'image')
+
+# Counters are maintained by signals; fix drift with `manage.py reconcile_house_stats`
+@admin.register(CategoryStat)
+class CategoryStatAdmin(admin.ModelAdmin):
+    list_display = ('category', 'listings', 'available_listings', 'available_units', 'updated_at')
+    readonly_fields = ('category', 'listings', 'available_listings', 'available_units', 'updated_at')
@@ -0,0 +1,55 @@
+"""
+Amenity filtering on House.amenity_mask.
+
+Each entry of House.AMENITIES_CHOICES owns one bit of amenity_mask, so
+"wifi AND parking AND security" is a single integer comparison instead
+of LIKE scans over the comma-separated amenities column.
+"""
+from django.db.models import F, Q
+from django.db.models.lookups import Exact, GreaterThan
+
+# Above this many candidate masks, fall back to a bitwise AND scan
+MAX_MASKS_IN_LOOKUP = 512
+
+
+def amenity_mask(amenities, bits):
+    """OR together the bits of the given amenity values, ignoring unknown ones"""
+    mask = 0
+    for amenity in amenities:
+        mask |= bits.get(amenity.strip(), 0)
+    return mask
+
+
+def masks_containing(mask, width):
+    """Every `width`-bit mask that has all the bits of `mask` set"""
+    free = ((1 << width) - 1) & ~mask
+    masks = []
+    subset = free
+    while True:
+        masks.append(mask | subset)
+        if not subset:
+            break
+        subset = (subset - 1) & free
+    return sorted(masks)
+
+
+def all_q(mask, width=None):
+    """Q for houses that have every amenity in `mask`
+
+    Given the mask width and only a few free bits, the matching masks are
+    enumerated, which turns the filter into an IN lookup on the indexed
+    column. Without a width it is always a bitwise AND.
+    """
+    if not mask:
+        return Q()
+    candidates = masks_containing(mask, width) if width else ()
+    if 0 < len(candidates) <= MAX_MASKS_IN_LOOKUP:
+        return Q(amenity_mask__in=candidates)
+    return Q(Exact(F('amenity_mask').bitand(mask), mask))
+
+
+def any_q(mask):
+    """Q for houses that have at least one amenity in `mask`"""
+    if not mask:
+        return Q()
+    return Q(GreaterThan(F('amenity_mask').bitand(mask), 0))
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class HousesConfig(AppConfig):
     name = 'houses'
+
+    def ready(self):
+        from . import signals  # noqa: F401
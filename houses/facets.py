@@ -0,0 +1,158 @@
+"""
+Facet counts for the browse page.
+
+Each facet value is counted against every *other* active filter plus that
+value, so the category dropdown shows how many results picking another
+category would give. All counts come from a single query of conditional
+COUNTs over the base listing queryset, cached per normalized filter set
+and listing version (houses/listing_cache.py).
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Q
+
+from .amenities import all_q, amenity_mask, any_q
+from .listing_cache import filters_digest, listing_version, single_flight
+
+FACET_CACHE_TIMEOUT = 5 * 60  # seconds; any listing change moves to a new key anyway
+
+# (key, label, min_price, max_price), lower bound inclusive, upper bound exclusive
+PRICE_BUCKETS = [
+    ('under-5k', 'Under KSh 5,000', None, Decimal('5000')),
+    ('5k-10k', 'KSh 5,000 - 10,000', Decimal('5000'), Decimal('10000')),
+    ('10k-20k', 'KSh 10,000 - 20,000', Decimal('10000'), Decimal('20000')),
+    ('20k-50k', 'KSh 20,000 - 50,000', Decimal('20000'), Decimal('50000')),
+    ('50k-plus', 'KSh 50,000+', Decimal('50000'), None),
+]
+
+# Prices have two decimal places, so an exclusive bound becomes an inclusive max_price one cent lower
+CENT = Decimal('0.01')
+
+MAX_ROOMS_FACET = 10  # the last room option means "10 or more"
+
+
+def parse_price(value):
+    """A non-negative Decimal, or None for blank/garbled input"""
+    try:
+        price = Decimal(value)
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+def parse_rooms(value):
+    try:
+        rooms = int(value)
+    except (TypeError, ValueError):
+        return None
+    return min(rooms, MAX_ROOMS_FACET) if rooms > 0 else None
+
+
+def rooms_q(rooms):
+    if rooms >= MAX_ROOMS_FACET:
+        return Q(number_of_rooms__gte=MAX_ROOMS_FACET)
+    return Q(number_of_rooms=rooms)
+
+
+def price_q(min_price, max_price):
+    condition = Q()
+    if min_price is not None:
+        condition &= Q(price__gte=min_price)
+    if max_price is not None:
+        condition &= Q(price__lte=max_price)
+    return condition
+
+
+def filter_conditions(filters, amenity_bits, indexed=True):
+    """{facet: Q} for the faceted filters that are active in `filters`
+
+    indexed=False keeps the amenity condition a compact bitwise AND, for
+    use inside the repeated aggregate filters.
+    """
+    conditions = {}
+    if filters['category']:
+        conditions['category'] = Q(category=filters['category'])
+    if filters['min_price'] is not None or filters['max_price'] is not None:
+        conditions['price'] = price_q(filters['min_price'], filters['max_price'])
+    if filters['rooms']:
+        conditions['rooms'] = rooms_q(filters['rooms'])
+    if filters['amenities']:
+        mask = amenity_mask(filters['amenities'], amenity_bits)
+        if filters['amenity_match'] == 'any':
+            conditions['amenities'] = any_q(mask)
+        else:
+            conditions['amenities'] = all_q(mask, len(amenity_bits) if indexed else None)
+    return conditions
+
+
+def _bucket_range(low, high):
+    """(min_price, max_price) browse parameters selecting exactly one bucket"""
+    return low, (high - CENT if high is not None else None)
+
+
+def _all_but(conditions, facet):
+    combined = Q()
+    for name, condition in conditions.items():
+        if name != facet:
+            combined &= condition
+    return combined
+
+
+def facet_cache_key(filters):
+    # Every category facet is counted, so any listing change makes the counts stale
+    return 'houses:facets:' + filters_digest(filters, listing_version())
+
+
+def facet_counts(queryset, filters):
+    """Counts per category, price bucket, room count and amenity for the browse filters
+
+    `queryset` is the listing queryset with only the non-faceted filters
+    (availability, location, text search, proximity) applied.
+    """
+    return single_flight(facet_cache_key(filters), lambda: _count_facets(queryset, filters), FACET_CACHE_TIMEOUT)
+
+
+def _count_facets(queryset, filters):
+    model = queryset.model
+    conditions = filter_conditions(filters, model.AMENITY_BITS, indexed=False)
+    aggregates = {}
+
+    others = _all_but(conditions, 'category')
+    for value, _label in model.CATEGORY_CHOICES:
+        aggregates[f'category_{value}'] = Count('pk', filter=others & Q(category=value))
+
+    others = _all_but(conditions, 'price')
+    for bucket, _label, low, high in PRICE_BUCKETS:
+        aggregates[f'price_{bucket}'] = Count('pk', filter=others & price_q(*_bucket_range(low, high)))
+
+    others = _all_but(conditions, 'rooms')
+    for rooms in range(1, MAX_ROOMS_FACET + 1):
+        aggregates[f'rooms_{rooms}'] = Count('pk', filter=others & rooms_q(rooms))
+
+    # "all" narrows with every extra amenity, so count on top of the current
+    # selection; "any" widens, so count against the other filters only
+    others = _all_but(conditions, 'amenities' if filters['amenity_match'] == 'any' else None)
+    for value, bit in model.AMENITY_BITS.items():
+        aggregates[f'amenity_{value}'] = Count('pk', filter=others & all_q(bit))
+
+    row = queryset.order_by().aggregate(**aggregates)
+    return {
+        'categories': [
+            {'value': value, 'label': label, 'count': row[f'category_{value}']}
+            for value, label in model.CATEGORY_CHOICES
+        ],
+        'prices': [
+            dict(zip(('min', 'max'), _bucket_range(low, high)), key=bucket, label=label,
+                 count=row[f'price_{bucket}'])
+            for bucket, label, low, high in PRICE_BUCKETS
+        ],
+        'rooms': [
+            {'value': str(rooms), 'label': f'{rooms}+' if rooms == MAX_ROOMS_FACET else str(rooms),
+             'count': row[f'rooms_{rooms}']}
+            for rooms in range(1, MAX_ROOMS_FACET + 1)
+        ],
+        'amenities': [
+            {'value': value, 'label': label, 'count': row[f'amenity_{value}']}
+            for value, label in model.AMENITIES_CHOICES
+        ],
+    }
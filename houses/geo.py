@@ -0,0 +1,155 @@
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # ~5m cells, plenty for a listing pin
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a coordinate pair as a geohash string"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    latitude = float(latitude)
+    longitude = float(longitude)
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(geohash)
+
+
+def cell_size(precision):
+    """(lat_degrees, lng_degrees) covered by one geohash cell"""
+    bits = precision * 5
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def precision_for_box(lat_delta, lng_delta):
+    """Finest precision whose cells are at least as large as the box half-extents
+
+    With cells that big, the 3x3 block around the centre covers the whole box.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lng_size = cell_size(precision)
+        if lat_size >= lat_delta and lng_size >= lng_delta:
+            return precision
+    return 1
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) around a point"""
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    lng_delta = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    return (
+        max(latitude - lat_delta, -90.0),
+        min(latitude + lat_delta, 90.0),
+        max(longitude - lng_delta, -180.0),
+        min(longitude + lng_delta, 180.0),
+    )
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """The geohash prefixes of the cell containing the point and its 8 neighbours"""
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    precision = precision_for_box((max_lat - min_lat) / 2, (max_lng - min_lng) / 2)
+    if precision == 1:
+        # The box spans continents, a prefix filter would not narrow anything
+        return []
+    # Step by just under one cell so each offset lands in the adjacent cell
+    lat_step, lng_step = (size * 0.99 for size in cell_size(precision))
+    cells = set()
+    for dlat in (-lat_step, 0, lat_step):
+        for dlng in (-lng_step, 0, lng_step):
+            lat = min(max(latitude + dlat, -90.0), 90.0)
+            lng = ((longitude + dlng + 180.0) % 360.0) - 180.0
+            cells.add(encode_geohash(lat, lng, precision))
+    return sorted(cells)
+
+
+def geohash_prefix_q(cells):
+    """Prefix lookups matching any of the given geohash cells
+
+    startswith is served by the varchar_pattern_ops index Django adds for
+    db_index CharFields on PostgreSQL, whatever the database collation.
+    """
+    if not cells:
+        return Q(geohash__gt='')
+    query = Q()
+    for cell in cells:
+        query |= Q(geohash__startswith=cell)
+    return query
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def distance_expression(latitude, longitude, lat_field='latitude', lng_field='longitude'):
+    """Haversine distance in km from a point to the lat/lng columns, as a query expression"""
+    lat = Cast(F(lat_field), FloatField())
+    lng = Cast(F(lng_field), FloatField())
+    origin_lat = Value(float(latitude), output_field=FloatField())
+    origin_lng = Value(float(longitude), output_field=FloatField())
+    a = (
+        Power(Sin(Radians(lat - origin_lat) / 2), 2)
+        + Cos(Radians(origin_lat)) * Cos(Radians(lat)) * Power(Sin(Radians(lng - origin_lng) / 2), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM, output_field=FloatField()) * ASin(Sqrt(a))
+
+
+def nearby(queryset, latitude, longitude, radius_km):
+    """Houses within radius_km of a point, nearest first, each with a distance_km annotation
+
+    Candidates are narrowed by the indexed geohash column and a lat/lng
+    bounding box before the exact haversine distance is computed.
+    """
+    latitude = float(latitude)
+    longitude = float(longitude)
+    radius_km = float(radius_km)
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    return (
+        queryset
+        .filter(geohash_prefix_q(covering_cells(latitude, longitude, radius_km)))
+        .filter(
+            latitude__gte=min_lat, latitude__lte=max_lat,
+            longitude__gte=min_lng, longitude__lte=max_lng,
+        )
+        .annotate(distance_km=distance_expression(latitude, longitude))
+        .filter(distance_km__lte=radius_km)
+        .order_by('distance_km', '-created_at')
+    )
@@ -0,0 +1,246 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from .listing_cache import bump_listing_version
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (480, 360)   # listing cards, cropped to fill
+MEDIUM_SIZE = (1280, 960)     # detail page, fitted inside
+
+# On-demand resizing (see resized_media in houses/views.py)
+RESIZE_SOURCE_DIRS = ('houses/', 'profile_pictures/')
+# The only renditions resized_media serves, so clients can't make the server resize (and the
+# cache hold) arbitrary sizes; settings.RESIZE_SIZES overrides this
+RESIZE_SIZES = [(64, 64), (128, 128), (320, 240), (480, 360), (960, 720)]
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'HOUSE_IMAGE_WORKERS', 2),
+            thread_name_prefix='house-images',
+        )
+    return _executor
+
+
+def derivative_format():
+    """WebP when Pillow was built with it, JPEG otherwise"""
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def load_image(source):
+    """Decode an image file, applying its EXIF orientation so it is upright"""
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image.mode in ('P', 'LA', 'PA') else 'RGB')
+    return image
+
+
+def render_image(image, size, crop=False):
+    """Resize a decoded image and return the re-encoded bytes and extension
+
+    Only pixel data is written back out, so EXIF (including GPS tags from
+    phone cameras), ICC profiles and comments are dropped.
+    """
+    image_format, extension = derivative_format()
+    if crop:
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+    else:
+        image = image.copy()
+        image.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    image.save(output, image_format, quality=82, optimize=True)
+    return output.getvalue(), extension
+
+
+def generate_derivatives(image_id):
+    """Write the thumbnail and medium renditions for one HouseImage"""
+    from .models import House, HouseImage
+
+    house_image = HouseImage.objects.filter(pk=image_id).first()
+    if house_image is None or not house_image.image:
+        return
+
+    with house_image.image.open('rb') as source:
+        image = load_image(source)
+
+    stem = os.path.splitext(os.path.basename(house_image.image.name))[0]
+    updates = {}
+    for field_name, size, crop in (('thumbnail', THUMBNAIL_SIZE, True), ('medium', MEDIUM_SIZE, False)):
+        data, extension = render_image(image, size, crop=crop)
+        field = getattr(house_image, field_name)
+        field.save(f'{stem}.{extension}', ContentFile(data), save=False)
+        updates[field_name] = field.name
+
+    # A plain UPDATE so the post_save receivers don't schedule this again
+    HouseImage.objects.filter(pk=image_id).update(**updates)
+    # Listing cards switch to the thumbnail
+    bump_listing_version(House.objects.filter(pk=house_image.house_id).values_list('category', flat=True).first())
+
+
+def _run_in_worker(image_id):
+    try:
+        generate_derivatives(image_id)
+    except Exception:
+        logger.exception('Could not generate derivatives for HouseImage %s', image_id)
+    finally:
+        connection.close()
+
+
+def schedule_derivatives(image_id):
+    """Queue derivative generation once the upload's transaction commits"""
+    if not getattr(settings, 'HOUSE_IMAGE_ASYNC', True):
+        transaction.on_commit(lambda: generate_derivatives(image_id))
+        return
+    transaction.on_commit(lambda: get_executor().submit(_run_in_worker, image_id))
+
+
+class ResizeCache:
+    """Resized renditions on local disk, evicted least-recently-used by total bytes
+
+    Hits bump the file's mtime, so mtime order is recency order. The byte
+    total is tracked in-process and re-measured from disk whenever an
+    eviction runs, which corrects for other worker processes sharing the
+    directory.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def _entries(self):
+        try:
+            with os.scandir(self.directory) as entries:
+                return [entry for entry in entries if entry.is_file() and not entry.name.startswith('.')]
+        except FileNotFoundError:
+            return []
+
+    def _ensure_total(self):
+        if self._total_bytes is None:
+            self._total_bytes = 0
+            for entry in self._entries():
+                try:
+                    self._total_bytes += entry.stat().st_size
+                except FileNotFoundError:
+                    pass
+
+    def path_for(self, key, extension):
+        return os.path.join(self.directory, f'{key}.{extension}')
+
+    def get(self, key, extension):
+        """Path of a cached rendition (marking it recently used) or None"""
+        path = self.path_for(key, extension)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, extension, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(key, extension)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._ensure_total()
+            self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def _evict(self, keep):
+        stats = []
+        for entry in self._entries():
+            try:
+                stats.append((entry, entry.stat()))
+            except FileNotFoundError:
+                # Another worker evicted it since the scan
+                pass
+        stats.sort(key=lambda item: item[1].st_mtime)
+        total = sum(stat.st_size for _entry, stat in stats)
+        # Trim to 90% so a full cache doesn't rescan on every write
+        target = self.max_bytes * 0.9
+        for entry, stat in stats:
+            if total <= target:
+                break
+            if entry.path == keep:
+                continue
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
+        self._total_bytes = total
+
+
+_resize_cache = None
+
+
+def get_resize_cache():
+    global _resize_cache
+    if _resize_cache is None:
+        _resize_cache = ResizeCache(
+            getattr(settings, 'RESIZE_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'cache', 'resize')),
+            getattr(settings, 'RESIZE_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+        )
+    return _resize_cache
+
+
+def is_allowed_size(width, height):
+    return (width, height) in {tuple(size) for size in getattr(settings, 'RESIZE_SIZES', RESIZE_SIZES)}
+
+
+def is_resizable_source(name):
+    """Only uploaded listing/profile images, and no path tricks"""
+    if not name or name.startswith('/') or '\\' in name:
+        return False
+    if os.path.normpath(name) != name or '..' in name.split('/'):
+        return False
+    return name.startswith(RESIZE_SOURCE_DIRS)
+
+
+def resized_rendition(name, width, height):
+    """Return (cache_path, etag, content_type, last_modified) for a cropped width x height rendition
+
+    Raises FileNotFoundError if the source image does not exist.
+    """
+    if not default_storage.exists(name):
+        raise FileNotFoundError(name)
+    modified = default_storage.get_modified_time(name)
+    size = default_storage.size(name)
+    image_format, extension = derivative_format()
+    key = hashlib.sha256(
+        f'{name}:{modified.timestamp()}:{size}:{width}x{height}:{image_format}'.encode()
+    ).hexdigest()[:40]
+
+    cache = get_resize_cache()
+    path = cache.get(key, extension)
+    if path is None:
+        with default_storage.open(name, 'rb') as source:
+            image = load_image(source)
+        data, extension = render_image(image, (width, height), crop=True)
+        path = cache.put(key, extension, data)
+    return path, f'"{key}"', f'image/{"jpeg" if extension == "jpg" else extension}', modified
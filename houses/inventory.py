@@ -0,0 +1,66 @@
+"""
+Race-free unit inventory for booking approvals.
+
+Units are taken and returned with a single conditional UPDATE
+(`... SET available_units = available_units - n WHERE available_units >= n`)
+that also keeps is_available in step, so concurrent approvals can never
+oversell a house or lose each other's writes, and only the inventory
+columns are rewritten instead of the whole row.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .listing_cache import bump_listing_version
+from .stats import record_units_change
+
+
+def _available_after(units):
+    # SET expressions see the row as it was before the UPDATE
+    return Case(When(available_units__gt=units, then=Value(True)), default=Value(False))
+
+
+def reserve_units(house_id, units=1):
+    """Take `units` units of a house in one statement
+
+    Returns the number of units left, or None (and changes nothing) if
+    fewer than `units` were available.
+    """
+    from .models import House
+
+    with transaction.atomic():
+        updated = House.objects.filter(pk=house_id, available_units__gte=units).update(
+            available_units=F('available_units') - units,
+            is_available=_available_after(units),
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            return None
+        # Our UPDATE holds the row lock, so this reads our own write
+        category, remaining = House.objects.filter(pk=house_id).values_list('category', 'available_units').get()
+        record_units_change(category, -units, -1 if remaining == 0 else 0)
+        # Browse cards show the unit count, and at 0 the listing leaves the results
+        bump_listing_version(category)
+    return remaining
+
+
+def release_units(house_id, units=1):
+    """Return `units` units to a house, never beyond total_units
+
+    Returns the number of units now available, or None if that would
+    exceed total_units.
+    """
+    from .models import House
+
+    with transaction.atomic():
+        updated = House.objects.filter(pk=house_id, available_units__lte=F('total_units') - units).update(
+            available_units=F('available_units') + units,
+            is_available=Value(True),
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            return None
+        category, available = House.objects.filter(pk=house_id).values_list('category', 'available_units').get()
+        record_units_change(category, units, 1 if available == units else 0)
+        bump_listing_version(category)
+    return available
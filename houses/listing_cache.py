@@ -0,0 +1,114 @@
+"""
+Versioned cache of browse results.
+
+Every listing category has a version number, kept in its CategoryStat
+row so cache eviction can never lose it. Saving or deleting a House or
+one of its images bumps its category's version, and so does every
+inventory change, since the cards show the unit count (houses/signals.py,
+houses/inventory.py). A bump is an F() increment inside the writer's
+transaction, so concurrent bumps never collapse into one and readers see
+the new version together with the data. Cached browse results and facet
+counts include the versions they depend on in their key, so a change
+makes the old entries unreachable without deleting them: a category
+filter depends on that category only, anything else on all of them.
+
+A browse entry holds the ordered ids of the matching listings (up to
+MAX_CACHED_IDS) and their total, so a popular filter combination costs
+one cache lookup plus a primary-key fetch of the page. When an entry is
+missing, single_flight() lets one request recompute it while the others
+wait briefly for its result, so an expiring popular key doesn't send
+every concurrent request to the database. Its lock is a cache.add(),
+which needs a backend where add() is atomic across processes (Redis,
+Memcached), as configured in settings.CACHES.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import F
+
+from roomify.pagination import ordered_ids
+
+RESULT_CACHE_TIMEOUT = 5 * 60
+MAX_CACHED_IDS = 1000  # 50 pages; deeper pages are paginated in the database
+LOCK_TIMEOUT = 10  # seconds a recompute may hold the lock before another request may try
+LOCK_WAIT = 2.0  # seconds a request waits for someone else's recompute
+POLL_INTERVAL = 0.05
+
+
+def _categories(categories):
+    from .models import House
+
+    if categories is None:
+        return [category for category, _label in House.CATEGORY_CHOICES]
+    return sorted(set(categories))
+
+
+def listing_version(categories=None):
+    """The current version of the given categories (all of them by default) as one string"""
+    from .models import CategoryStat
+
+    categories = _categories(categories)
+    versions = dict(CategoryStat.objects.filter(category__in=categories).values_list('category', 'version'))
+    return '-'.join(str(versions.get(category, 0)) for category in categories)
+
+
+def bump_listing_version(*categories):
+    """Invalidate cached results for these categories; takes effect when the current transaction commits"""
+    from .models import CategoryStat
+
+    categories = sorted({category for category in categories if category})
+    for category in categories:
+        stats = CategoryStat.objects.filter(category=category)
+        if not stats.update(version=F('version') + 1):
+            CategoryStat.objects.get_or_create(category=category)
+            stats.update(version=F('version') + 1)
+
+
+def filters_digest(filters, version=''):
+    normalized = tuple(
+        (name, tuple(sorted(value)) if isinstance(value, (list, tuple)) else str(value))
+        for name, value in sorted(filters.items())
+    )
+    return hashlib.md5(repr((normalized, version)).encode()).hexdigest()
+
+
+def single_flight(key, compute, timeout):
+    """cache.get_or_set() where only one caller at a time runs `compute` for a missing key"""
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock)
+        return value
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    # The recompute is slow or its worker died; don't hold this request any longer
+    return compute()
+
+
+def browse_results(queryset, filters):
+    """{'ids', 'total', 'complete'} for the filtered browse queryset, cached per filter set and listing version"""
+    categories = [filters['category']] if filters['category'] else None
+    key = 'houses:results:' + filters_digest(filters, listing_version(categories))
+
+    def compute():
+        ids = ordered_ids(queryset, MAX_CACHED_IDS + 1)
+        complete = len(ids) <= MAX_CACHED_IDS
+        return {
+            'ids': ids[:MAX_CACHED_IDS],
+            'total': len(ids) if complete else queryset.count(),
+            'complete': complete,
+        }
+
+    return single_flight(key, compute, RESULT_CACHE_TIMEOUT)
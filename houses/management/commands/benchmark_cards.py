@@ -0,0 +1,99 @@
+import json
+import re
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from .benchmark_views import Command as BenchmarkViewsCommand, _git_commit, _percentile
+
+DEFAULT_VIEWS = ['home', 'browse_properties', 'browse_properties_filtered', 'movers_list']
+TEMPLATE_TIMING_RE = re.compile(r'tpl;dur=([\d.]+)')
+
+
+class Command(BenchmarkViewsCommand):
+    help = (
+        'Compare render time of the list pages with every card rendered and with cached card '
+        'fragments (roomify/fragments.py). Run seed_data first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per view and mode')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per view and mode first (fills the fragment cache)')
+        parser.add_argument('--username', help='User for the logged-in pages (default: the landlord with most listings)')
+        parser.add_argument('--view', action='append', dest='views', help='Only run this view (repeatable)')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file ("-" for stdout)')
+
+    def fetch(self, client, url):
+        response = super().fetch(client, url)
+        # Template time as measured by roomify.instrumentation, cards included
+        match = TEMPLATE_TIMING_RE.search(response.get('Server-Timing', ''))
+        self.template_timings.append(float(match.group(1)) if match else 0.0)
+        return response
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        user = self.pick_user(options['username'])
+        views = options['views'] or DEFAULT_VIEWS
+        iterations, warmup = options['iterations'], options['warmup']
+
+        results = {}
+        instrumented = override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            INSTRUMENTATION_SAMPLE_RATE=1.0,
+            INSTRUMENTATION_SERVER_TIMING=True,
+        )
+        with instrumented:
+            targets = [target for target in self.targets(user) if target[0] in views]
+            for mode, timeout in (('uncached', 0), ('cached', getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 0) or 60 * 60)):
+                with override_settings(FRAGMENT_CACHE_TIMEOUT=timeout):
+                    # New clients, so the middleware picks up the overridden settings
+                    anonymous = Client()
+                    logged_in = Client()
+                    logged_in.force_login(user)
+                    rows = {}
+                    for name, url, needs_login in targets:
+                        self.template_timings = []
+                        row = self.measure(logged_in if needs_login else anonymous, url, iterations, warmup)
+                        timed = sorted(self.template_timings[warmup:warmup + iterations])
+                        row['template_p50_ms'] = round(_percentile(timed, 0.50), 3)
+                        row['template_p95_ms'] = round(_percentile(timed, 0.95), 3)
+                        rows[name] = {'url': url, **row}
+                    results[mode] = rows
+
+        self.print_modes(results, self.table_output(options['json_path']))
+        if options['json_path']:
+            report = {
+                'meta': {
+                    'commit': _git_commit(),
+                    'timestamp': int(time.time()),
+                    'user': user.username,
+                    'iterations': iterations,
+                    'warmup': warmup,
+                },
+                'modes': results,
+            }
+            if options['json_path'] == '-':
+                self.stdout.write(json.dumps(report, indent=2))
+            else:
+                with open(options['json_path'], 'w') as output:
+                    json.dump(report, output, indent=2)
+                self.stdout.write(self.style.SUCCESS(f'Wrote {options["json_path"]}'))
+
+    def print_modes(self, results, out):
+        out.write(f'{"mode":<10}{"view":<28}{"p50 ms":>9}{"p95 ms":>9}{"tpl p50":>9}{"tpl p95":>9}')
+        baseline = results.get('uncached', {})
+        for mode, rows in results.items():
+            for name, row in rows.items():
+                line = (
+                    f'{mode:<10}{name:<28}{row["p50_ms"]:>9.2f}{row["p95_ms"]:>9.2f}'
+                    f'{row["template_p50_ms"]:>9.2f}{row["template_p95_ms"]:>9.2f}'
+                )
+                before = baseline.get(name)
+                if mode != 'uncached' and before and before['template_p50_ms']:
+                    change = 100 * (row['template_p50_ms'] - before['template_p50_ms']) / before['template_p50_ms']
+                    line += f'   tpl p50 {change:+.1f}%'
+                out.write(line)
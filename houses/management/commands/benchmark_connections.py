@@ -0,0 +1,127 @@
+import json
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from .benchmark_views import Command as BenchmarkViewsCommand, _git_commit
+
+DEFAULT_VIEWS = ['home', 'browse_properties']
+
+
+@contextmanager
+def connection_mode(max_age, pool):
+    """Reconnect the default database with this CONN_MAX_AGE and pool option for the block"""
+    settings_dict = connection.settings_dict
+    saved = settings_dict['CONN_MAX_AGE'], settings_dict['OPTIONS'].get('pool')
+    connection.close()
+    settings_dict['CONN_MAX_AGE'] = max_age
+    if pool:
+        settings_dict['OPTIONS']['pool'] = pool
+    else:
+        settings_dict['OPTIONS'].pop('pool', None)
+    try:
+        yield
+    finally:
+        connection.close()
+        settings_dict['CONN_MAX_AGE'] = saved[0]
+        if saved[1]:
+            settings_dict['OPTIONS']['pool'] = saved[1]
+        else:
+            settings_dict['OPTIONS'].pop('pool', None)
+
+
+class Command(BenchmarkViewsCommand):
+    help = (
+        'Compare page latency with a new database connection per request, persistent connections '
+        'and the connection pool (PostgreSQL only). Run seed_data first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per view and mode')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per view and mode first')
+        parser.add_argument('--username', help='User for the logged-in pages (default: the landlord with most listings)')
+        parser.add_argument('--view', action='append', dest='views', help='Only run this view (repeatable, default: home and browse_properties)')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file ("-" for stdout)')
+
+    def modes(self):
+        """(name, CONN_MAX_AGE, pool option) for every connection strategy this database supports"""
+        modes = [('per-request', 0, None), ('persistent', None, None)]
+        if connection.vendor == 'postgresql':
+            modes.append(('pooled', 0, connection.settings_dict['OPTIONS'].get('pool') or True))
+        return modes
+
+    def fetch(self, client, url):
+        response = super().fetch(client, url)
+        # The test client keeps the connection open between requests; a real server's
+        # request_finished handler would close it (or hand it back to the pool) here
+        close_old_connections()
+        return response
+
+    def connect_time(self, samples=20):
+        """Median ms to get a usable connection after the previous request released it"""
+        timings = []
+        for _ in range(samples):
+            close_old_connections()
+            started = time.perf_counter()
+            connection.ensure_connection()
+            timings.append((time.perf_counter() - started) * 1000)
+        return round(statistics.median(timings), 3)
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        user = self.pick_user(options['username'])
+        views = options['views'] or DEFAULT_VIEWS
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            targets = [target for target in self.targets(user) if target[0] in views]
+            for mode, max_age, pool in self.modes():
+                anonymous = Client()
+                logged_in = Client()
+                logged_in.force_login(user)
+                with connection_mode(max_age, pool):
+                    rows = {'connect_ms': None, 'views': {}}
+                    for name, url, needs_login in targets:
+                        client = logged_in if needs_login else anonymous
+                        rows['views'][name] = {'url': url, **self.measure(client, url, options['iterations'], options['warmup'])}
+                    if max_age == 0:
+                        rows['connect_ms'] = self.connect_time()
+                    results[mode] = rows
+
+        self.print_modes(results, self.table_output(options['json_path']))
+        if options['json_path']:
+            report = {
+                'meta': {
+                    'commit': _git_commit(),
+                    'timestamp': int(time.time()),
+                    'database': connection.vendor,
+                    'user': user.username,
+                    'iterations': options['iterations'],
+                },
+                'modes': results,
+            }
+            if options['json_path'] == '-':
+                self.stdout.write(json.dumps(report, indent=2))
+            else:
+                with open(options['json_path'], 'w') as output:
+                    json.dump(report, output, indent=2)
+                self.stdout.write(self.style.SUCCESS(f'Wrote {options["json_path"]}'))
+
+    def print_modes(self, results, out):
+        out.write(f'{"mode":<14}{"view":<28}{"p50 ms":>9}{"p95 ms":>9}{"connect ms":>12}')
+        baseline = results.get('per-request', {}).get('views', {})
+        for mode, rows in results.items():
+            connect = '-' if rows['connect_ms'] is None else f'{rows["connect_ms"]:.2f}'
+            for name, row in rows['views'].items():
+                line = f'{mode:<14}{name:<28}{row["p50_ms"]:>9.2f}{row["p95_ms"]:>9.2f}{connect:>12}'
+                before = baseline.get(name)
+                if mode != 'per-request' and before and before['p50_ms']:
+                    line += f'   p50 {100 * (row["p50_ms"] - before["p50_ms"]) / before["p50_ms"]:+.1f}%'
+                out.write(line)
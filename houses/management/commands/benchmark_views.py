@@ -0,0 +1,200 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError, OutputWrapper
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from houses.models import House
+
+User = get_user_model()
+
+
+def _percentile(ordered, fraction):
+    """Linear-interpolated percentile of an already sorted list"""
+    if len(ordered) == 1:
+        return ordered[0]
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the main pages in-process and report latency percentiles, query counts and memory '
+        'allocations per view. Run seed_data first; use --json to save results for comparing commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per view')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per view first (fills caches)')
+        parser.add_argument('--username', help='User for the logged-in pages (default: the landlord with most listings)')
+        parser.add_argument('--view', action='append', dest='views', help='Only run this view (repeatable)')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file ("-" for stdout)')
+        parser.add_argument('--compare', help='Earlier --json output to print changes against')
+
+    def targets(self, user):
+        """(name, url, needs login) for every benchmarked page"""
+        house = (
+            House.objects.filter(image_count__gt=0).order_by('-image_count', 'pk').first()
+            or House.objects.order_by('pk').first()
+        )
+        if house is None:
+            raise CommandError('No listings to benchmark; run `manage.py seed_data` first')
+        return [
+            ('home', reverse('home'), False),
+            ('browse_properties', reverse('browse_properties'), False),
+            ('browse_properties_filtered', reverse('browse_properties') + '?category=apartment&max_price=30000&amenities=wifi', False),
+            ('property_detail', reverse('property_detail', args=[house.pk]), True),
+            ('dashboard', reverse('dashboard'), True),
+            ('movers_list', reverse('movers_list'), False),
+            ('manage_bookings', reverse('manage_bookings'), True),
+        ]
+
+    def table_output(self, json_path):
+        """Where the tables go: stderr when the JSON report is written to stdout"""
+        if json_path == '-':
+            # A plain wrapper, so the tables aren't styled as errors on a terminal
+            return OutputWrapper(self.stderr._out)
+        return self.stdout
+
+    def pick_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'No user named {username!r}')
+        user = User.objects.annotate(listings=Count('properties')).order_by('-listings', 'pk').first()
+        if user is None:
+            raise CommandError('No users to log in as; run `manage.py seed_data` first')
+        return user
+
+    def measure(self, client, url, iterations, warmup):
+        for _ in range(warmup):
+            self.fetch(client, url)
+
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            self.fetch(client, url)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        # Queries and allocations come from one extra request, so tracing doesn't skew the timings
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.fetch(client, url)
+            allocated, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'status': response.status_code,
+            'iterations': iterations,
+            'p50_ms': round(_percentile(timings, 0.50), 3),
+            'p95_ms': round(_percentile(timings, 0.95), 3),
+            'p99_ms': round(_percentile(timings, 0.99), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'max_ms': round(timings[-1], 3),
+            'queries': len(queries),
+            'query_ms': round(sum(float(query['time']) for query in queries.captured_queries) * 1000, 3),
+            'allocated_kb': round(allocated / 1024, 1),
+            'peak_kb': round(peak / 1024, 1),
+            'response_kb': round(len(response.content) / 1024, 1),
+        }
+
+    def fetch(self, client, url):
+        response = client.get(url)
+        if response.status_code >= 400:
+            raise CommandError(f'GET {url} returned {response.status_code}')
+        return response
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        user = self.pick_user(options['username'])
+
+        anonymous = Client()
+        logged_in = Client()
+        logged_in.force_login(user)
+
+        results = {}
+        # The test client sends Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, url, needs_login in self.targets(user):
+                if options['views'] and name not in options['views']:
+                    continue
+                client = logged_in if needs_login else anonymous
+                results[name] = {'url': url, **self.measure(client, url, options['iterations'], options['warmup'])}
+
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'timestamp': int(time.time()),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'user': user.username,
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+            },
+            'views': results,
+        }
+        out = self.table_output(options['json_path'])
+        self.print_table(results, out)
+        if options['compare']:
+            self.print_comparison(results, options['compare'], out)
+        if options['json_path'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["json_path"]}'))
+
+    def print_table(self, results, out):
+        out.write(f'{"view":<28}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}{"alloc KB":>10}{"peak KB":>10}')
+        for name, row in results.items():
+            out.write(
+                f'{name:<28}{row["p50_ms"]:>9.2f}{row["p95_ms"]:>9.2f}{row["p99_ms"]:>9.2f}'
+                f'{row["queries"]:>9}{row["allocated_kb"]:>10.1f}{row["peak_kb"]:>10.1f}'
+            )
+
+    def print_comparison(self, results, path, out):
+        try:
+            with open(path) as baseline_file:
+                baseline = json.load(baseline_file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Could not read {path}: {exc}')
+        out.write(f'\nAgainst {baseline["meta"].get("commit") or path}:')
+        for name, row in results.items():
+            before = baseline['views'].get(name)
+            if before is None:
+                continue
+            changes = []
+            for field in ('p50_ms', 'p95_ms'):
+                if before[field]:
+                    changes.append(f'{field} {100 * (row[field] - before[field]) / before[field]:+.1f}%')
+            changes.append(f'queries {row["queries"] - before["queries"]:+d}')
+            out.write(f'  {name:<28}' + ', '.join(changes))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from houses.imaging import generate_derivatives
+from houses.models import HouseImage
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnail and medium renditions for listing images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Regenerate every image, not only those without derivatives',
+        )
+
+    def handle(self, *args, **options):
+        images = HouseImage.objects.order_by('pk')
+        if not options['all']:
+            images = images.filter(thumbnail='')
+
+        processed = failed = 0
+        for image_id in images.values_list('pk', flat=True).iterator():
+            try:
+                generate_derivatives(image_id)
+                processed += 1
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'HouseImage {image_id}: {exc}')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} image(s), {failed} failed'))
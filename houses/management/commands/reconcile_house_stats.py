@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from houses.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-category listing counters from House (run periodically, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        drift = reconcile()
+        for category, (old, new) in sorted(drift.items()):
+            changes = ', '.join(f'{field} {old[field]} -> {new[field]}' for field in new if old[field] != new[field])
+            self.stdout.write(f'{category}: {changes}')
+        self.stdout.write(self.style.SUCCESS(f'Corrected {len(drift)} category counter(s)'))
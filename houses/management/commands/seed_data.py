@@ -0,0 +1,369 @@
+import io
+import random
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from booking.counters import reconcile as reconcile_booking_counters
+from booking.models import Booking, MoverBooking
+from houses.amenities import amenity_mask
+from houses.geo import encode_geohash, haversine_km
+from houses.listing_cache import bump_listing_version
+from houses.models import House, HouseImage
+from houses.search import build_search_document, column_search_vector, supports_full_text
+from houses.stats import reconcile
+from movers.models import MoverRating, MoverService
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'seed-'
+PASSWORD = 'seed-password'
+IMAGE_VARIANTS = 12
+HISTORY_DAYS = 365
+BATCH_SIZE = 500
+
+# Neighbourhoods around Nairobi-area campuses: (name, latitude, longitude)
+AREAS = [
+    ('Juja', -1.1018, 37.0144),
+    ('Kahawa Wendani', -1.1880, 36.9274),
+    ('Ruiru', -1.1466, 36.9609),
+    ('Madaraka', -1.3090, 36.8140),
+    ('Parklands', -1.2615, 36.8145),
+    ('Ngara', -1.2740, 36.8250),
+    ('Rongai', -1.3960, 36.7560),
+    ('Kikuyu', -1.2460, 36.6630),
+    ('Kilimani', -1.2900, 36.7830),
+    ('South B', -1.3110, 36.8400),
+]
+
+# Monthly rent ranges in KSh
+PRICE_RANGES = {
+    'hostel': (3500, 9000),
+    'roommate': (5000, 14000),
+    'apartment': (12000, 45000),
+    'standalone': (20000, 80000),
+}
+
+ADJECTIVES = ['Sunny', 'Quiet', 'Modern', 'Spacious', 'Cosy', 'Bright', 'Affordable', 'Secure', 'Leafy', 'Central']
+NOUNS = {
+    'hostel': 'Hostel', 'roommate': 'Shared Room', 'apartment': 'Apartment', 'standalone': 'House',
+}
+MOVER_NAMES = ['Swift', 'Campus', 'Safari', 'Jiji', 'Haraka', 'Mwangaza', 'Baraka', 'Tembea', 'Upesi', 'Pamoja']
+
+BOOKING_STATUSES = [('pending', 40), ('approved', 35), ('rejected', 15), ('cancelled', 10)]
+MOVER_BOOKING_STATUSES = [('pending', 25), ('confirmed', 35), ('completed', 25), ('rejected', 8), ('cancelled', 7)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Create a reproducible synthetic dataset (users, listings with images, bookings, movers, '
+        f'ratings) for load tests and benchmark_views. Seeded users are named {USERNAME_PREFIX}* '
+        f'and log in with the password "{PASSWORD}".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--users', type=int, default=500, help='Tenants')
+        parser.add_argument('--landlords', type=int, default=50)
+        parser.add_argument('--houses', type=int, default=2000)
+        parser.add_argument('--images-per-house', type=int, default=4, help='Up to this many images per listing')
+        parser.add_argument('--movers', type=int, default=40, help='Mover services')
+        parser.add_argument('--bookings', type=int, default=3000)
+        parser.add_argument('--mover-bookings', type=int, default=2000)
+        parser.add_argument('--ratings', type=int, default=1500)
+        parser.add_argument('--flush', action='store_true', help='Delete previously seeded data first')
+
+    def handle(self, *args, **options):
+        if options['landlords'] < 1 or options['users'] < 1:
+            raise CommandError('--users and --landlords must be at least 1')
+        if options['flush']:
+            deleted, _ = User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+            self.stdout.write(f'Deleted {deleted} previously seeded row(s)')
+        elif User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError('Seeded data already exists; pass --flush to replace it')
+
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        with transaction.atomic():
+            tenants, landlords, mover_owners = self.create_users(options)
+            houses = self.create_houses(landlords, options)
+            self.create_images(houses, options['images_per_house'])
+            self.create_bookings(houses, tenants, options['bookings'])
+            movers = self.create_movers(mover_owners, options['movers'])
+            self.create_ratings(movers, tenants, options['ratings'])
+            self.create_mover_bookings(movers, tenants, options['mover_bookings'])
+        reconcile()
+        reconcile_booking_counters()
+        # bulk_create skipped the signals that invalidate cached browse results
+        bump_listing_version(*(category for category, _label in House.CATEGORY_CHOICES))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(tenants)} tenants, {len(landlords)} landlords, {len(houses)} listings, '
+            f'{len(movers)} movers (seed {options["seed"]})'
+        ))
+
+    def created_at(self):
+        """A timestamp somewhere in the last HISTORY_DAYS"""
+        return self.now - timedelta(seconds=self.rng.randrange(HISTORY_DAYS * 24 * 60 * 60))
+
+    def backdate(self, model, objects, fields=('created_at', 'updated_at')):
+        # auto_now_add overrides created_at on insert, so spread the history afterwards
+        for obj in objects:
+            stamp = self.created_at()
+            for field in fields:
+                setattr(obj, field, stamp)
+        model.objects.bulk_update(objects, list(fields), batch_size=BATCH_SIZE)
+
+    def create_users(self, options):
+        password = make_password(PASSWORD)  # hashed once, shared by every seeded user
+
+        def users(role, count):
+            return [
+                User(
+                    username=f'{USERNAME_PREFIX}{role}-{index:05d}',
+                    email=f'{USERNAME_PREFIX}{role}-{index:05d}@example.com',
+                    first_name=role.title(),
+                    last_name=f'{index:05d}',
+                    password=password,
+                )
+                for index in range(count)
+            ]
+
+        tenants = User.objects.bulk_create(users('tenant', options['users']), batch_size=BATCH_SIZE)
+        landlords = User.objects.bulk_create(users('landlord', options['landlords']), batch_size=BATCH_SIZE)
+        mover_owners = User.objects.bulk_create(users('mover', max(options['movers'], 1)), batch_size=BATCH_SIZE)
+        return tenants, landlords, mover_owners
+
+    def point_near(self, spread=0.02):
+        name, latitude, longitude = self.rng.choice(AREAS)
+        return (
+            name,
+            Decimal(f'{latitude + self.rng.uniform(-spread, spread):.6f}'),
+            Decimal(f'{longitude + self.rng.uniform(-spread, spread):.6f}'),
+        )
+
+    def create_houses(self, landlords, options):
+        rng = self.rng
+        categories = [value for value, _label in House.CATEGORY_CHOICES]
+        amenity_values = list(House.AMENITY_BITS)
+        # Skewed ownership: a few landlords hold most of the listings
+        weights = [1 / (rank + 1) for rank in range(len(landlords))]
+        houses = []
+        for index in range(options['houses']):
+            category = rng.choice(categories)
+            area, latitude, longitude = self.point_near()
+            low, high = PRICE_RANGES[category]
+            amenities = rng.sample(amenity_values, rng.randint(0, 6))
+            total_units = 1 if category == 'standalone' else rng.randint(1, 30)
+            house = House(
+                landlord=rng.choices(landlords, weights)[0],
+                title=f'{rng.choice(ADJECTIVES)} {NOUNS[category]} in {area}',
+                description=(
+                    f'{NOUNS[category]} near campus in {area}. '
+                    f'{rng.randint(1, 20)} minutes walk to the main gate, close to shops and matatu stages.'
+                ),
+                category=category,
+                price=Decimal(round(rng.uniform(low, high), -2)),
+                number_of_rooms=1 if category in ('hostel', 'roommate') else rng.randint(1, 5),
+                total_units=total_units,
+                available_units=total_units,
+                is_available=True,
+                location=f'{area}, Nairobi',
+                latitude=latitude,
+                longitude=longitude,
+                geohash=encode_geohash(latitude, longitude),
+                amenities=','.join(amenities),
+                amenity_mask=amenity_mask(amenities, House.AMENITY_BITS),
+                contact_phone=f'07{rng.randrange(10 ** 8):08d}',
+                contact_email=f'listing-{index:05d}@example.com',
+            )
+            house.search_document = build_search_document(house)
+            houses.append(house)
+
+        houses = House.objects.bulk_create(houses, batch_size=BATCH_SIZE)
+        self.backdate(House, houses)
+        using = router.db_for_write(House)
+        if supports_full_text(using):
+            House.objects.filter(pk__in=[house.pk for house in houses]).update(search_vector=column_search_vector())
+        return houses
+
+    def image_files(self):
+        """A small set of placeholder photos shared by all seeded listings"""
+        from PIL import Image
+
+        names = []
+        for index in range(IMAGE_VARIANTS):
+            name = f'houses/seed/seed-{index:02d}.jpg'
+            if not default_storage.exists(name):
+                hue = self.rng.randrange(256)
+                buffer = io.BytesIO()
+                Image.new('RGB', (1200, 800), (hue, 255 - hue, (hue * 7) % 256)).save(buffer, 'JPEG', quality=70)
+                name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            names.append(name)
+        return names
+
+    def create_images(self, houses, per_house):
+        if per_house < 1:
+            return
+        files = self.image_files()
+        images = []
+        for house in houses:
+            for position in range(self.rng.randint(0, per_house)):
+                images.append(HouseImage(
+                    house=house,
+                    image=self.rng.choice(files),
+                    caption=f'Photo {position + 1}',
+                    is_primary=position == 0,
+                ))
+        HouseImage.objects.bulk_create(images, batch_size=BATCH_SIZE)
+        # bulk_create sends no signals: set the denormalized cover and count in two updates
+        seeded = House.objects.filter(pk__in=[house.pk for house in houses])
+        first = HouseImage.objects.filter(house=OuterRef('pk')).order_by('-is_primary', 'uploaded_at', 'pk')
+        counts = HouseImage.objects.filter(house=OuterRef('pk')).order_by().values('house').annotate(total=Count('pk'))
+        seeded.update(
+            primary_image=Subquery(first.values('pk')[:1]),
+            image_count=Coalesce(Subquery(counts.values('total')), 0),
+        )
+
+    def create_bookings(self, houses, tenants, count):
+        rng = self.rng
+        statuses, weights = zip(*BOOKING_STATUSES)
+        taken = set()
+        approved = Counter()
+        bookings = []
+        attempts = 0
+        while len(bookings) < count and attempts < count * 5:
+            attempts += 1
+            tenant, house = rng.choice(tenants), rng.choice(houses)
+            if (tenant.pk, house.pk) in taken:
+                continue
+            status = rng.choices(statuses, weights)[0]
+            if status == 'approved':
+                if approved[house.pk] >= house.total_units:
+                    status = 'pending'
+                else:
+                    approved[house.pk] += 1
+            taken.add((tenant.pk, house.pk))
+            bookings.append(Booking(
+                tenant=tenant,
+                property=house,
+                move_in_date=(self.now + timedelta(days=rng.randint(-200, 90))).date(),
+                lease_duration_months=rng.choice([3, 6, 12, 12, 12, 24]),
+                tenant_name=f'{tenant.first_name} {tenant.last_name}',
+                tenant_phone=f'07{rng.randrange(10 ** 8):08d}',
+                tenant_email=tenant.email,
+                message=rng.choice(['', 'Is the unit still available?', 'Can I view it this weekend?']),
+                status=status,
+            ))
+        bookings = Booking.objects.bulk_create(bookings, batch_size=BATCH_SIZE)
+        self.backdate(Booking, bookings)
+
+        # Approved bookings hold units, exactly as Booking.objects.approve() would have left them
+        changed = []
+        for house in houses:
+            if approved[house.pk]:
+                house.available_units = house.total_units - approved[house.pk]
+                house.is_available = house.available_units > 0
+                changed.append(house)
+        House.objects.bulk_update(changed, ['available_units', 'is_available'], batch_size=BATCH_SIZE)
+
+    def create_movers(self, owners, count):
+        rng = self.rng
+        movers = []
+        for index in range(count):
+            area, _latitude, _longitude = rng.choice(AREAS)
+            movers.append(MoverService(
+                owner=owners[index % len(owners)],
+                name=f'{rng.choice(MOVER_NAMES)} Movers {area}',
+                description=f'Student moves around {area} and the nearby campuses. Pick-up trucks and handcarts.',
+                location=f'{area}, Nairobi',
+                phone=f'07{rng.randrange(10 ** 8):08d}',
+                email=f'mover-{index:05d}@example.com',
+                provides_cleaning=rng.random() < 0.4,
+                rate_per_km=Decimal(rng.choice([300, 500, 750, 1000, 1500])),
+                daily_capacity=rng.randint(2, 8),
+            ))
+        movers = MoverService.objects.bulk_create(movers, batch_size=BATCH_SIZE)
+        self.backdate(MoverService, movers)
+        return movers
+
+    def create_ratings(self, movers, tenants, count):
+        if not movers:
+            return
+        rng = self.rng
+        pairs = set()
+        ratings = []
+        # Skewed: some movers collect many more ratings than others
+        weights = [1 / (rank + 1) for rank in range(len(movers))]
+        for _ in range(count * 3):
+            if len(ratings) >= count:
+                break
+            service, user = rng.choices(movers, weights)[0], rng.choice(tenants)
+            if (service.pk, user.pk) in pairs:
+                continue
+            pairs.add((service.pk, user.pk))
+            ratings.append(MoverRating(
+                service=service,
+                user=user,
+                score=rng.choices([1, 2, 3, 4, 5], [5, 8, 17, 35, 35])[0],
+                comment=rng.choice(['', 'On time and careful.', 'A bit late but friendly.', 'Great value.']),
+            ))
+        ratings = MoverRating.objects.bulk_create(ratings, batch_size=BATCH_SIZE)
+        self.backdate(MoverRating, ratings, fields=('created_at',))
+        MoverService.recount_ratings()
+
+    def create_mover_bookings(self, movers, tenants, count):
+        if not movers:
+            return
+        rng = self.rng
+        statuses, weights = zip(*MOVER_BOOKING_STATUSES)
+        confirmed = Counter()
+        averages = dict(MoverService.objects.filter(pk__in=[mover.pk for mover in movers]).values_list('pk', 'rating_avg'))
+        bookings = []
+        for _ in range(count):
+            mover, tenant = rng.choice(movers), rng.choice(tenants)
+            pickup_area, pickup_lat, pickup_lng = self.point_near()
+            dropoff_area, dropoff_lat, dropoff_lng = self.point_near()
+            crow_flies = haversine_km(float(pickup_lat), float(pickup_lng), float(dropoff_lat), float(dropoff_lng))
+            distance = Decimal(f'{max(crow_flies, 0.5) * 1.3:.2f}')  # roads are ~30% longer
+            move_date = (self.now + timedelta(days=rng.randint(-60, 30))).date()
+            status = rng.choices(statuses, weights)[0]
+            if status == 'confirmed':
+                # Never more confirmed jobs on a day than the crew can take (see movers.scheduling)
+                if confirmed[mover.pk, move_date] >= mover.daily_capacity:
+                    status = 'pending'
+                else:
+                    confirmed[mover.pk, move_date] += 1
+            rate_per_km = Decimal('50')
+            bookings.append(MoverBooking(
+                mover=mover,
+                tenant=tenant,
+                pickup_location=f'{pickup_area}, Nairobi',
+                dropoff_location=f'{dropoff_area}, Nairobi',
+                pickup_latitude=pickup_lat,
+                pickup_longitude=pickup_lng,
+                dropoff_latitude=dropoff_lat,
+                dropoff_longitude=dropoff_lng,
+                move_date=move_date,
+                tenant_name=f'{tenant.first_name} {tenant.last_name}',
+                tenant_phone=f'07{rng.randrange(10 ** 8):08d}',
+                tenant_email=tenant.email,
+                distance_km=distance,
+                base_rate=mover.rate_per_km,
+                rate_per_km=rate_per_km,
+                total_cost=mover.rate_per_km + distance * rate_per_km,
+                mover_rating=Decimal(f'{averages[mover.pk]:.1f}'),
+                status=status,
+            ))
+        bookings = MoverBooking.objects.bulk_create(bookings, batch_size=BATCH_SIZE)
+        self.backdate(MoverBooking, bookings)
@@ -0,0 +1,91 @@
+# Generated by Django 6.0 on 2026-10-18 09:12
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+from houses.search import build_search_document, column_search_vector
+
+# Frozen copy of House.AMENITIES_CHOICES labels at the time of this migration
+AMENITY_LABELS = {
+    'wifi': 'WiFi',
+    'parking': 'Parking',
+    'security': '24/7 Security',
+    'water': 'Water Supply',
+    'electricity': 'Electricity',
+    'gym': 'Gym',
+    'pool': 'Swimming Pool',
+    'laundry': 'Laundry',
+    'furnished': 'Furnished',
+    'ac': 'Air Conditioning',
+    'heating': 'Heating',
+    'balcony': 'Balcony',
+}
+
+POSTGRES_INDEXES = [
+    (
+        'houses_house_search_vector_gin',
+        'CREATE INDEX IF NOT EXISTS houses_house_search_vector_gin '
+        'ON houses_house USING gin (search_vector)',
+    ),
+    (
+        'houses_house_search_document_trgm',
+        'CREATE INDEX IF NOT EXISTS houses_house_search_document_trgm '
+        'ON houses_house USING gin (search_document gin_trgm_ops)',
+    ),
+    (
+        # Matches the UPPER(location::text) LIKE expression Django emits for location__icontains
+        'houses_house_location_upper_trgm',
+        'CREATE INDEX IF NOT EXISTS houses_house_location_upper_trgm '
+        'ON houses_house USING gin (UPPER(location::text) gin_trgm_ops)',
+    ),
+]
+
+
+def backfill_search(apps, schema_editor):
+    House = apps.get_model('houses', 'House')
+    db_alias = schema_editor.connection.alias
+    houses = list(House.objects.using(db_alias).only('title', 'location', 'amenities', 'description'))
+    for house in houses:
+        house.search_document = build_search_document(house, AMENITY_LABELS)
+    House.objects.using(db_alias).bulk_update(houses, ['search_document'], batch_size=500)
+
+    if schema_editor.connection.vendor == 'postgresql':
+        House.objects.using(db_alias).update(search_vector=column_search_vector())
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _name, sql in POSTGRES_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _sql in POSTGRES_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('houses', '0004_house_available_units_house_total_units'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='house',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='house',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_search, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
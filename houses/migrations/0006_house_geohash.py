@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+from houses.geo import encode_geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    House = apps.get_model('houses', 'House')
+    db_alias = schema_editor.connection.alias
+    houses = list(
+        House.objects.using(db_alias)
+        .filter(latitude__isnull=False, longitude__isnull=False)
+        .only('latitude', 'longitude')
+    )
+    for house in houses:
+        house.geohash = encode_geohash(house.latitude, house.longitude)
+    House.objects.using(db_alias).bulk_update(houses, ['geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('houses', '0005_house_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='house',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
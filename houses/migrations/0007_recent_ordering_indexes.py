@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 13:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('houses', '0006_house_geohash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='house',
+            index=models.Index(fields=['is_available', '-created_at', '-id'], name='house_available_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='house',
+            index=models.Index(fields=['landlord', '-created_at', '-id'], name='house_landlord_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-18 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def backfill_image_pointers(apps, schema_editor):
+    House = apps.get_model('houses', 'House')
+    HouseImage = apps.get_model('houses', 'HouseImage')
+    db_alias = schema_editor.connection.alias
+    image_count = (
+        HouseImage.objects.using(db_alias)
+        .filter(house_id=OuterRef('pk'))
+        .order_by()
+        .values('house_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    first_image = (
+        HouseImage.objects.using(db_alias)
+        .filter(house_id=OuterRef('pk'))
+        .order_by('-is_primary', 'uploaded_at')
+        .values('pk')[:1]
+    )
+    with_images = HouseImage.objects.using(db_alias).values('house_id')
+    House.objects.using(db_alias).filter(pk__in=with_images).update(
+        image_count=Subquery(image_count),
+        primary_image=Subquery(first_image),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('houses', '0007_recent_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='house',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='house',
+            name='primary_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='houses.houseimage'),
+        ),
+        migrations.RunPython(backfill_image_pointers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('houses', '0008_house_primary_image_house_image_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='houseimage',
+            name='medium',
+            field=models.ImageField(blank=True, editable=False, upload_to='houses/medium/'),
+        ),
+        migrations.AddField(
+            model_name='houseimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='houses/thumbs/'),
+        ),
+    ]
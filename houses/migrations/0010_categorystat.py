@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-18 15:05
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_category_stats(apps, schema_editor):
+    House = apps.get_model('houses', 'House')
+    CategoryStat = apps.get_model('houses', 'CategoryStat')
+    db_alias = schema_editor.connection.alias
+    rows = (
+        House.objects.using(db_alias)
+        .order_by()
+        .values('category')
+        .annotate(
+            listings=Count('pk'),
+            available_listings=Count('pk', filter=Q(is_available=True)),
+            available_units=Sum('available_units'),
+        )
+    )
+    CategoryStat.objects.using(db_alias).bulk_create([
+        CategoryStat(
+            category=row['category'],
+            listings=row['listings'],
+            available_listings=row['available_listings'],
+            available_units=row['available_units'] or 0,
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('houses', '0009_houseimage_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('standalone', 'Stand Alone House'), ('hostel', 'Hostel'), ('apartment', 'Apartment'), ('roommate', 'Roommate')], max_length=20, unique=True)),
+                ('listings', models.IntegerField(default=0)),
+                ('available_listings', models.IntegerField(default=0)),
+                ('available_units', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_category_stats, migrations.RunPython.noop),
+    ]
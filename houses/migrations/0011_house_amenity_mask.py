@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+# Frozen copy of House.AMENITY_BITS at the time of this migration
+AMENITY_BITS = {
+    'wifi': 1 << 0,
+    'parking': 1 << 1,
+    'security': 1 << 2,
+    'water': 1 << 3,
+    'electricity': 1 << 4,
+    'gym': 1 << 5,
+    'pool': 1 << 6,
+    'laundry': 1 << 7,
+    'furnished': 1 << 8,
+    'ac': 1 << 9,
+    'heating': 1 << 10,
+    'balcony': 1 << 11,
+}
+
+
+def backfill_amenity_mask(apps, schema_editor):
+    House = apps.get_model('houses', 'House')
+    db_alias = schema_editor.connection.alias
+    houses = list(House.objects.using(db_alias).exclude(amenities='').only('amenities'))
+    for house in houses:
+        house.amenity_mask = 0
+        for amenity in house.amenities.split(','):
+            house.amenity_mask |= AMENITY_BITS.get(amenity.strip(), 0)
+    House.objects.using(db_alias).bulk_update(houses, ['amenity_mask'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('houses', '0010_categorystat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='house',
+            name='amenity_mask',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_amenity_mask, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 19:10
+
+import houses.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('houses', '0011_house_amenity_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categorystat',
+            name='version',
+            field=models.BigIntegerField(default=houses.models._initial_listing_version),
+        ),
+    ]
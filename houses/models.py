@@ -1,8 +1,44 @@
-from django.db import models
+import time
+
+from django.db import models, router, connections
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
+
+from .amenities import all_q, amenity_mask, any_q
+from .geo import encode_geohash, nearby
+from .search import build_search_document, build_search_vector, search_houses
+from .stats import snapshot
 
 User = get_user_model()
 
+
+class HouseQuerySet(models.QuerySet):
+    def search(self, term):
+        """Ranked text search over title, description, location and amenities"""
+        return search_houses(self, term)
+
+    def nearby(self, latitude, longitude, radius_km=2):
+        """Listings within radius_km of a point, nearest first (annotated with distance_km)"""
+        return nearby(self, latitude, longitude, radius_km)
+
+    def has_all_amenities(self, amenities):
+        """Listings offering every one of the given amenity values"""
+        bits = self.model.AMENITY_BITS
+        return self.filter(all_q(amenity_mask(amenities, bits), len(bits)))
+
+    def has_any_amenities(self, amenities):
+        """Listings offering at least one of the given amenity values"""
+        return self.filter(any_q(amenity_mask(amenities, self.model.AMENITY_BITS)))
+
+    def with_primary_image(self):
+        """Join the cover image so listing cards render without per-row image queries"""
+        return self.select_related('primary_image')
+
+    def with_images(self):
+        """Cover image plus the full gallery in one extra query for the whole page"""
+        return self.select_related('primary_image').prefetch_related('images')
+
+
 class House(models.Model):
     CATEGORY_CHOICES = [
         ('standalone', 'Stand Alone House'),
@@ -25,6 +61,12 @@ class House(models.Model):
         ('heating', 'Heating'),
         ('balcony', 'Balcony'),
     ]
+
+    # Bit of each amenity in amenity_mask: only ever append to AMENITIES_CHOICES, never reorder
+    AMENITY_BITS = {value: 1 << index for index, (value, _label) in enumerate(AMENITIES_CHOICES)}
+
+    # Fields that feed search_document / search_vector
+    SEARCH_FIELDS = {'title', 'description', 'location', 'amenities'}
     
     # Basic Info
     landlord = models.ForeignKey(User, on_delete=models.CASCADE, related_name='properties')
@@ -42,9 +84,17 @@ class House(models.Model):
     location = models.CharField(max_length=200, help_text="Address/Area")
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
+    
+    # Images (denormalized, maintained by houses.signals)
+    primary_image = models.ForeignKey(
+        'HouseImage', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+'
+    )
+    image_count = models.PositiveIntegerField(default=0, editable=False)
     
     # Amenities (stored as comma-separated values)
     amenities = models.CharField(max_length=500, blank=True, help_text="Comma-separated amenities")
+    amenity_mask = models.PositiveIntegerField(default=0, db_index=True, editable=False)
     
     # Contact Info
     contact_phone = models.CharField(max_length=20)
@@ -55,10 +105,21 @@ class House(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Search (refreshed on every save, indexed in migration 0005)
+    search_document = models.TextField(blank=True, default='', editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = HouseQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Property'
         verbose_name_plural = 'Properties'
+        indexes = [
+            # Keyset pagination over (-created_at, -id)
+            models.Index(fields=['is_available', '-created_at', '-id'], name='house_available_recent_idx'),
+            models.Index(fields=['landlord', '-created_at', '-id'], name='house_landlord_recent_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -68,14 +129,53 @@ class House(models.Model):
         if self.amenities:
             return self.amenities.split(',')
         return []
+
+    def card_version(self):
+        """Changes whenever the listing card could look different (see roomify/fragments.py)"""
+        # The cover image is maintained with UPDATEs that leave updated_at alone
+        image = self.primary_image
+        return (self.updated_at, self.primary_image_id, image.thumbnail.name if image else '')
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the category counters were last told about (see houses.stats)
+        if {'category', 'is_available', 'available_units'}.issubset(instance.__dict__):
+            instance._stats_snapshot = snapshot(instance)
+        return instance
+
     def save(self, *args, **kwargs):
-        """Auto-update is_available based on available_units"""
+        """Auto-update is_available, the geohash cell, the amenity mask and the search index"""
         if self.available_units > 0:
             self.is_available = True
         else:
             self.is_available = False
+
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+
+        self.amenity_mask = amenity_mask(self.get_amenities_list(), self.AMENITY_BITS)
+        self.search_document = build_search_document(self)
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        if connections[using].vendor == 'postgresql':
+            self.search_vector = build_search_vector(self)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if self.SEARCH_FIELDS.intersection(update_fields):
+                update_fields |= {'search_document', 'search_vector'}
+            if update_fields.intersection({'latitude', 'longitude'}):
+                update_fields.add('geohash')
+            if 'amenities' in update_fields:
+                update_fields.add('amenity_mask')
+            kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
+        # The vector is written by the expression above; don't keep it on the instance
+        self.search_vector = None
+
 
 class HouseImage(models.Model):
     house = models.ForeignKey(House, on_delete=models.CASCADE, related_name='images')
@@ -83,9 +183,42 @@ class HouseImage(models.Model):
     caption = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    
+    # Derivatives written by houses.imaging after upload (empty until processed)
+    thumbnail = models.ImageField(upload_to='houses/thumbs/', blank=True, editable=False)
+    medium = models.ImageField(upload_to='houses/medium/', blank=True, editable=False)
 
     class Meta:
         ordering = ['-is_primary', 'uploaded_at']
 
     def __str__(self):
-        return f"Image for {self.house.title}"
\ No newline at end of file
+        return f"Image for {self.house.title}"
+    
+    @property
+    def thumbnail_url(self):
+        """Card-sized rendition, falling back to the original while it is processed"""
+        return (self.thumbnail or self.image).url
+    
+    @property
+    def medium_url(self):
+        """Detail-page rendition, falling back to the original while it is processed"""
+        return (self.medium or self.image).url
+
+def _initial_listing_version():
+    # Start from the clock, so a recreated row never repeats a version that old cache keys used
+    return time.time_ns()
+
+
+class CategoryStat(models.Model):
+    """Listing counters per category, maintained by houses.signals (see houses/stats.py)"""
+    category = models.CharField(max_length=20, choices=House.CATEGORY_CHOICES, unique=True)
+    # Plain integers: a drifted counter must never make a House save fail a CHECK constraint
+    listings = models.IntegerField(default=0)
+    available_listings = models.IntegerField(default=0)
+    available_units = models.IntegerField(default=0)
+    # Bumped whenever browse results in this category may change (houses/listing_cache.py)
+    version = models.BigIntegerField(default=_initial_listing_version)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.get_category_display()}: {self.listings} listings"
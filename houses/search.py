@@ -0,0 +1,88 @@
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db import connections
+from django.db.models import F, Q, Value
+
+# 'simple' keeps place names like "Kahawa" or "Juja" intact instead of stemming them
+SEARCH_CONFIG = 'simple'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_search_document(house, amenity_labels=None):
+    """Flatten the searchable fields of a house into one lowercase string"""
+    if amenity_labels is None:
+        amenity_labels = dict(house.AMENITIES_CHOICES)
+    amenities = ' '.join(
+        amenity_labels.get(amenity, amenity) for amenity in house.amenities.split(',') if amenity
+    )
+    parts = [house.title, house.location, amenities, house.description]
+    return ' '.join(' '.join(str(part).split()) for part in parts if part).lower()
+
+
+def build_search_vector(house):
+    """Weighted search vector built from the instance values (safe for INSERT and UPDATE)"""
+    return (
+        SearchVector(Value(house.title or ''), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(house.location or ''), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(house.amenities.replace(',', ' ')), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Value(house.description or ''), weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def column_search_vector():
+    """Same weighting as build_search_vector, read from the table columns (for backfills)"""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('location', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('amenities', weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def supports_full_text(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def tokenize(term):
+    return [token.lower() for token in TOKEN_RE.findall(term or '')]
+
+
+def search_houses(queryset, term):
+    """Filter a House queryset by a free text term and order it by relevance
+
+    On PostgreSQL this uses the GIN indexed search vector with prefix matching,
+    OR'd with a trigram word-similarity match on the search document so typos
+    like "apartmnt" still hit. Other databases fall back to substring matching
+    on the maintained search document.
+    """
+    tokens = tokenize(term)
+    if not tokens:
+        return queryset
+
+    if not supports_full_text(queryset.db):
+        for token in tokens:
+            queryset = queryset.filter(search_document__contains=token)
+        return queryset
+
+    phrase = ' '.join(tokens)
+    query = SearchQuery(
+        ' & '.join(f'{token}:*' for token in tokens),
+        search_type='raw',
+        config=SEARCH_CONFIG,
+    )
+    return (
+        queryset
+        .filter(Q(search_vector=query) | Q(search_document__trigram_word_similar=phrase))
+        .annotate(
+            rank=SearchRank(F('search_vector'), query)
+            + TrigramWordSimilarity(phrase, 'search_document')
+        )
+        .order_by('-rank', '-created_at')
+    )
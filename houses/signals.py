@@ -0,0 +1,69 @@
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .imaging import schedule_derivatives
+from .listing_cache import bump_listing_version
+from .models import House, HouseImage
+from .stats import record_change, snapshot
+
+
+@receiver(pre_save, sender=House)
+def house_saving(sender, instance, raw=False, **kwargs):
+    """Make sure the pre-save counter snapshot is known before the row changes"""
+    if raw or instance._state.adding or hasattr(instance, '_stats_snapshot'):
+        return
+    # Loaded with only()/defer(), or constructed by hand with a pk
+    previous = House.objects.filter(pk=instance.pk).values('category', 'is_available', 'available_units').first()
+    instance._stats_snapshot = snapshot(House(**previous)) if previous else None
+
+
+@receiver(post_save, sender=House)
+def house_saved(sender, instance, created, raw=False, **kwargs):
+    """Move the category counters from the old snapshot to the new one"""
+    if raw:
+        return
+    before = None if created else getattr(instance, '_stats_snapshot', None)
+    after = snapshot(instance)
+    record_change(before, after)
+    # Any field can change what browse shows, so bump even when the counters didn't move
+    bump_listing_version(after[0], before[0] if before else None)
+    instance._stats_snapshot = after
+
+
+@receiver(post_delete, sender=House)
+def house_deleted(sender, instance, **kwargs):
+    before = getattr(instance, '_stats_snapshot', None) or snapshot(instance)
+    record_change(before, None)
+    bump_listing_version(before[0])
+
+
+@receiver(post_save, sender=HouseImage)
+def image_saved(sender, instance, created, **kwargs):
+    """Keep House.image_count and House.primary_image in step with new uploads"""
+    if kwargs.get('raw'):
+        return
+    houses = House.objects.filter(pk=instance.house_id)
+    if created:
+        houses.update(image_count=F('image_count') + 1)
+        schedule_derivatives(instance.pk)
+    if instance.is_primary:
+        houses.update(primary_image=instance)
+    else:
+        houses.filter(primary_image__isnull=True).update(primary_image=instance)
+    # Listing cards may show a new cover image
+    bump_listing_version(houses.values_list('category', flat=True).first())
+
+
+@receiver(post_delete, sender=HouseImage)
+def image_deleted(sender, instance, origin=None, **kwargs):
+    """Decrement the count and promote the next image when the cover is removed"""
+    if isinstance(origin, House):
+        # The whole house is being deleted, nothing to maintain
+        return
+    houses = House.objects.filter(pk=instance.house_id)
+    houses.filter(image_count__gt=0).update(image_count=F('image_count') - 1)
+    # SET_NULL has already cleared the pointer if this was the cover image
+    next_image = HouseImage.objects.filter(house_id=OuterRef('pk')).order_by('-is_primary', 'uploaded_at')
+    houses.filter(primary_image__isnull=True).update(primary_image=Subquery(next_image.values('pk')[:1]))
+    bump_listing_version(houses.values_list('category', flat=True).first())
@@ -0,0 +1,105 @@
+"""
+Per-category listing counters for the homepage.
+
+CategoryStat rows are adjusted with F() updates whenever a House is
+created, changed or deleted (see houses/signals.py), and the whole table
+is cached as one dict so the homepage needs a single cache lookup.
+`manage.py reconcile_house_stats` recomputes the rows from House to
+correct any drift.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+STATS_CACHE_KEY = 'houses:category_stats'
+STATS_CACHE_TIMEOUT = 60 * 60
+
+
+def snapshot(house):
+    """The parts of a house the counters depend on"""
+    return (house.category, 1 if house.is_available else 0, house.available_units)
+
+
+def _apply(category, listings, available, units):
+    from .models import CategoryStat
+
+    if not (listings or available or units):
+        return
+    changes = {
+        'listings': F('listings') + listings,
+        'available_listings': F('available_listings') + available,
+        'available_units': F('available_units') + units,
+    }
+    if not CategoryStat.objects.filter(category=category).update(**changes):
+        CategoryStat.objects.get_or_create(category=category)
+        CategoryStat.objects.filter(category=category).update(**changes)
+
+
+def record_change(before, after):
+    """Move counters from the `before` snapshot to the `after` one (either may be None)"""
+    if before == after:
+        return
+    if before is not None:
+        category, available, units = before
+        _apply(category, -1, -available, -units)
+    if after is not None:
+        category, available, units = after
+        _apply(category, 1, available, units)
+    invalidate()
+
+
+def record_units_change(category, units, available):
+    """Adjust counters after an inventory UPDATE that bypassed House.save() (see houses/inventory.py)"""
+    _apply(category, 0, available, units)
+    invalidate()
+
+
+def invalidate():
+    transaction.on_commit(lambda: cache.delete(STATS_CACHE_KEY))
+
+
+def get_category_stats():
+    """{category: {'listings', 'available_listings', 'available_units'}} for every category"""
+    from .models import CategoryStat, House
+
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = {
+            category: {'listings': 0, 'available_listings': 0, 'available_units': 0}
+            for category, _label in House.CATEGORY_CHOICES
+        }
+        for row in CategoryStat.objects.values('category', 'listings', 'available_listings', 'available_units'):
+            stats[row.pop('category')] = row
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def reconcile():
+    """Recompute every CategoryStat row from House; return {category: (old, new)} for rows that drifted"""
+    from .models import CategoryStat, House
+
+    actual = {
+        row.pop('category'): row
+        for row in House.objects.order_by().values('category').annotate(
+            listings=Count('pk'),
+            available_listings=Count('pk', filter=Q(is_available=True)),
+            available_units=Coalesce(Sum('available_units'), 0),
+        )
+    }
+    drift = {}
+    with transaction.atomic():
+        existing = {stat.category: stat for stat in CategoryStat.objects.select_for_update()}
+        for category in set(existing) | set(actual):
+            new = actual.get(category, {'listings': 0, 'available_listings': 0, 'available_units': 0})
+            stat = existing.get(category) or CategoryStat(category=category)
+            old = {'listings': stat.listings, 'available_listings': stat.available_listings,
+                   'available_units': stat.available_units}
+            if old != new or stat.pk is None:
+                if old != new:
+                    drift[category] = (old, new)
+                for field, value in new.items():
+                    setattr(stat, field, value)
+                stat.save()
+        invalidate()
+    return drift
@@ -0,0 +1,21 @@
+from django import template
+from django.urls import reverse
+
+from houses.imaging import is_allowed_size
+
+register = template.Library()
+
+
+@register.filter
+def resized(image, size):
+    """URL of an uploaded image cropped to "WIDTHxHEIGHT", e.g. {{ profile.profile_picture|resized:"64x64" }}"""
+    if not image:
+        return ''
+    try:
+        width, height = (int(part) for part in size.lower().split('x'))
+    except ValueError:
+        return image.url
+    if not is_allowed_size(width, height):
+        # resized_media would 404; the original is better than a broken image
+        return image.url
+    return reverse('resized_media', kwargs={'width': width, 'height': height, 'path': image.name})
@@ -1,3 +1,137 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from roomify.tests import LOCMEM_CACHES, make_house
+
+from .geo import covering_cells
+from .inventory import release_units, reserve_units
+from .listing_cache import listing_version
+from .models import CategoryStat, House
+from .stats import reconcile
+
+
+def category_stats(category):
+    return CategoryStat.objects.values('listings', 'available_listings', 'available_units').get(category=category)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class InventoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = User.objects.create_user('landlord', password='x')
+
+    def setUp(self):
+        self.house = make_house(self.landlord, total_units=2, available_units=2)
+
+    def units(self):
+        return House.objects.values_list('available_units', 'is_available').get(pk=self.house.pk)
+
+    def test_reserve_takes_units_until_none_are_left(self):
+        self.assertEqual(reserve_units(self.house.pk), 1)
+        self.assertEqual(self.units(), (1, True))
+        self.assertEqual(reserve_units(self.house.pk), 0)
+        self.assertEqual(self.units(), (0, False))
+
+    def test_reserve_never_oversells(self):
+        self.assertIsNone(reserve_units(self.house.pk, 3))
+        self.assertEqual(self.units(), (2, True))
+        reserve_units(self.house.pk, 2)
+        self.assertIsNone(reserve_units(self.house.pk))
+        self.assertEqual(self.units(), (0, False))
+
+    def test_release_reopens_the_listing_but_never_exceeds_total_units(self):
+        reserve_units(self.house.pk, 2)
+        self.assertEqual(release_units(self.house.pk), 1)
+        self.assertEqual(self.units(), (1, True))
+        self.assertEqual(release_units(self.house.pk), 2)
+        self.assertIsNone(release_units(self.house.pk))
+        self.assertEqual(self.units(), (2, True))
+
+    def test_every_change_moves_the_counters_and_the_listing_version(self):
+        version = listing_version(['hostel'])
+        reserve_units(self.house.pk)
+        self.assertEqual(category_stats('hostel'), {'listings': 1, 'available_listings': 1, 'available_units': 1})
+        self.assertNotEqual(listing_version(['hostel']), version)
+
+        version = listing_version(['hostel'])
+        reserve_units(self.house.pk)
+        self.assertEqual(category_stats('hostel'), {'listings': 1, 'available_listings': 0, 'available_units': 0})
+        self.assertNotEqual(listing_version(['hostel']), version)
+
+        release_units(self.house.pk)
+        self.assertEqual(category_stats('hostel'), {'listings': 1, 'available_listings': 1, 'available_units': 1})
+        self.assertEqual(reconcile(), {})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CategoryStatSignalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = User.objects.create_user('landlord', password='x')
+
+    def test_saves_and_deletes_keep_the_counters_exact(self):
+        first = make_house(self.landlord, total_units=3, available_units=3)
+        make_house(self.landlord, total_units=2, available_units=0, is_available=False)
+        self.assertEqual(category_stats('hostel'), {'listings': 2, 'available_listings': 1, 'available_units': 3})
+
+        hostel_version, apartment_version = listing_version(['hostel']), listing_version(['apartment'])
+        first.category = 'apartment'
+        first.save()
+        self.assertEqual(category_stats('hostel'), {'listings': 1, 'available_listings': 0, 'available_units': 0})
+        self.assertEqual(category_stats('apartment'), {'listings': 1, 'available_listings': 1, 'available_units': 3})
+        self.assertNotEqual(listing_version(['hostel']), hostel_version)
+        self.assertNotEqual(listing_version(['apartment']), apartment_version)
+
+        first.delete()
+        self.assertEqual(category_stats('apartment'), {'listings': 0, 'available_listings': 0, 'available_units': 0})
+        self.assertEqual(reconcile(), {})
+
+    def test_reconcile_repairs_drift(self):
+        make_house(self.landlord)
+        CategoryStat.objects.filter(category='hostel').update(listings=5)
+        drift = reconcile()
+        self.assertEqual(drift['hostel'][0]['listings'], 5)
+        self.assertEqual(category_stats('hostel')['listings'], 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class NearbyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        landlord = User.objects.create_user('landlord', password='x')
+        cls.close = make_house(landlord, title='Close', latitude='-1.1840', longitude='36.9170')
+        cls.across_town = make_house(landlord, title='Across town', latitude='-1.2676', longitude='36.8108')
+        make_house(landlord, title='No pin')
+
+    def test_nearby_matches_houses_inside_the_covering_cells(self):
+        cells = covering_cells(-1.1833, 36.9167, 2)
+        self.assertTrue(any(self.close.geohash.startswith(cell) for cell in cells))
+        houses = list(House.objects.nearby(-1.1833, 36.9167, 2))
+        self.assertEqual(houses, [self.close])
+        self.assertLess(houses[0].distance_km, 1)
+
+    def test_a_wider_radius_reaches_further_cells(self):
+        houses = House.objects.nearby(-1.1833, 36.9167, 20)
+        self.assertEqual([house.title for house in houses], ['Close', 'Across town'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EditPropertyTests(TestCase):
+    def test_editing_keeps_image_counters_and_current_units(self):
+        landlord = User.objects.create_user('landlord', password='x')
+        house = make_house(landlord, total_units=3, available_units=3)
+        # The view's first read of the row; an upload and a booking land after it
+        stale = House.objects.get(pk=house.pk)
+        House.objects.filter(pk=house.pk).update(image_count=2)
+        reserve_units(house.pk)
+
+        self.client.force_login(landlord)
+        with mock.patch('houses.views.get_object_or_404', return_value=stale):
+            self.client.post(reverse('edit_property', args=[house.pk]), {'title': 'Bigger room', 'total_units': '4'})
+        house.refresh_from_db()
+        self.assertEqual((house.title, house.image_count), ('Bigger room', 2))
+        self.assertEqual((house.total_units, house.available_units), (4, 3))
+        self.assertEqual(reconcile(), {})
@@ -10,4 +10,5 @@ urlpatterns = [
     path('property/edit/<int:pk>/', views.edit_property, name='edit_property'),
     path('property/delete/<int:pk>/', views.delete_property, name='delete_property'),
     path('property/image/delete/<int:image_id>/', views.delete_property_image, name='delete_property_image'),
+    path('media/resize/<int:width>x<int:height>/<path:path>', views.resized_media, name='resized_media'),
 ]
\ No newline at end of file
@@ -1,63 +1,161 @@
+import re
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from roomify.conditional import conditional_page
+from roomify.fragments import render_cards
+from roomify.pagination import paginate, paginate_ids
+from .facets import facet_counts, filter_conditions, parse_price, parse_rooms
+from .imaging import is_allowed_size, is_resizable_source, resized_rendition
+from .listing_cache import browse_results, listing_version
 from .models import House, HouseImage
+from .stats import get_category_stats
+
+DEFAULT_RADIUS_KM = 2
+MAX_RADIUS_KM = 50
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parse_coordinate(value, limit):
+    """Return value as a float within [-limit, limit], or None"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if -limit <= number <= limit:
+        return number
+    return None
+
+def _listings_state(request):
+    # Home's counters and recent listings, and browse's results, facets and cards, all
+    # change only together with a listing version
+    return listing_version(), None
 
+
+def _property_state(request, pk):
+    row = (
+        House.objects.filter(pk=pk)
+        .annotate(
+            images_uploaded=Max('images__uploaded_at'),
+            # Renditions appear after upload without touching the house
+            images_processed=Count('images', filter=~Q(images__medium='')),
+        )
+        .values_list('updated_at', 'image_count', 'primary_image_id', 'images_uploaded', 'images_processed')
+        .first()
+    )
+    if row is None:
+        return None
+    return row, max(filter(None, (row[0], row[3])))
+
+
+@conditional_page(_listings_state, templates=['home.html', 'houses/recent_card.html', 'base.html'])
 def home(request):
+    category_stats = get_category_stats()
     stats = {
-        'houses': House.objects.filter(category='standalone').count(),
-        'hostels': House.objects.filter(category='hostel').count(),
-        'apartments': House.objects.filter(category='apartment').count(),
-        'roommates': House.objects.filter(category='roommate').count(),
+        'houses': category_stats['standalone']['listings'],
+        'hostels': category_stats['hostel']['listings'],
+        'apartments': category_stats['apartment']['listings'],
+        'roommates': category_stats['roommate']['listings'],
     }
-    recent_listings = House.objects.filter(is_available=True).order_by('-created_at')[:10]
+    recent_listings = House.objects.filter(is_available=True).with_primary_image().order_by('-created_at')[:10]
     context = {
         'stats': stats,
-        'recent_listings': recent_listings
+        'recent_cards': render_cards('houses/recent_card.html', recent_listings, name='house'),
     }
     return render(request, 'home.html', context)
 
+def _browse_filters(request):
+    """Normalized browse filters from the query string"""
+    params = request.GET
+    category = params.get('category', '')
+    radius = _parse_coordinate(params.get('radius'), 40000)
+    if radius is None or radius <= 0:
+        radius = DEFAULT_RADIUS_KM
+    return {
+        'query': params.get('q', '').strip(),
+        'category': category if category in dict(House.CATEGORY_CHOICES) else '',
+        'min_price': parse_price(params.get('min_price')),
+        'max_price': parse_price(params.get('max_price')),
+        'location': params.get('location', '').strip(),
+        'rooms': parse_rooms(params.get('rooms')),
+        'amenities': sorted({a for a in params.getlist('amenities') if a in House.AMENITY_BITS}),
+        'amenity_match': 'any' if params.get('amenity_match') == 'any' else 'all',
+        'lat': _parse_coordinate(params.get('lat'), 90),
+        'lng': _parse_coordinate(params.get('lng'), 180),
+        'radius': min(radius, MAX_RADIUS_KM),
+    }
+
+@conditional_page(_listings_state, templates=[
+    'houses/browse_properties.html', 'houses/property_card.html', 'pagination.html', 'base.html',
+])
 def browse_properties(request):
     """Browse all available properties with filters"""
-    properties = House.objects.filter(is_available=True).order_by('-created_at')
-    
-    # Get filter parameters
-    category = request.GET.get('category')
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    location = request.GET.get('location')
-    rooms = request.GET.get('rooms')
+    filters = _browse_filters(request)
+    query, lat, lng = filters['query'], filters['lat'], filters['lng']
     
-    # Apply filters
-    if category:
-        properties = properties.filter(category=category)
-    if min_price:
-        properties = properties.filter(price__gte=min_price)
-    if max_price:
-        properties = properties.filter(price__lte=max_price)
-    if location:
-        properties = properties.filter(location__icontains=location)
-    if rooms:
-        properties = properties.filter(number_of_rooms=rooms)
+    # Filters that are not faceted narrow the base set the facet counts run over
+    listings = House.objects.filter(is_available=True).with_primary_image().order_by('-created_at')
+    if filters['location']:
+        listings = listings.filter(location__icontains=filters['location'])
+    if query:
+        listings = listings.search(query)
+    if lat is not None and lng is not None:
+        # Nearest first takes precedence over search rank
+        listings = listings.nearby(lat, lng, filters['radius'])
     
-    # Get categories for filter dropdown
-    categories = House.CATEGORY_CHOICES
+    properties = listings.filter(*filter_conditions(filters, House.AMENITY_BITS).values())
+    page = None
+    if not query and lat is None:
+        # Plain filter combinations repeat a lot; search and distance results are left uncached
+        results = browse_results(properties, filters)
+        page = paginate_ids(request, properties, results['ids'], results['total'], complete=results['complete'])
+        if page is None:
+            page = paginate(request, properties)
+            page.total_count = results['total']
+    if page is None:
+        page = paginate(request, properties, with_count=True)
     
+    show_distance = lat is not None and lng is not None
+    card_version = None
+    if show_distance:
+        def card_version(house):
+            # Distance depends on the search point, so cards are cached per rounded distance too
+            return (house.card_version(), round(house.distance_km, 1))
     context = {
-        'properties': properties,
-        'categories': categories,
-        'selected_category': category,
-        'selected_location': location,
-        'selected_rooms': rooms,
-        'min_price': min_price,
-        'max_price': max_price,
-        'total_count': properties.count(),
+        'properties': page.object_list,
+        'cards': render_cards(
+            'houses/property_card.html', page.object_list, name='property',
+            context={'show_distance': show_distance}, version=card_version,
+        ),
+        'page': page,
+        'facets': facet_counts(listings, filters),
+        'query': query,
+        'selected_category': filters['category'],
+        'selected_location': filters['location'],
+        'selected_rooms': str(filters['rooms'] or ''),
+        'selected_amenities': filters['amenities'],
+        'amenity_match': filters['amenity_match'],
+        'lat': lat,
+        'lng': lng,
+        'radius': filters['radius'],
+        'min_price': filters['min_price'] if filters['min_price'] is not None else '',
+        'max_price': filters['max_price'] if filters['max_price'] is not None else '',
+        'total_count': page.total_count,
     }
     return render(request, 'houses/browse_properties.html', context)
 
+@conditional_page(_property_state, templates=['houses/property_detail.html', 'base.html'])
 def property_detail(request, pk):
     """Display property details"""
-    property = get_object_or_404(House, pk=pk)
+    property = get_object_or_404(House.objects.with_images(), pk=pk)
     context = {'property': property}
     return render(request, 'houses/property_detail.html', context)
 
@@ -116,8 +214,8 @@ def add_property(request):
 
 @login_required(login_url='register')
 def my_properties(request):
-    properties = House.objects.filter(landlord=request.user)
-    context = {'properties': properties}
+    page = paginate(request, House.objects.filter(landlord=request.user).with_primary_image())
+    context = {'properties': page.object_list, 'page': page}
     return render(request, 'houses/my_properties.html', context)
 
 @login_required(login_url='register')
@@ -126,33 +224,41 @@ def edit_property(request, pk):
     
     if request.method == 'POST':
         try:
-            # Basic fields (fallback to existing values if missing)
-            house.title = request.POST.get('title') or house.title
-            house.description = request.POST.get('description') or house.description
-            house.category = request.POST.get('category') or house.category
-            price_val = request.POST.get('price')
-            house.price = price_val if price_val not in [None, ''] else house.price
-            house.number_of_rooms = request.POST.get('number_of_rooms', house.number_of_rooms)
+            with transaction.atomic():
+                # Locked, so the unit counts adjusted below are current, not what the page read
+                house = House.objects.select_for_update().get(pk=house.pk)
+                # Basic fields (fallback to existing values if missing)
+                house.title = request.POST.get('title') or house.title
+                house.description = request.POST.get('description') or house.description
+                house.category = request.POST.get('category') or house.category
+                price_val = request.POST.get('price')
+                house.price = price_val if price_val not in [None, ''] else house.price
+                house.number_of_rooms = request.POST.get('number_of_rooms', house.number_of_rooms)
             
-            # Update total units and adjust available units proportionally
-            new_total_units_raw = request.POST.get('total_units')
-            new_total_units = int(new_total_units_raw) if new_total_units_raw not in [None, ''] else house.total_units
-            if new_total_units != house.total_units:
-                # Calculate the difference
-                diff = new_total_units - house.total_units
-                house.total_units = new_total_units
-                house.available_units = max(0, house.available_units + diff)
-            
-            house.location = request.POST.get('location') or house.location
-            lat_val = request.POST.get('latitude', '').strip()
-            house.latitude = float(lat_val) if lat_val and lat_val != 'None' else house.latitude
-            lon_val = request.POST.get('longitude', '').strip()
-            house.longitude = float(lon_val) if lon_val and lon_val != 'None' else house.longitude
-            house.amenities = ','.join(request.POST.getlist('amenities'))
-            house.contact_phone = request.POST.get('contact_phone') or house.contact_phone
-            house.contact_email = request.POST.get('contact_email', house.contact_email)
-            house.save()
+                # Update total units and adjust available units proportionally
+                new_total_units_raw = request.POST.get('total_units')
+                new_total_units = int(new_total_units_raw) if new_total_units_raw not in [None, ''] else house.total_units
+                if new_total_units != house.total_units:
+                    # Calculate the difference
+                    diff = new_total_units - house.total_units
+                    house.total_units = new_total_units
+                    house.available_units = max(0, house.available_units + diff)
             
+                house.location = request.POST.get('location') or house.location
+                lat_val = request.POST.get('latitude', '').strip()
+                house.latitude = float(lat_val) if lat_val and lat_val != 'None' else house.latitude
+                lon_val = request.POST.get('longitude', '').strip()
+                house.longitude = float(lon_val) if lon_val and lon_val != 'None' else house.longitude
+                house.amenities = ','.join(request.POST.getlist('amenities'))
+                house.contact_phone = request.POST.get('contact_phone') or house.contact_phone
+                house.contact_email = request.POST.get('contact_email', house.contact_email)
+                # Only the edited columns: image_count and primary_image are kept by the image signals
+                house.save(update_fields=[
+                    'title', 'description', 'category', 'price', 'number_of_rooms',
+                    'total_units', 'available_units', 'is_available', 'location',
+                    'latitude', 'longitude', 'amenities', 'contact_phone', 'contact_email', 'updated_at',
+                ])
+
             # Handle new images
             images = request.FILES.getlist('images')
             for image in images:
@@ -173,7 +279,7 @@ def edit_property(request, pk):
 
 @login_required(login_url='register')
 def delete_property(request, pk):
-    house = get_object_or_404(House, pk=pk, landlord=request.user)
+    house = get_object_or_404(House.objects.with_primary_image(), pk=pk, landlord=request.user)
     if request.method == 'POST':
         house.delete()
         messages.success(request, 'Property deleted successfully!')
@@ -188,3 +294,70 @@ def delete_property_image(request, image_id):
     image.delete()
     messages.success(request, 'Image deleted successfully!')
     return redirect('edit_property', pk=house_id)
+
+
+def _parse_range(header, size):
+    """(start, end) for a single 'bytes=' range, None to ignore it, or False if unsatisfiable"""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+@require_safe
+def resized_media(request, width, height, path):
+    """Serve an uploaded image cropped to width x height, resized once and cached on disk"""
+    if not is_allowed_size(width, height):
+        raise Http404('Unsupported size')
+    if not is_resizable_source(path):
+        raise Http404('Not a resizable image')
+    try:
+        file_path, etag, content_type, modified = resized_rendition(path, width, height)
+    except OSError:
+        # Missing file or not an image Pillow can read
+        raise Http404('Image not found')
+
+    response = HttpResponse(content_type=content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified.timestamp())
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = 'public, max-age=86400'
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=int(modified.timestamp()), response=response
+    )
+    if conditional is not response:
+        return conditional
+
+    with open(file_path, 'rb') as rendition:
+        data = rendition.read()
+    size = len(data)
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (if_range is None or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, size)
+    if byte_range is False:
+        response.status_code = 416
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range:
+        start, end = byte_range
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        data = data[start:end + 1]
+
+    response.content = data
+    response['Content-Length'] = str(len(data))
+    return response
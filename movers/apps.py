@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MoversConfig(AppConfig):
     name = 'movers'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,58 @@
+import json
+import xml.etree.ElementTree as ElementTree
+
+from django.core.management.base import BaseCommand, CommandError
+
+from houses.geo import haversine_km
+
+# OSM highway values a moving truck can use
+DRIVABLE = {
+	"motorway", "trunk", "primary", "secondary", "tertiary", "unclassified", "residential",
+	"motorway_link", "trunk_link", "primary_link", "secondary_link", "tertiary_link",
+	"living_street", "service", "road",
+}
+
+
+class Command(BaseCommand):
+	help = "Convert an OpenStreetMap .osm extract into the road graph file used for mover quotes (MOVER_ROAD_GRAPH)"
+
+	def add_arguments(self, parser):
+		parser.add_argument("osm_file", help="Path to an .osm XML extract")
+		parser.add_argument("output", help="Where to write the JSON road graph")
+
+	def handle(self, *args, **options):
+		coordinates = {}
+		ways = []
+		try:
+			for _event, element in ElementTree.iterparse(options["osm_file"]):
+				if element.tag == "node":
+					coordinates[element.get("id")] = (float(element.get("lat")), float(element.get("lon")))
+					element.clear()
+				elif element.tag == "way":
+					tags = {tag.get("k"): tag.get("v") for tag in element.findall("tag")}
+					if tags.get("highway") in DRIVABLE:
+						refs = [nd.get("ref") for nd in element.findall("nd")]
+						oneway = tags.get("oneway") in ("yes", "1", "true")
+						ways.append((refs, oneway))
+					element.clear()
+		except (OSError, ElementTree.ParseError) as exc:
+			raise CommandError(f"Could not read {options['osm_file']}: {exc}")
+
+		# Only keep nodes that lie on a drivable way, renumbered densely
+		node_ids = {}
+		edges = []
+		for refs, oneway in ways:
+			refs = [ref for ref in refs if ref in coordinates]
+			for source, target in zip(refs, refs[1:]):
+				length_km = haversine_km(*coordinates[source], *coordinates[target])
+				edges.append([
+					node_ids.setdefault(source, len(node_ids)),
+					node_ids.setdefault(target, len(node_ids)),
+					round(length_km, 4),
+					oneway,
+				])
+		nodes = [[node_id, *coordinates[ref]] for ref, node_id in node_ids.items()]
+
+		with open(options["output"], "w") as output:
+			json.dump({"nodes": nodes, "edges": edges}, output, separators=(",", ":"))
+		self.stdout.write(self.style.SUCCESS(f"Wrote {len(nodes)} nodes and {len(edges)} edges to {options['output']}"))
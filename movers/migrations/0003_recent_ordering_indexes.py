@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 13:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movers', '0002_remove_moverservice_base_rate_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moverservice',
+            index=models.Index(fields=['-created_at', '-id'], name='moverservice_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-18 17:10
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+
+def backfill_ratings(apps, schema_editor):
+    MoverService = apps.get_model('movers', 'MoverService')
+    MoverRating = apps.get_model('movers', 'MoverRating')
+    db_alias = schema_editor.connection.alias
+    per_service = (
+        MoverRating.objects.using(db_alias)
+        .filter(service=OuterRef('pk'))
+        .order_by()
+        .values('service')
+    )
+    rated = MoverRating.objects.using(db_alias).values('service_id')
+    MoverService.objects.using(db_alias).filter(pk__in=rated).update(
+        rating_sum=Coalesce(Subquery(per_service.annotate(total=Sum('score')).values('total')), 0),
+        rating_count=Coalesce(Subquery(per_service.annotate(total=Count('pk')).values('total')), 0),
+        rating_avg=Coalesce(
+            Subquery(per_service.annotate(average=Avg(Cast('score', models.FloatField()))).values('average')),
+            Value(0.0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movers', '0003_recent_ordering_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moverservice',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='moverservice',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='moverservice',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='moverservice',
+            index=models.Index(fields=['-rating_avg', '-rating_count', '-id'], name='moverservice_rating_idx'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
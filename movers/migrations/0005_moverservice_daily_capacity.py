@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movers', '0004_moverservice_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moverservice',
+            name='daily_capacity',
+            field=models.PositiveSmallIntegerField(default=4, help_text='Jobs the crew can take on in one day'),
+        ),
+    ]
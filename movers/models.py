@@ -1,9 +1,25 @@
 from django.db import models
+from django.db.models import Avg, Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
 
+def rating_aggregates(ratings):
+	"""rating_sum/count/avg subquery expressions over `ratings`, for use in MoverService update()"""
+	per_service = ratings.filter(service=OuterRef("pk")).order_by().values("service")
+	return {
+		"rating_sum": Coalesce(Subquery(per_service.annotate(total=Sum("score")).values("total")), 0),
+		"rating_count": Coalesce(Subquery(per_service.annotate(total=Count("pk")).values("total")), 0),
+		"rating_avg": Coalesce(
+			Subquery(per_service.annotate(average=Avg(Cast("score", models.FloatField()))).values("average")),
+			Value(0.0),
+		),
+	}
+
+
 class MoverService(models.Model):
 	owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="mover_services")
 	name = models.CharField(max_length=200)
@@ -13,23 +29,59 @@ class MoverService(models.Model):
 	email = models.EmailField(blank=True)
 	provides_cleaning = models.BooleanField(default=False)
 	rate_per_km = models.DecimalField(max_digits=10, decimal_places=2, default=50, help_text="Charge per kilometer")
+	daily_capacity = models.PositiveSmallIntegerField(default=4, help_text="Jobs the crew can take on in one day")
+	# Rating aggregates, maintained by movers.signals
+	rating_sum = models.PositiveIntegerField(default=0, editable=False)
+	rating_count = models.PositiveIntegerField(default=0, editable=False)
+	rating_avg = models.FloatField(default=0, editable=False)
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		ordering = ["-created_at"]
+		indexes = [
+			models.Index(fields=["-created_at", "-id"], name="moverservice_recent_idx"),
+			# "Best movers first"
+			models.Index(fields=["-rating_avg", "-rating_count", "-id"], name="moverservice_rating_idx"),
+		]
 
 	def __str__(self):
 		return self.name
 
+	def card_version(self):
+		"""Changes whenever the list card could look different (see roomify/fragments.py)"""
+		# Rating updates bump updated_at too (adjust_ratings, recount_ratings)
+		return self.updated_at
+
 	@property
 	def rating_summary(self):
-		agg = self.ratings.aggregate(avg=models.Avg("score"), count=models.Count("id"))
 		return {
-			"average": round(agg["avg"] or 0, 1),
-			"count": agg["count"] or 0,
+			"average": round(self.rating_avg, 1),
+			"count": self.rating_count,
 		}
 
+	@classmethod
+	def adjust_ratings(cls, service_id, score_delta, count_delta):
+		"""Shift the rating aggregates of one service in a single UPDATE"""
+		new_sum = F("rating_sum") + score_delta
+		new_count = F("rating_count") + count_delta
+		cls.objects.filter(pk=service_id).update(
+			rating_sum=new_sum,
+			rating_count=new_count,
+			# SET expressions see the old row, so derive the average from the same deltas
+			rating_avg=Case(
+				When(rating_count__gt=-count_delta, then=Cast(new_sum, models.FloatField()) / Cast(new_count, models.FloatField())),
+				default=Value(0.0),
+			),
+			updated_at=timezone.now(),
+		)
+
+	@classmethod
+	def recount_ratings(cls, service_id=None):
+		"""Recompute the rating aggregates from MoverRating (every service if no id is given)"""
+		services = cls.objects.all() if service_id is None else cls.objects.filter(pk=service_id)
+		services.update(**rating_aggregates(MoverRating.objects.all()), updated_at=timezone.now())
+
 
 class MoverRating(models.Model):
 	service = models.ForeignKey(MoverService, on_delete=models.CASCADE, related_name="ratings")
@@ -42,5 +94,12 @@ class MoverRating(models.Model):
 		ordering = ["-created_at"]
 		unique_together = ("service", "user")  # one rating per user per service
 
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		# The score the service aggregates currently include (see movers.signals)
+		instance._counted_score = instance.__dict__.get("score")
+		return instance
+
 	def __str__(self):
 		return f"{self.service.name} - {self.score} by {self.user}" 
@@ -0,0 +1,168 @@
+"""
+Server-side distances and prices for mover bookings.
+
+The route length between pickup and dropoff comes from an optional road
+graph loaded from a local file (see the build_road_graph command, which
+extracts one from an OpenStreetMap .osm file), with straight-line
+haversine distance as the fallback. Shortest paths are cached per node
+pair.
+
+Pricing matches what the booking pages have always shown: the mover's
+rate_per_km acts as a base charge, plus KSh 50 for every kilometre. Since
+the route is the same for every mover, quote_movers() prices a move
+against any number of movers in one annotated query.
+"""
+import heapq
+import json
+import math
+import threading
+from collections import defaultdict, namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import DecimalField, F, Value
+
+from houses.geo import haversine_km
+
+DISTANCE_RATE_PER_KM = Decimal("50")
+MAX_SNAP_KM = 1.0  # farther than this from any road node, use the straight line
+GRID_DEGREES = 0.01  # ~1.1 km buckets for nearest-node lookups
+SHORTEST_PATH_CACHE_SIZE = 4096
+
+Route = namedtuple("Route", ["distance_km", "source"])
+Quote = namedtuple("Quote", ["distance_km", "base_rate", "rate_per_km", "distance_charge", "total_cost"])
+
+
+class RoadGraph:
+	"""An undirected (plus one-way) road network with cached shortest paths
+
+	File format: {"nodes": [[id, lat, lng], ...],
+	"edges": [[from_id, to_id, length_km, oneway], ...]}
+	"""
+
+	def __init__(self, nodes, edges):
+		self.coordinates = {node_id: (lat, lng) for node_id, lat, lng in nodes}
+		self.adjacency = defaultdict(list)
+		for edge in edges:
+			source, target, length_km = edge[:3]
+			oneway = len(edge) > 3 and edge[3]
+			self.adjacency[source].append((target, float(length_km)))
+			if not oneway:
+				self.adjacency[target].append((source, float(length_km)))
+		self.grid = defaultdict(list)
+		for node_id, (lat, lng) in self.coordinates.items():
+			self.grid[self._cell(lat, lng)].append(node_id)
+		self.shortest_km = lru_cache(maxsize=SHORTEST_PATH_CACHE_SIZE)(self._dijkstra)
+
+	@classmethod
+	def load(cls, path):
+		with open(path) as graph_file:
+			data = json.load(graph_file)
+		return cls(data["nodes"], data["edges"])
+
+	@staticmethod
+	def _cell(lat, lng):
+		return (math.floor(lat / GRID_DEGREES), math.floor(lng / GRID_DEGREES))
+
+	def nearest_node(self, lat, lng):
+		"""(node_id, km) of the closest node in the surrounding grid cells, or None"""
+		row, col = self._cell(lat, lng)
+		best = None
+		for d_row in (-1, 0, 1):
+			for d_col in (-1, 0, 1):
+				for node_id in self.grid.get((row + d_row, col + d_col), ()):
+					node_lat, node_lng = self.coordinates[node_id]
+					km = haversine_km(lat, lng, node_lat, node_lng)
+					if best is None or km < best[1]:
+						best = (node_id, km)
+		return best
+
+	def _dijkstra(self, source, target):
+		"""Shortest path length in km, or None when target is unreachable"""
+		distances = {source: 0.0}
+		queue = [(0.0, source)]
+		while queue:
+			distance, node = heapq.heappop(queue)
+			if node == target:
+				return distance
+			if distance > distances.get(node, math.inf):
+				continue
+			for neighbour, length_km in self.adjacency.get(node, ()):
+				candidate = distance + length_km
+				if candidate < distances.get(neighbour, math.inf):
+					distances[neighbour] = candidate
+					heapq.heappush(queue, (candidate, neighbour))
+		return None
+
+	def route_km(self, pickup, dropoff):
+		"""Road distance between two (lat, lng) points, or None if either is off the network"""
+		start = self.nearest_node(*pickup)
+		end = self.nearest_node(*dropoff)
+		if start is None or end is None or max(start[1], end[1]) > MAX_SNAP_KM:
+			return None
+		path_km = self.shortest_km(start[0], end[0])
+		if path_km is None:
+			return None
+		# Plus the walk from each point to the road it was snapped to
+		return path_km + start[1] + end[1]
+
+
+_graph = None
+_graph_loaded = False
+_graph_lock = threading.Lock()
+
+
+def get_road_graph():
+	"""The road graph from settings.MOVER_ROAD_GRAPH, loaded once per process (None if unset)"""
+	global _graph, _graph_loaded
+	if not _graph_loaded:
+		with _graph_lock:
+			if not _graph_loaded:
+				path = getattr(settings, "MOVER_ROAD_GRAPH", None)
+				_graph = RoadGraph.load(path) if path else None
+				_graph_loaded = True
+	return _graph
+
+
+def route_distance(pickup, dropoff):
+	"""Route between two (lat, lng) points: by road when possible, otherwise as the crow flies"""
+	graph = get_road_graph()
+	if graph is not None:
+		road_km = graph.route_km(pickup, dropoff)
+		if road_km is not None:
+			return Route(road_km, "road")
+	return Route(haversine_km(*pickup, *dropoff), "straight_line")
+
+
+def parse_point(latitude, longitude):
+	"""A (lat, lng) tuple from request values, or None if missing or out of range"""
+	try:
+		lat, lng = float(latitude), float(longitude)
+	except (TypeError, ValueError):
+		return None
+	if -90 <= lat <= 90 and -180 <= lng <= 180:
+		return (lat, lng)
+	return None
+
+
+def _money(value):
+	return Decimal(value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def quote(mover, distance_km):
+	"""Price one mover for a move of distance_km"""
+	distance = _money(distance_km)
+	base_rate = _money(mover.rate_per_km)
+	distance_charge = _money(distance * DISTANCE_RATE_PER_KM)
+	return Quote(distance, base_rate, DISTANCE_RATE_PER_KM, distance_charge, base_rate + distance_charge)
+
+
+def quote_movers(queryset, distance_km):
+	"""Annotate every mover with quote_distance_charge and quote_total for distance_km, cheapest first"""
+	money = DecimalField(max_digits=12, decimal_places=2)
+	distance_charge = _money(_money(distance_km) * DISTANCE_RATE_PER_KM)
+	return queryset.annotate(
+		quote_distance_charge=Value(distance_charge, output_field=money),
+		quote_total=F("rate_per_km") + Value(distance_charge, output_field=money),
+	).order_by("quote_total", "-rating_avg", "id")
@@ -0,0 +1,255 @@
+"""
+Daily job ordering and capacity for mover crews.
+
+A crew's confirmed bookings for one day are ordered to keep the empty
+driving between jobs short: each job is driven pickup -> dropoff, and the
+leg between jobs runs from one dropoff to the next pickup, so the costs
+are asymmetric. The order starts from a nearest-neighbour tour and is
+improved with 2-opt, alternating with single-job moves (Or-opt), which do
+most of the work when legs cost different amounts each way. Forward and
+reverse prefix sums price each segment reversal in O(1), and the search
+stops at a deadline so a day with hundreds of jobs still fits in a
+request.
+
+Distances are straight-line (houses.geo.haversine_km); jobs without
+coordinates are kept, in booking order, after the routed ones.
+
+confirm_booking() checks capacity with the crew's MoverService row
+locked, so two confirmations for the same crew can't both take the last
+slot of a day, and only moves a booking that is still pending.
+"""
+import time
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from houses.geo import haversine_km
+
+ROUTING_TIME_BUDGET = 0.5  # seconds per day plan
+ACTIVE_STATUSES = ("pending", "confirmed")
+
+DayPlan = namedtuple("DayPlan", ["service", "date", "bookings", "unrouted", "driving_km", "capacity"])
+Slot = namedtuple("Slot", ["date", "capacity", "confirmed", "pending", "available"])
+
+
+def _points(booking):
+	if None in (booking.pickup_latitude, booking.pickup_longitude, booking.dropoff_latitude, booking.dropoff_longitude):
+		return None
+	return (
+		(float(booking.pickup_latitude), float(booking.pickup_longitude)),
+		(float(booking.dropoff_latitude), float(booking.dropoff_longitude)),
+	)
+
+
+def _leg_matrix(jobs):
+	"""cost[a][b]: km from job a's dropoff to job b's pickup"""
+	return [
+		[0.0 if a == b else haversine_km(*jobs[a][1], *jobs[b][0]) for b in range(len(jobs))]
+		for a in range(len(jobs))
+	]
+
+
+def nearest_neighbour(cost):
+	"""Open tour starting at job 0, always driving to the closest unvisited pickup"""
+	count = len(cost)
+	if not count:
+		return []
+	tour = [0]
+	remaining = set(range(1, count))
+	while remaining:
+		last = cost[tour[-1]]
+		following = min(remaining, key=last.__getitem__)
+		tour.append(following)
+		remaining.remove(following)
+	return tour
+
+
+def tour_cost(tour, cost):
+	return sum(cost[a][b] for a, b in zip(tour, tour[1:]))
+
+
+def two_opt(tour, cost, deadline):
+	"""Improve an open tour by reversing segments until no reversal helps or time runs out"""
+	count = len(tour)
+	if count < 3:
+		return tour
+	tour = list(tour)
+	improved = True
+	while improved and time.monotonic() < deadline:
+		improved = False
+		# forward[k] / backward[k]: cost of the first k legs driven as listed / each leg driven the other way
+		forward = [0.0]
+		backward = [0.0]
+		for a, b in zip(tour, tour[1:]):
+			forward.append(forward[-1] + cost[a][b])
+			backward.append(backward[-1] + cost[b][a])
+		for i in range(count - 1):
+			if time.monotonic() >= deadline:
+				break
+			before = tour[i - 1] if i > 0 else None
+			for j in range(i + 1, count):
+				after = tour[j + 1] if j + 1 < count else None
+				# Reversing tour[i..j] turns its inner legs around and swaps the two boundary legs
+				delta = (backward[j] - backward[i]) - (forward[j] - forward[i])
+				if before is not None:
+					delta += cost[before][tour[j]] - cost[before][tour[i]]
+				if after is not None:
+					delta += cost[tour[i]][after] - cost[tour[j]][after]
+				if delta < -1e-9:
+					tour[i:j + 1] = reversed(tour[i:j + 1])
+					improved = True
+					break
+			if improved:
+				break
+	return tour
+
+
+def _leg(cost, a, b):
+	return 0.0 if a is None or b is None else cost[a][b]
+
+
+def relocate(tour, cost, deadline):
+	"""Improve an open tour by moving single jobs to a cheaper position until none helps or time runs out"""
+	count = len(tour)
+	if count < 3:
+		return tour
+	tour = list(tour)
+	improved = True
+	while improved and time.monotonic() < deadline:
+		improved = False
+		for i in range(count):
+			if time.monotonic() >= deadline:
+				break
+			job = tour[i]
+			before = tour[i - 1] if i > 0 else None
+			after = tour[i + 1] if i + 1 < count else None
+			saved = _leg(cost, before, job) + _leg(cost, job, after) - _leg(cost, before, after)
+			rest = tour[:i] + tour[i + 1:]
+			best, best_position = 1e-9, None
+			for position in range(count):
+				if position == i:
+					continue
+				left = rest[position - 1] if position > 0 else None
+				right = rest[position] if position < count - 1 else None
+				gain = saved - (_leg(cost, left, job) + _leg(cost, job, right) - _leg(cost, left, right))
+				if gain > best:
+					best, best_position = gain, position
+			if best_position is not None:
+				rest.insert(best_position, job)
+				tour = rest
+				improved = True
+				break
+	return tour
+
+
+def improve(tour, cost, deadline):
+	"""Alternate 2-opt and Or-opt until neither shortens the tour"""
+	length = tour_cost(tour, cost)
+	while time.monotonic() < deadline:
+		tour = relocate(two_opt(tour, cost, deadline), cost, deadline)
+		shorter = tour_cost(tour, cost)
+		if shorter >= length - 1e-9:
+			break
+		length = shorter
+	return tour
+
+
+def order_jobs(bookings, time_budget=ROUTING_TIME_BUDGET):
+	"""(routed bookings in driving order, bookings without coordinates, empty driving km)"""
+	routed, unrouted = [], []
+	for booking in bookings:
+		(routed if _points(booking) else unrouted).append(booking)
+	jobs = [_points(booking) for booking in routed]
+	cost = _leg_matrix(jobs)
+	tour = improve(nearest_neighbour(cost), cost, time.monotonic() + time_budget)
+	return [routed[index] for index in tour], unrouted, tour_cost(tour, cost)
+
+
+def plan_days(services, date, time_budget=ROUTING_TIME_BUDGET):
+	"""A DayPlan of confirmed jobs on `date` for each service, loaded in one query"""
+	from booking.models import MoverBooking
+
+	services = list(services)
+	by_service = defaultdict(list)
+	bookings = (
+		MoverBooking.objects
+		.filter(mover__in=services, move_date=date, status="confirmed")
+		.order_by("created_at", "id")
+	)
+	for booking in bookings:
+		by_service[booking.mover_id].append(booking)
+
+	plans = []
+	for service in services:
+		ordered, unrouted, driving_km = order_jobs(by_service[service.pk], time_budget)
+		plans.append(DayPlan(service, date, ordered, unrouted, driving_km, service.daily_capacity))
+	return plans
+
+
+def slot_availability(service, start, days=14):
+	"""One Slot per day from `start`: capacity, confirmed and pending jobs, and free places"""
+	from booking.models import MoverBooking
+
+	end = start + timedelta(days=days - 1)
+	counts = {
+		row["move_date"]: row
+		for row in (
+			MoverBooking.objects
+			.filter(mover=service, move_date__range=(start, end), status__in=ACTIVE_STATUSES)
+			.order_by()
+			.values("move_date")
+			.annotate(
+				confirmed=Count("pk", filter=Q(status="confirmed")),
+				pending=Count("pk", filter=Q(status="pending")),
+			)
+		)
+	}
+	slots = []
+	for offset in range(days):
+		date = start + timedelta(days=offset)
+		row = counts.get(date, {"confirmed": 0, "pending": 0})
+		available = max(service.daily_capacity - row["confirmed"], 0)
+		slots.append(Slot(date, service.daily_capacity, row["confirmed"], row["pending"], available))
+	return slots
+
+
+def has_capacity(service, date, exclude=None):
+	"""Whether the crew can take one more confirmed job on `date`"""
+	from booking.models import MoverBooking
+
+	confirmed = MoverBooking.objects.filter(mover=service, move_date=date, status="confirmed")
+	if exclude is not None:
+		confirmed = confirmed.exclude(pk=exclude.pk)
+	return confirmed.count() < service.daily_capacity
+
+
+def confirm_booking(booking):
+	"""Confirm `booking` if it is still pending and its crew has a slot left on its move date
+
+	Returns whether it was confirmed. When it wasn't, booking.status is
+	reloaded, so a booking cancelled or rejected meanwhile reads as such.
+	"""
+	from booking.counters import MOVER_BOOKING, record_status_change
+	from booking.models import MoverBooking
+	from booking.summaries import invalidate_summaries
+
+	from .models import MoverService
+
+	with transaction.atomic():
+		# Concurrent confirmations for this crew wait here, so each counts the others' jobs
+		service = MoverService.objects.select_for_update().get(pk=booking.mover_id)
+		full = booking.move_date and not has_capacity(service, booking.move_date, exclude=booking)
+		# Conditional on the status, so a concurrent cancel or reject is never overwritten
+		if not full and MoverBooking.objects.filter(pk=booking.pk, status="pending").update(
+			status="confirmed", updated_at=timezone.now()
+		):
+			# update() sends no signals, so adjust the counters (and the status they last saw) here
+			invalidate_summaries(booking.tenant_id, service.owner_id)
+			record_status_change(MOVER_BOOKING, "pending", "confirmed")
+			booking.status = booking._counted_status = "confirmed"
+			return True
+	booking.status = MoverBooking.objects.filter(pk=booking.pk).values_list("status", flat=True).first()
+	return False
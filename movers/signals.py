@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import MoverRating, MoverService
+
+
+@receiver(post_save, sender=MoverRating)
+def rating_saved(sender, instance, created, raw=False, **kwargs):
+	"""Fold a new or changed score into MoverService.rating_sum/count/avg"""
+	if raw:
+		return
+	if created:
+		MoverService.adjust_ratings(instance.service_id, instance.score, 1)
+	else:
+		previous = getattr(instance, "_counted_score", None)
+		if previous is None:
+			# Saved without being loaded from the database first; the aggregates
+			# can't tell the old score apart, so recompute them from the ratings
+			MoverService.recount_ratings(instance.service_id)
+		else:
+			# Runs even for an unchanged score, so a new comment still bumps updated_at
+			MoverService.adjust_ratings(instance.service_id, instance.score - previous, 0)
+	instance._counted_score = instance.score
+
+
+@receiver(post_delete, sender=MoverRating)
+def rating_deleted(sender, instance, origin=None, **kwargs):
+	if isinstance(origin, MoverService):
+		# The whole service is going away
+		return
+	MoverService.adjust_ratings(instance.service_id, -getattr(instance, "_counted_score", instance.score), -1)
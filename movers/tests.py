@@ -1,3 +1,26 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from roomify.tests import LOCMEM_CACHES
+
+from .models import MoverRating, MoverService
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EditMoverTests(TestCase):
+    def test_editing_keeps_ratings_given_meanwhile(self):
+        owner = User.objects.create_user('mover', password='x')
+        service = MoverService.objects.create(owner=owner, name='Crew', description='Moves', location='Nairobi', phone='0722000000')
+        # The view's copy of the row, read before the rating lands
+        stale = MoverService.objects.get(pk=service.pk)
+        MoverRating.objects.create(service=service, user=User.objects.create_user('tenant', password='x'), score=4)
+
+        self.client.force_login(owner)
+        with mock.patch('movers.views.get_object_or_404', return_value=stale):
+            self.client.post(reverse('edit_mover', args=[service.pk]), {'name': 'Crew Ltd', 'daily_capacity': '6'})
+        service.refresh_from_db()
+        self.assertEqual((service.name, service.daily_capacity), ('Crew Ltd', 6))
+        self.assertEqual((service.rating_count, service.rating_sum, service.rating_avg), (1, 4, 4.0))
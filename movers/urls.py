@@ -7,6 +7,8 @@ urlpatterns = [
     path('my-services/', views.my_mover_services, name='my_mover_services'),
     path('edit/<int:pk>/', views.edit_mover, name='edit_mover'),
     path('delete/<int:pk>/', views.delete_mover, name='delete_mover'),
+    path('quotes/', views.mover_quotes, name='mover_quotes'),
+    path('schedule/', views.mover_schedule, name='mover_schedule'),
     path('manage-bookings/', views.manage_mover_bookings, name='manage_mover_bookings'),
     path('<int:pk>/', views.mover_detail, name='mover_detail'),
 ]
@@ -1,41 +1,78 @@
+from datetime import date, timedelta
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Count, Q
+from django.db.models import Count, Q
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_GET
 
 from booking.models import MoverBooking
+from notifications.emails import mover_booking_status_changed
+from roomify.conditional import conditional_page
+from roomify.fragments import render_cards
+from roomify.pagination import paginate
 
 from .models import MoverService, MoverRating
+from .quotes import parse_point, quote_movers, route_distance
+from .scheduling import confirm_booking, plan_days, slot_availability
+
+MAX_QUOTES = 50
+MAX_DAILY_CAPACITY = 500
+
+
+def _parse_capacity(value, default):
+	try:
+		capacity = int(value)
+	except (TypeError, ValueError):
+		return default
+	return min(max(capacity, 1), MAX_DAILY_CAPACITY)
 
 
 def movers_list(request):
 	query = request.GET.get("q")
 	cleaning = request.GET.get("cleaning")
+	sort = request.GET.get("sort")
 
-	services = MoverService.objects.all().annotate(
-		avg_rating=Avg("ratings__score"), rating_count=Count("ratings")
-	)
+	services = MoverService.objects.all()
+	if sort == "rating":
+		# Served by moverservice_rating_idx
+		services = services.order_by("-rating_avg", "-rating_count", "-id")
 
 	if query:
 		services = services.filter(Q(name__icontains=query) | Q(location__icontains=query))
 	if cleaning == "1":
 		services = services.filter(provides_cleaning=True)
 
+	page = paginate(request, services)
+
 	context = {
-		"services": services,
+		"services": page.object_list,
+		"cards": render_cards("movers/mover_card.html", page.object_list, name="service"),
+		"page": page,
 		"query": query or "",
 		"cleaning": cleaning == "1",
+		"sort": sort or "",
 	}
 	return render(request, "movers/list.html", context)
 
 
-def mover_detail(request, pk):
-	service = get_object_or_404(
-		MoverService.objects.annotate(
-			avg_rating=Avg("ratings__score"), rating_count=Count("ratings")
-		),
-		pk=pk,
+def _mover_state(request, pk):
+	row = (
+		MoverService.objects.filter(pk=pk)
+		.annotate(ratings_total=Count("ratings"))
+		.values_list("updated_at", "ratings_total")
+		.first()
 	)
+	if row is None:
+		return None
+	# Every rating change also bumps updated_at (see movers.signals)
+	return row, row[0]
+
+
+@conditional_page(_mover_state, templates=["movers/detail.html", "base.html"])
+def mover_detail(request, pk):
+	service = get_object_or_404(MoverService, pk=pk)
 
 	# Handle rating submission
 	if request.method == "POST":
@@ -68,6 +105,38 @@ def mover_detail(request, pk):
 	return render(request, "movers/detail.html", context)
 
 
+@require_GET
+def mover_quotes(request):
+	"""Every mover's price for a pickup/dropoff pair as JSON, cheapest first"""
+	pickup = parse_point(request.GET.get("pickup_lat"), request.GET.get("pickup_lng"))
+	dropoff = parse_point(request.GET.get("dropoff_lat"), request.GET.get("dropoff_lng"))
+	if pickup is None or dropoff is None:
+		return JsonResponse({"error": "pickup_lat, pickup_lng, dropoff_lat and dropoff_lng are required."}, status=400)
+
+	route = route_distance(pickup, dropoff)
+	movers = quote_movers(MoverService.objects.all(), route.distance_km)
+	if request.GET.get("cleaning") == "1":
+		movers = movers.filter(provides_cleaning=True)
+	quotes = [
+		{
+			"mover_id": mover.pk,
+			"name": mover.name,
+			"location": mover.location,
+			"rating": round(mover.rating_avg, 1),
+			"rating_count": mover.rating_count,
+			"base_rate": mover.rate_per_km,
+			"distance_charge": mover.quote_distance_charge,
+			"total_cost": mover.quote_total,
+		}
+		for mover in movers[:MAX_QUOTES]
+	]
+	return JsonResponse({
+		"distance_km": round(route.distance_km, 2),
+		"distance_source": route.source,
+		"quotes": quotes,
+	})
+
+
 @login_required(login_url="register")
 def add_mover(request):
 	if request.method == "POST":
@@ -78,6 +147,7 @@ def add_mover(request):
 		email = request.POST.get("email", "").strip()
 		provides_cleaning = request.POST.get("provides_cleaning") == "on"
 		rate_per_km = request.POST.get("rate_per_km")
+		daily_capacity = _parse_capacity(request.POST.get("daily_capacity"), MoverService._meta.get_field("daily_capacity").default)
 
 		if not all([name, description, location, phone, rate_per_km]):
 			messages.error(request, "Please fill all required fields.")
@@ -92,6 +162,7 @@ def add_mover(request):
 			email=email,
 			provides_cleaning=provides_cleaning,
 			rate_per_km=rate_per_km,
+			daily_capacity=daily_capacity,
 		)
 		messages.success(request, "Mover service added!")
 		return redirect("mover_detail", pk=service.pk)
@@ -102,9 +173,7 @@ def add_mover(request):
 
 @login_required(login_url="register")
 def my_mover_services(request):
-    services = MoverService.objects.filter(owner=request.user).annotate(
-        avg_rating=Avg("ratings__score"), rating_count=Count("ratings")
-    )
+    services = MoverService.objects.filter(owner=request.user)
     return render(request, "movers/my_services.html", {"services": services})
 
 
@@ -122,7 +191,12 @@ def edit_mover(request, pk):
         rate_val = request.POST.get("rate_per_km")
         if rate_val:
             service.rate_per_km = rate_val
-        service.save()
+        service.daily_capacity = _parse_capacity(request.POST.get("daily_capacity"), service.daily_capacity)
+        # Only the edited columns, so the rating totals kept by the signals aren't overwritten
+        service.save(update_fields=[
+            "name", "description", "location", "phone", "email",
+            "provides_cleaning", "rate_per_km", "daily_capacity", "updated_at",
+        ])
         messages.success(request, "Service updated.")
         return redirect("my_mover_services")
 
@@ -153,13 +227,45 @@ def manage_mover_bookings(request):
         action = request.POST.get("action")
         booking = get_object_or_404(MoverBooking, pk=booking_id, mover__in=mover_services)
         if action == "approve":
-            booking.status = "confirmed"
+            if not confirm_booking(booking):
+                if booking.status != "pending":
+                    messages.error(request, "Only pending bookings can be approved.")
+                else:
+                    messages.error(request, f"{booking.mover.name} is fully booked on {booking.move_date:%b %d}.")
+                return redirect("manage_mover_bookings")
             messages.success(request, "Booking approved!")
         elif action == "reject":
             booking.status = "rejected"
+            booking.save()
             messages.success(request, "Booking rejected!")
-        booking.save()
+        mover_booking_status_changed(booking)
         return redirect("manage_mover_bookings")
     
     context = {"bookings": bookings}
     return render(request, "movers/manage_bookings.html", context)
+
+
+@login_required(login_url="register")
+def mover_schedule(request):
+    """The day's confirmed jobs per crew in driving order, with free slots for the next two weeks"""
+    try:
+        day = date.fromisoformat(request.GET.get("date", ""))
+    except ValueError:
+        day = date.today()
+
+    services = MoverService.objects.filter(owner=request.user).order_by("name")
+    plans = [
+        {
+            "plan": plan,
+            "jobs": len(plan.bookings) + len(plan.unrouted),
+            "slots": slot_availability(plan.service, date.today()),
+        }
+        for plan in plan_days(services, day)
+    ]
+    context = {
+        "day": day,
+        "previous_day": day - timedelta(days=1),
+        "next_day": day + timedelta(days=1),
+        "plans": plans,
+    }
+    return render(request, "movers/schedule.html", context)
@@ -0,0 +1,80 @@
+"""Booking and mover notifications, queued through notifications.outbox"""
+from .outbox import enqueue
+
+SIGN_OFF = '''
+
+Best regards,
+Campus Find Team'''
+
+BOOKING_STATUS_LINES = {
+    'approved': 'Good news! The landlord has approved your booking. They will contact you about the next steps.',
+    'rejected': 'Unfortunately the landlord has declined your booking. You can browse other listings on Campus Find.',
+}
+
+MOVER_STATUS_LINES = {
+    'confirmed': 'Good news! {mover} has confirmed your move and will contact you before the day.',
+    'rejected': 'Unfortunately {mover} cannot take this move. You can book another mover on Campus Find.',
+}
+
+
+def booking_status_changed(booking):
+    """Tell the tenant their booking was approved or rejected"""
+    line = BOOKING_STATUS_LINES.get(booking.status)
+    if line is None:
+        return None
+    title = booking.property.title
+    return enqueue(
+        subject=f'Your booking for {title} was {booking.status}',
+        body=f'''Hello {booking.tenant_name},
+
+{line}
+
+Property: {title}
+Move-in date: {booking.move_in_date}''' + SIGN_OFF,
+        recipients=[booking.tenant_email],
+    )
+
+
+def _move_summary(mover_booking):
+    lines = [
+        f'Pick-up: {mover_booking.pickup_location}',
+        f'Drop-off: {mover_booking.dropoff_location}',
+    ]
+    if mover_booking.move_date:
+        lines.append(f'Move date: {mover_booking.move_date}')
+    lines.append(f'Total: KSh {mover_booking.total_cost}')
+    return '\n'.join(lines)
+
+
+def mover_booking_requested(mover_booking):
+    """Tell the mover about a new booking request"""
+    mover = mover_booking.mover
+    if mover is None:
+        return None
+    return enqueue(
+        subject=f'New booking request from {mover_booking.tenant_name}',
+        body=f'''Hello {mover.name},
+
+You have a new moving request on Campus Find. Please approve or reject it from your bookings page.
+
+{_move_summary(mover_booking)}
+Tenant: {mover_booking.tenant_name}, {mover_booking.tenant_phone}''' + SIGN_OFF,
+        recipients=[mover.email or mover.owner.email],
+    )
+
+
+def mover_booking_status_changed(mover_booking):
+    """Tell the tenant their mover confirmed or rejected the move"""
+    line = MOVER_STATUS_LINES.get(mover_booking.status)
+    if line is None:
+        return None
+    mover_name = mover_booking.mover.name if mover_booking.mover else 'The mover'
+    return enqueue(
+        subject=f'Your move was {mover_booking.status}',
+        body=f'''Hello {mover_booking.tenant_name},
+
+{line.format(mover=mover_name)}
+
+{_move_summary(mover_booking)}''' + SIGN_OFF,
+        recipients=[mover_booking.tenant_email],
+    )
@@ -0,0 +1,37 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import BATCH_SIZE, deliver
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the outbox (run from cron, or with --loop as a background worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Messages claimed per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling for new messages')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait when the outbox is empty (with --loop)')
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        totals = [0, 0, 0]
+        try:
+            while True:
+                claimed, sent, failed = deliver(options['batch_size'], connection=connection)
+                totals = [total + count for total, count in zip(totals, (claimed, sent, failed))]
+                if claimed and options['verbosity'] > 1:
+                    self.stdout.write(f'Sent {sent} of {claimed} message(s), {failed} given up')
+                if claimed == options['batch_size']:
+                    continue
+                if not options['loop']:
+                    break
+                # Idle: don't hold the SMTP connection open between polls
+                connection.close()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+        self.stdout.write(self.style.SUCCESS(f'Sent {totals[1]} of {totals[0]} message(s), {totals[2]} given up'))
@@ -0,0 +1,126 @@
+"""
+Transactional email outbox.
+
+Views call enqueue() instead of send_mail(), which only inserts an
+OutboxMessage row, so the email commits or rolls back with the change
+that caused it and no request waits on SMTP. `manage.py send_outbox`
+delivers due messages in batches over one reused backend connection.
+Failed messages are retried with exponential backoff and marked failed
+after MAX_ATTEMPTS.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 8
+RETRY_DELAY = timedelta(minutes=1)  # doubled after every failed attempt
+MAX_RETRY_DELAY = timedelta(hours=6)
+CLAIM_TIMEOUT = timedelta(minutes=5)  # a crashed sender's batch becomes due again after this
+
+
+def enqueue(subject, body, recipients, from_email=''):
+    """Queue one email for delivery; returns the OutboxMessage, or None without recipients"""
+    recipients = [address for address in recipients if address]
+    if not recipients:
+        return None
+    return OutboxMessage.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email,
+        recipients=recipients,
+    )
+
+
+def retry_delay(attempts):
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def claim(batch_size=BATCH_SIZE):
+    """Take up to batch_size due messages, pushing their next attempt past CLAIM_TIMEOUT
+
+    Rows locked by another sender are skipped, so several senders can run
+    side by side without sending a message twice.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+            next_attempt_at=now + CLAIM_TIMEOUT,
+        )
+    return messages
+
+
+def _failed(message, error):
+    attempts = message.attempts + 1
+    if attempts >= MAX_ATTEMPTS:
+        changes = {'status': 'failed'}
+    else:
+        changes = {'next_attempt_at': timezone.now() + retry_delay(attempts)}
+    OutboxMessage.objects.filter(pk=message.pk).update(attempts=attempts, last_error=str(error)[:2000], **changes)
+    return changes.get('status', 'pending')
+
+
+def deliver(batch_size=BATCH_SIZE, connection=None):
+    """Send one batch of due messages over a single connection
+
+    Pass an open connection to reuse it across batches (send_outbox --loop
+    does); otherwise one is opened and closed here. Returns
+    (claimed, sent, failed for good).
+    """
+    messages = claim(batch_size)
+    if not messages:
+        return 0, 0, 0
+
+    own_connection = connection is None
+    if own_connection:
+        connection = get_connection()
+    sent_ids = []
+    given_up = 0
+    try:
+        connection.open()
+    except Exception as exc:
+        # Server unreachable: every message in the batch waits for its next attempt
+        return len(messages), 0, sum(_failed(message, exc) == 'failed' for message in messages)
+    try:
+        for message in messages:
+            email = EmailMessage(
+                subject=message.subject,
+                body=message.body,
+                from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+                to=message.recipients,
+                connection=connection,
+            )
+            try:
+                email.send()
+            except Exception as exc:
+                given_up += _failed(message, exc) == 'failed'
+                # The connection may be broken now; start the rest of the batch on a fresh one
+                connection.close()
+                try:
+                    connection.open()
+                except Exception:
+                    pass
+            else:
+                sent_ids.append(message.pk)
+    finally:
+        if own_connection:
+            connection.close()
+        OutboxMessage.objects.filter(pk__in=sent_ids).update(
+            status='sent',
+            sent_at=timezone.now(),
+            attempts=F('attempts') + 1,
+            last_error='',
+        )
+    return len(messages), len(sent_ids), given_up
@@ -0,0 +1,81 @@
+from datetime import timedelta
+from smtplib import SMTPException
+
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import OutboxMessage
+from .outbox import CLAIM_TIMEOUT, MAX_ATTEMPTS, claim, deliver, enqueue, retry_delay
+
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise SMTPException('Mailbox unavailable')
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTests(TestCase):
+    def test_enqueue_drops_empty_recipients(self):
+        self.assertIsNone(enqueue('Subject', 'Body', ['', None]))
+        message = enqueue('Subject', 'Body', ['', 'tenant@example.com'])
+        self.assertEqual(message.recipients, ['tenant@example.com'])
+
+    def test_claimed_messages_are_not_claimed_again_until_the_claim_times_out(self):
+        message = enqueue('Subject', 'Body', ['tenant@example.com'])
+        self.assertEqual([claimed.pk for claimed in claim()], [message.pk])
+        self.assertEqual(claim(), [])
+
+        message.refresh_from_db()
+        self.assertGreater(message.next_attempt_at, timezone.now() + CLAIM_TIMEOUT - timedelta(seconds=5))
+        OutboxMessage.objects.filter(pk=message.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual([claimed.pk for claimed in claim()], [message.pk])
+
+    def test_claim_takes_due_messages_oldest_first_in_batches(self):
+        later = enqueue('Later', 'Body', ['a@example.com'])
+        OutboxMessage.objects.filter(pk=later.pk).update(next_attempt_at=timezone.now() + timedelta(hours=1))
+        first = enqueue('First', 'Body', ['a@example.com'])
+        second = enqueue('Second', 'Body', ['a@example.com'])
+        self.assertEqual([message.pk for message in claim(batch_size=1)], [first.pk])
+        self.assertEqual([message.pk for message in claim()], [second.pk])
+
+    def test_deliver_sends_and_marks_messages_sent(self):
+        enqueue('Booking approved', 'Body', ['tenant@example.com'])
+        self.assertEqual(deliver(), (1, 1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['tenant@example.com'])
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.status, message.attempts), ('sent', 1))
+        self.assertIsNotNone(message.sent_at)
+        self.assertEqual(deliver(), (0, 0, 0))
+
+    def test_failures_back_off_and_give_up_after_max_attempts(self):
+        message = enqueue('Subject', 'Body', ['tenant@example.com'])
+        before = timezone.now()
+        self.assertEqual(deliver(connection=FailingBackend()), (1, 0, 0))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertIn('Mailbox unavailable', message.last_error)
+        self.assertGreaterEqual(message.next_attempt_at, before + retry_delay(1))
+        self.assertEqual(retry_delay(2), 2 * retry_delay(1))
+
+        OutboxMessage.objects.filter(pk=message.pk).update(attempts=MAX_ATTEMPTS - 1, next_attempt_at=timezone.now())
+        self.assertEqual(deliver(connection=FailingBackend()), (1, 0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('failed', MAX_ATTEMPTS))
+        self.assertEqual(claim(), [])
+
+    def test_one_failure_does_not_stop_the_batch(self):
+        class FlakyBackend(EmailBackend):
+            def send_messages(self, email_messages):
+                if email_messages[0].subject == 'Broken':
+                    raise SMTPException('Rejected')
+                return super().send_messages(email_messages)
+
+        enqueue('Broken', 'Body', ['a@example.com'])
+        enqueue('Fine', 'Body', ['b@example.com'])
+        self.assertEqual(deliver(connection=FlakyBackend()), (2, 1, 0))
+        self.assertEqual([email.subject for email in mail.outbox], ['Fine'])
+        self.assertEqual(OutboxMessage.objects.get(subject='Broken').status, 'pending')
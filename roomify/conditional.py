@@ -0,0 +1,126 @@
+"""
+Conditional GET (ETag / Last-Modified) for the public pages.
+
+@conditional_page(state) works out a page's ETag before the view runs.
+`state` returns a cheap summary of what the page shows, e.g. an
+updated_at, an image count or a listing version (houses/listing_cache.py),
+plus an optional Last-Modified time. The ETag is a digest of that summary,
+the viewer (the nav bar and forms show who is logged in) and the source of
+the templates involved. A client that sends a matching If-None-Match or
+If-Modified-Since gets a 304 without the view running.
+
+Cache-Control:
+- logged-in pages get "private, no-cache", so browsers revalidate them
+- anonymous pages are marked as shareable; SharedCacheMiddleware turns
+  that into "public, max-age=PUBLIC_PAGE_MAX_AGE" at the end of the
+  middleware chain, unless a cookie is set on the response. Django re-sends
+  the CSRF cookie whenever a page uses {% csrf_token %}, so a page that
+  embeds a token (like base.html's registration form) stays private: a
+  shared cache must not hand one client's token to another
+- all of them get "Vary: Cookie", because the CSRF token in the page is
+  tied to the client's cookie
+
+Requests carrying flash messages skip all of this, so a 304 never hides a
+message.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.exceptions import ObjectDoesNotExist
+from django.template.loader import get_template
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+SAFE_METHODS = ('GET', 'HEAD')
+DEFAULT_PUBLIC_MAX_AGE = 60
+
+_template_digests = {}  # id() of the compiled templates -> digest of their source
+
+
+def _digest(value):
+    return hashlib.md5(repr(value).encode()).hexdigest()
+
+
+def _templates_digest(names):
+    templates = [get_template(name).template for name in names]
+    # The cached loader hands back the same objects until a template changes
+    key = tuple(id(template) for template in templates)
+    digest = _template_digests.get(key)
+    if digest is None:
+        digest = _template_digests[key] = _digest([template.source for template in templates])
+    return digest
+
+
+def _viewer(request):
+    """What the page shows about the logged-in user (the nav bar), or None when anonymous"""
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    try:
+        picture = user.profile.profile_picture.name
+    except ObjectDoesNotExist:
+        picture = ''
+    return (user.pk, user.get_username(), user.first_name, user.email, picture)
+
+
+def conditional_page(state, templates=()):
+    """Answer conditional GETs from `state` without running the view
+
+    state(request, *args, **kwargs) returns (version, last_modified), where
+    `version` changes whenever the page would render differently and
+    last_modified is a datetime or None, or returns None to just run the
+    view (e.g. a missing object that should 404). `templates` are the names
+    of the templates the page renders; editing one changes every ETag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS or CookieStorage.cookie_name in request.COOKIES:
+                return view(request, *args, **kwargs)
+            current = state(request, *args, **kwargs)
+            if current is None:
+                return view(request, *args, **kwargs)
+
+            version, last_modified = current
+            viewer = _viewer(request)
+            etag = f'W/"{_digest((version, viewer, _templates_digest(templates)))}"'
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.headers.setdefault('ETag', etag)
+            if timestamp is not None:
+                response.headers.setdefault('Last-Modified', http_date(timestamp))
+
+            if viewer is None:
+                response.shared_cache_max_age = getattr(settings, 'PUBLIC_PAGE_MAX_AGE', DEFAULT_PUBLIC_MAX_AGE)
+            else:
+                patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+class SharedCacheMiddleware:
+    """Lets shared caches keep anonymous @conditional_page responses that set no cookies"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        max_age = getattr(response, 'shared_cache_max_age', None)
+        if max_age is None or response.has_header('Cache-Control'):
+            return response
+        if response.cookies:
+            # e.g. the CSRF cookie, re-sent whenever the page embeds a token; this response is for this client only
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True, max_age=max_age)
+        return response
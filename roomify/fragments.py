@@ -0,0 +1,56 @@
+"""
+Cached HTML for the cards on list pages.
+
+render_cards() renders one card template per object and keeps the HTML
+in the cache. Each card's key includes:
+- the object's card_version(), e.g. a House's updated_at plus its cover
+  image
+- a digest of the card template's source, so a deploy that changes the
+  markup never serves old cards
+
+A page of cards costs one get_many(). Only cards whose object changed
+are rendered again, and those go back in one set_many(). Cards are
+rendered without the request, so they must not use the user, CSRF token
+or other per-request context.
+
+FRAGMENT_CACHE_TIMEOUT = 0 turns the cache off (every card is rendered).
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+DEFAULT_TIMEOUT = 24 * 60 * 60
+
+
+def _digest(value):
+    return hashlib.md5(repr(value).encode()).hexdigest()
+
+
+def render_cards(template_name, objects, name='object', context=None, version=None):
+    """The rendered `template_name` for each object (available to it as `name`), from the cache where current
+
+    `version(obj)`, obj.card_version() by default, must change whenever
+    anything the card shows changes.
+    """
+    version = version or (lambda obj: obj.card_version())
+    template = get_template(template_name)
+    context = context or {}
+    timeout = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+    if not timeout:
+        return [mark_safe(template.render({**context, name: obj})) for obj in objects]
+
+    prefix = f'fragment:{_digest((template_name, template.template.source, sorted(context.items())))}'
+    keys = [f'{prefix}:{obj.pk}:{_digest(version(obj))}' for obj in objects]
+    cached = cache.get_many(keys)
+    cards, rendered = [], {}
+    for key, obj in zip(keys, objects):
+        html = cached.get(key)
+        if html is None:
+            html = rendered[key] = template.render({**context, name: obj})
+        cards.append(mark_safe(html))
+    if rendered:
+        cache.set_many(rendered, timeout)
+    return cards
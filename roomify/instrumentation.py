@@ -0,0 +1,182 @@
+"""
+Per-request timing: DB queries, template rendering and total time.
+
+RequestInstrumentationMiddleware times every request. For a sampled share
+of them (INSTRUMENTATION_SAMPLE_RATE) it also counts queries and DB time
+through connection.execute_wrapper() and collects template render time
+from the InstrumentedTemplates backend. The figures go out as a
+Server-Timing header (visible in the browser's network panel) and as one
+JSON line on the 'roomify.requests' logger.
+
+The same SQL run INSTRUMENTATION_DUPLICATE_QUERIES times or more in one
+request is reported with a short stack snippet from project code; that is
+usually an N+1 loop. Unsampled requests only pay for two clock reads
+and the /metrics bookkeeping (roomify/metrics.py).
+"""
+import json
+import logging
+import random
+import time
+import traceback
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import observe_request
+
+logger = logging.getLogger('roomify.requests')
+
+_current = ContextVar('roomify_request_metrics', default=None)
+
+STACK_FRAMES = 4  # project frames kept per duplicated query
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_ms', 'template_ms', 'template_depth', 'seen', 'duplicates', 'threshold')
+
+    def __init__(self, threshold):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.seen = {}
+        self.duplicates = {}
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper() hook"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - started) * 1000
+            self.queries += 1
+            seen = self.seen[sql] = self.seen.get(sql, 0) + 1
+            if seen == self.threshold:
+                # Only the first time a statement crosses the threshold pays for a stack walk
+                self.duplicates[sql] = _project_stack()
+
+    def duplicate_report(self):
+        return [
+            {'sql': sql[:300], 'count': self.seen[sql], 'stack': stack}
+            for sql, stack in self.duplicates.items()
+        ]
+
+
+def _project_stack():
+    """The innermost few frames that belong to this project, as 'path:line in function'"""
+    root = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(root) and 'site-packages' not in frame.filename
+        and not frame.filename.endswith('instrumentation.py')
+    ]
+    return [
+        f'{frame.filename[len(root) + 1:]}:{frame.lineno} in {frame.name}'
+        for frame in frames[-STACK_FRAMES:]
+    ]
+
+
+def current_metrics():
+    """The RequestMetrics of the request being handled, or None if it isn't sampled"""
+    return _current.get()
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        # Only the outermost render counts, so nested render_to_string calls aren't added twice
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_ms += (time.perf_counter() - started) * 1000
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """The Django template backend, with render time reported to RequestInstrumentationMiddleware"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
+
+
+class RequestInstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = _setting('INSTRUMENTATION_SAMPLE_RATE', 1.0)
+        self.slow_ms = _setting('INSTRUMENTATION_SLOW_MS', 1000)
+        self.duplicate_threshold = _setting('INSTRUMENTATION_DUPLICATE_QUERIES', 5)
+        self.server_timing = _setting('INSTRUMENTATION_SERVER_TIMING', True)
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            response = self.get_response(request)
+            total_ms = (time.perf_counter() - started) * 1000
+            self.finish(request, response, total_ms, None)
+            return response
+
+        metrics = RequestMetrics(self.duplicate_threshold)
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+        self.finish(request, response, total_ms, metrics)
+        return response
+
+    def finish(self, request, response, total_ms, metrics):
+        match = getattr(request, 'resolver_match', None)
+        observe_request(
+            match.view_name if match else 'unmatched', request.method, response.status_code, total_ms / 1000,
+            queries=metrics.queries if metrics is not None else None,
+            db_seconds=metrics.db_ms / 1000 if metrics is not None else 0.0,
+        )
+
+        if self.server_timing:
+            timings = [f'total;dur={total_ms:.1f}']
+            if metrics is not None:
+                timings.append(f'db;dur={metrics.db_ms:.1f};desc="{metrics.queries} queries"')
+                timings.append(f'tpl;dur={metrics.template_ms:.1f}')
+            response['Server-Timing'] = ', '.join(timings)
+
+        slow = total_ms >= self.slow_ms
+        if metrics is None and not slow:
+            return
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'sampled': metrics is not None,
+        }
+        if metrics is not None:
+            record.update(
+                queries=metrics.queries,
+                db_ms=round(metrics.db_ms, 1),
+                template_ms=round(metrics.template_ms, 1),
+            )
+            if metrics.duplicates:
+                record['duplicate_queries'] = metrics.duplicate_report()
+        level = logging.WARNING if slow or record.get('duplicate_queries') else logging.INFO
+        logger.log(level, json.dumps(record))
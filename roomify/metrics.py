@@ -0,0 +1,387 @@
+"""
+Prometheus metrics at /metrics.
+
+Each thread records into its own shard (plain dicts only that thread
+writes), so observing a request takes no lock. Every
+METRICS_FLUSH_SECONDS a process sums its thread shards and writes the
+totals to METRICS_DIR as `<pid>-<start>.json` with an atomic rename; a
+scrape flushes its own process and adds up every file there, so with
+several workers the numbers cover all of them. Only processes that have
+served a request flush (again at exit), so management commands leave no
+files behind. A scrape folds the file of a worker that has exited and
+hasn't flushed for METRICS_STALE_SECONDS into retired.json before
+removing it, so counters never go backwards when workers are recycled.
+Scrapes take a lock on METRICS_DIR/.lock for that; without fcntl
+(Windows) old files are simply kept.
+
+Recorded per URL name: request counts by status class, a latency
+histogram, and query count and DB time for the requests
+RequestInstrumentationMiddleware samples. CountingRedisCache (and
+CountingFileBasedCache) count cache hits and misses. The business gauges (units per category, bookings
+and mover bookings per status) are read from the counter tables kept up
+to date by houses.stats and booking.counters, never counted per scrape.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.redis import RedisCache
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+RETIRED_FILE = 'retired.json'
+
+_MISSING = object()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class _Shard:
+    """One thread's totals since the process started"""
+    __slots__ = ('requests', 'latency', 'sampled', 'cache')
+
+    def __init__(self):
+        self.requests = {}  # (view, method, status class) -> count
+        self.latency = {}   # view -> [count per bucket..., count above the last, sum of seconds]
+        self.sampled = {}   # view -> [sampled requests, queries, DB seconds]
+        self.cache = {}     # (cache, 'hit' | 'miss') -> count
+
+
+class _Process:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.name = f'{self.pid}-{int(time.time() * 1000)}'
+        self.shards = []
+        self.local = threading.local()
+        self.flushed_at = time.monotonic()
+        self.flush_at_exit = False
+
+
+_process = _Process()
+
+
+def _shard():
+    global _process
+    if _process.pid != os.getpid():
+        # Forked after recording (e.g. a preloading server): start a fresh file for this worker
+        _process = _Process()
+    shard = getattr(_process.local, 'shard', None)
+    if shard is None:
+        shard = _process.local.shard = _Shard()
+        _process.shards.append(shard)
+    return shard
+
+
+def observe_request(view, method, status, seconds, queries=None, db_seconds=0.0):
+    """Record one finished request; `queries` is None when it wasn't sampled"""
+    shard = _shard()
+    if not _process.flush_at_exit:
+        # This process serves requests, so its last totals must reach METRICS_DIR
+        _process.flush_at_exit = True
+        atexit.register(flush)
+    key = (view, method, f'{status // 100}xx')
+    shard.requests[key] = shard.requests.get(key, 0) + 1
+
+    latency = shard.latency.get(view)
+    if latency is None:
+        latency = shard.latency[view] = [0] * (len(LATENCY_BUCKETS) + 2)
+    index = 0
+    while index < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[index]:
+        index += 1
+    latency[index] += 1
+    latency[-1] += seconds
+
+    if queries is not None:
+        sampled = shard.sampled.get(view)
+        if sampled is None:
+            sampled = shard.sampled[view] = [0, 0, 0.0]
+        sampled[0] += 1
+        sampled[1] += queries
+        sampled[2] += db_seconds
+
+    if time.monotonic() - _process.flushed_at >= _setting('METRICS_FLUSH_SECONDS', 10):
+        flush()
+
+
+def observe_cache(cache, hit):
+    shard = _shard()
+    key = (cache, 'hit' if hit else 'miss')
+    shard.cache[key] = shard.cache.get(key, 0) + 1
+
+
+def _merge(totals, series):
+    for key, value in series:
+        if isinstance(value, list):
+            current = totals.get(key)
+            totals[key] = value if current is None else [a + b for a, b in zip(current, value)]
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+def _empty_totals():
+    return {'requests': {}, 'latency': {}, 'sampled': {}, 'cache': {}}
+
+
+def _dump(totals):
+    """{family: {key: value}} as JSON-ready {family: [[key, value], ...]}"""
+    return {
+        family: [[list(key) if isinstance(key, tuple) else key, value] for key, value in merged.items()]
+        for family, merged in totals.items()
+    }
+
+
+def _load(totals, data):
+    """Add the families of a file written by _dump() to totals"""
+    for family, merged in totals.items():
+        _merge(merged, [(tuple(key) if isinstance(key, list) else key, value) for key, value in data.get(family, [])])
+
+
+def _process_totals():
+    """This process's totals as JSON-ready {family: [[key, value], ...]}"""
+    totals = _empty_totals()
+    for shard in list(_process.shards):
+        for family, merged in totals.items():
+            # list(dict.items()) copies in one step, so a thread recording meanwhile can't break the loop
+            _merge(merged, [(key, list(value) if isinstance(value, list) else value)
+                            for key, value in list(getattr(shard, family).items())])
+    return _dump(totals)
+
+
+def _metrics_dir():
+    return Path(_setting('METRICS_DIR', Path(settings.BASE_DIR) / 'var' / 'metrics'))
+
+
+def _write(path, data):
+    """Replace path with data as JSON in one rename, so readers never see half a file"""
+    temporary = path.with_name(f'.{path.stem}-{os.getpid()}-{threading.get_ident()}.tmp')
+    temporary.write_text(json.dumps(data))
+    os.replace(temporary, path)
+
+
+def flush():
+    """Write this process's totals to its file in METRICS_DIR"""
+    _process.flushed_at = time.monotonic()
+    directory = _metrics_dir()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        _write(directory / f'{_process.name}.json', _process_totals())
+    except OSError:
+        # Metrics must never fail a request; the next flush tries again
+        pass
+
+
+def _exited(name):
+    """Whether the worker that wrote `<pid>-<start>.json` is no longer running"""
+    try:
+        os.kill(int(name.split('-')[0]), 0)
+    except (ValueError, ProcessLookupError):
+        return True
+    except OSError:
+        # EPERM: the pid is in use, by a process we can't signal
+        return False
+    return False
+
+
+def _retire_stale(directory):
+    """Fold the files of exited, long-silent workers into RETIRED_FILE, then remove them"""
+    stale_before = time.time() - _setting('METRICS_STALE_SECONDS', 3600)
+    retired = _empty_totals()
+    stale = []
+    for path in directory.glob('*.json'):
+        if path.name == RETIRED_FILE:
+            continue
+        try:
+            if path.stat().st_mtime >= stale_before or not _exited(path.stem):
+                continue
+            _load(retired, json.loads(path.read_text()))
+        except OSError:
+            continue
+        except ValueError:
+            # Never expected as files are renamed into place, and there is nothing to count
+            pass
+        stale.append(path)
+    if not stale:
+        return
+    try:
+        _load(retired, json.loads((directory / RETIRED_FILE).read_text()))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError):
+        # Rewriting an unreadable aggregate would lose what it holds; keep the stale files instead
+        return
+    try:
+        _write(directory / RETIRED_FILE, _dump(retired))
+    except OSError:
+        return
+    for path in stale:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def _read_all(directory):
+    totals = _empty_totals()
+    files = 0
+    for path in directory.glob('*.json'):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if path.name != RETIRED_FILE:
+            files += 1
+        _load(totals, data)
+    return totals, files
+
+
+def collect():
+    """Totals over every worker's file: ({family: {key: value}}, number of worker files read)"""
+    flush()
+    directory = _metrics_dir()
+    if fcntl is None:
+        return _read_all(directory)
+    try:
+        lock = open(directory / '.lock', 'a')
+    except OSError:
+        return _read_all(directory)
+    with lock:
+        # Held while reading too, so no scrape sees a file both on its own and inside RETIRED_FILE
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _retire_stale(directory)
+        return _read_all(directory)
+
+
+class CountingCacheMixin:
+    """Reports a cache backend's hits and misses to /metrics (named by METRICS_NAME in CACHES)"""
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.metrics_name = params.get('METRICS_NAME', 'default')
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        observe_cache(self.metrics_name, value is not _MISSING)
+        return default if value is _MISSING else value
+
+
+class CountingRedisCache(CountingCacheMixin, RedisCache):
+    pass
+
+
+class CountingFileBasedCache(CountingCacheMixin, FileBasedCache):
+    pass
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    from booking.counters import get_status_counts
+    from houses.stats import get_category_stats
+
+    totals, files = collect()
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for suffix, labels, value in samples:
+            lines.append(f'{name}{suffix}{_labels(**labels) if labels else ""} {_number(value)}')
+
+    family('roomify_http_requests_total', 'counter', 'Requests handled, by URL name, method and status class.', [
+        ('', {'view': view, 'method': method, 'status': status}, count)
+        for (view, method, status), count in sorted(totals['requests'].items())
+    ])
+
+    samples = []
+    for view, latency in sorted(totals['latency'].items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, latency):
+            cumulative += count
+            samples.append(('_bucket', {'view': view, 'le': repr(bound)}, cumulative))
+        cumulative += latency[len(LATENCY_BUCKETS)]
+        samples.append(('_bucket', {'view': view, 'le': '+Inf'}, cumulative))
+        samples.append(('_sum', {'view': view}, float(latency[-1])))
+        samples.append(('_count', {'view': view}, cumulative))
+    family('roomify_http_request_duration_seconds', 'histogram', 'Time from first middleware to response, by URL name.', samples)
+
+    sampled = sorted(totals['sampled'].items())
+    family('roomify_db_sampled_requests_total', 'counter', 'Requests whose queries were measured (INSTRUMENTATION_SAMPLE_RATE).', [
+        ('', {'view': view}, values[0]) for view, values in sampled
+    ])
+    family('roomify_db_queries_total', 'counter', 'Queries run by sampled requests.', [
+        ('', {'view': view}, values[1]) for view, values in sampled
+    ])
+    family('roomify_db_query_seconds_total', 'counter', 'Database time of sampled requests.', [
+        ('', {'view': view}, float(values[2])) for view, values in sampled
+    ])
+
+    family('roomify_cache_requests_total', 'counter', 'Cache lookups by result.', [
+        ('', {'cache': cache, 'result': result}, count)
+        for (cache, result), count in sorted(totals['cache'].items())
+    ])
+    ratios = []
+    for cache in sorted({cache for cache, _result in totals['cache']}):
+        hits = totals['cache'].get((cache, 'hit'), 0)
+        lookups = hits + totals['cache'].get((cache, 'miss'), 0)
+        ratios.append(('', {'cache': cache}, hits / lookups if lookups else 0.0))
+    family('roomify_cache_hit_ratio', 'gauge', 'Share of cache lookups that were hits since the workers started.', ratios)
+
+    stats = get_category_stats()
+    family('roomify_available_units', 'gauge', 'Units free to book, by listing category.', [
+        ('', {'category': category}, row['available_units']) for category, row in sorted(stats.items())
+    ])
+    family('roomify_available_listings', 'gauge', 'Listings open for booking, by category.', [
+        ('', {'category': category}, row['available_listings']) for category, row in sorted(stats.items())
+    ])
+    counts = get_status_counts()
+    family('roomify_bookings', 'gauge', 'Property bookings by status.', [
+        ('', {'status': status}, count) for status, count in counts['booking'].items()
+    ])
+    family('roomify_mover_bookings', 'gauge', 'Mover bookings by status.', [
+        ('', {'status': status}, count) for status, count in counts['mover_booking'].items()
+    ])
+    family('roomify_metrics_workers', 'gauge', 'Worker files added up for this scrape.', [('', {}, files)])
+    return '\n'.join(lines) + '\n'
+
+
+def _allowed(request):
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    if request.META.get('REMOTE_ADDR') in _setting('METRICS_ALLOWED_IPS', []):
+        return True
+    token = _setting('METRICS_TOKEN', '')
+    return bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+@require_GET
+def metrics(request):
+    if not _allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
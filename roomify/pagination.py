@@ -0,0 +1,218 @@
+"""
+Keyset (cursor) pagination shared by the listing views.
+
+Instead of OFFSET, each page remembers the ordering values of its last row
+and the next page asks for rows strictly after them, so a deep page costs
+the same as the first one as long as the ordering is backed by an index.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = 20
+COUNT_CACHE_TIMEOUT = 60  # seconds
+
+
+class KeysetPage:
+    def __init__(self, object_list, request, cursor_param, next_cursor, previous_cursor, total_count):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.total_count = total_count
+        self._request = request
+        self._cursor_param = cursor_param
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def _query_with_cursor(self, cursor):
+        params = self._request.GET.copy()
+        params[self._cursor_param] = cursor
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query_with_cursor(self.next_cursor) if self.has_next else ''
+
+    @property
+    def previous_query(self):
+        return self._query_with_cursor(self.previous_cursor) if self.has_previous else ''
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({'v': [_encode_value(v) for v in values], 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (values, direction) or None for a missing/garbled cursor"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = payload['v'], payload['d']
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        return None
+    return values, direction
+
+
+def get_ordering(queryset):
+    """The queryset's ordering as [(field, descending)], with a unique pk tie-breaker"""
+    ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+    fields = []
+    for item in ordering:
+        if not isinstance(item, str):
+            raise ValueError('Keyset pagination needs plain field names in order_by()')
+        fields.append((item.lstrip('-'), item.startswith('-')))
+    if not any(field in ('pk', 'id') for field, _ in fields):
+        fields.append(('id', fields[-1][1] if fields else True))
+    return fields
+
+
+def _after(fields, values):
+    """Q matching rows that sort strictly after `values` in the given ordering"""
+    condition = Q()
+    for index, (field, descending) in enumerate(fields):
+        lookups = {prior: values[i] for i, (prior, _) in enumerate(fields[:index])}
+        lookups[f'{field}__{"lt" if descending else "gt"}'] = values[index]
+        condition |= Q(**lookups)
+    return condition
+
+
+def estimated_count(queryset, timeout=COUNT_CACHE_TIMEOUT):
+    """COUNT(*) for the queryset, cached per distinct SQL for a short while"""
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.md5(repr((queryset.db, sql, params)).encode()).hexdigest()
+    return cache.get_or_set(f'pagination:count:{digest}', queryset.count, timeout)
+
+
+def _order_by(fields):
+    return [f'-{field}' if descending else field for field, descending in fields]
+
+
+def ordered_ids(queryset, limit):
+    """The pks of the first `limit` rows in the order paginate() pages through them"""
+    return list(queryset.order_by(*_order_by(get_ordering(queryset))).values_list('pk', flat=True)[:limit])
+
+
+def paginate(request, queryset, per_page=PAGE_SIZE, cursor_param='cursor', with_count=False):
+    """Return a KeysetPage of `queryset` for the cursor in request.GET"""
+    fields = get_ordering(queryset)
+    order_by = _order_by(fields)
+    reversed_order = [field if descending else f'-{field}' for field, descending in fields]
+
+    decoded = decode_cursor(request.GET.get(cursor_param))
+    if decoded and len(decoded[0]) != len(fields):
+        decoded = None
+
+    page_qs = queryset.order_by(*order_by)
+    direction = 'next'
+    if decoded:
+        values, direction = decoded
+        try:
+            if direction == 'prev':
+                flipped = [(field, not descending) for field, descending in fields]
+                page_qs = queryset.order_by(*reversed_order).filter(_after(flipped, values))
+            else:
+                page_qs = page_qs.filter(_after(fields, values))
+        except (ValidationError, ValueError, TypeError):
+            # A tampered cursor value the field could not parse; start over
+            decoded, direction = None, 'next'
+
+    rows = list(page_qs[:per_page + 1])
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+
+    def cursor_for(obj, cursor_direction):
+        return encode_cursor([getattr(obj, field) for field, _ in fields], cursor_direction)
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if (direction == 'next' and has_more) or (direction == 'prev' and decoded):
+            next_cursor = cursor_for(rows[-1], 'next')
+        if (direction == 'prev' and has_more) or (direction == 'next' and decoded):
+            previous_cursor = cursor_for(rows[0], 'prev')
+
+    total_count = estimated_count(queryset) if with_count else None
+    return KeysetPage(rows, request, cursor_param, next_cursor, previous_cursor, total_count)
+
+
+def paginate_ids(request, queryset, ids, total_count, complete=True, per_page=PAGE_SIZE, cursor_param='cursor'):
+    """Return a KeysetPage of `queryset` using `ids`, its pks already in page order (e.g. from a cache)
+
+    Cursors are the same as paginate()'s. Returns None when the cursor
+    names a row that isn't in `ids`, or when `ids` is only the start of the
+    results (complete=False) and the page runs past its end, so the caller
+    can fall back to paginate().
+    """
+    fields = get_ordering(queryset)
+    pk_index = next(index for index, (field, _) in enumerate(fields) if field in ('pk', 'id'))
+
+    decoded = decode_cursor(request.GET.get(cursor_param))
+    if decoded and len(decoded[0]) != len(fields):
+        decoded = None
+
+    start, end = 0, per_page
+    if decoded:
+        values, direction = decoded
+        positions = {pk: position for position, pk in enumerate(ids)}
+        try:
+            position = positions.get(int(values[pk_index]))
+        except (TypeError, ValueError):
+            position = None
+        if position is None:
+            return None
+        if direction == 'prev':
+            start, end = max(position - per_page, 0), position
+        else:
+            start, end = position + 1, position + 1 + per_page
+    if not complete and end >= len(ids):
+        return None
+
+    window = ids[start:end]
+    by_pk = queryset.in_bulk(window)
+    # Rows removed since `ids` was built are left out rather than shifting the page
+    rows = [by_pk[pk] for pk in window if pk in by_pk]
+
+    def cursor_for(obj, cursor_direction):
+        return encode_cursor([getattr(obj, field) for field, _ in fields], cursor_direction)
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if end < len(ids):
+            next_cursor = cursor_for(rows[-1], 'next')
+        if start > 0:
+            previous_cursor = cursor_for(rows[0], 'prev')
+    return KeysetPage(rows, request, cursor_param, next_cursor, previous_cursor, total_count)
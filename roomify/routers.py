@@ -0,0 +1,158 @@
+"""
+Read replicas for the browse and listing pages.
+
+ReplicaRouter sends every write, and every read by default, to the
+primary ('default'). ReplicaMiddleware lets a request read from a replica
+only if all of these hold:
+- it is a GET/HEAD to a view named in REPLICA_VIEWS
+- the client isn't pinned to the primary
+- at least one alias in DATABASE_REPLICAS passed its last health check
+
+Read-your-writes: a POST, or any request that wrote through the ORM,
+sets a short-lived cookie that keeps the client on the primary for
+REPLICA_PIN_SECONDS, longer than the replica lag we tolerate. Within a
+request, reads go back to the primary after the first write and inside
+transaction.atomic() blocks.
+
+Each process checks a replica at most every REPLICA_CHECK_SECONDS. On
+PostgreSQL the check measures replay lag. A replica that can't be
+reached, or is more than REPLICA_MAX_LAG_SECONDS behind, gets no reads
+until a later check passes.
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger('roomify.db')
+
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_route = ContextVar('roomify_db_route', default=None)
+_health = {}  # alias -> (monotonic time of the last check, healthy)
+
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class _RouteState:
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind the primary (0 when it can't tell, e.g. on SQLite)"""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(POSTGRES_LAG_SQL)
+            return float(cursor.fetchone()[0])
+        cursor.execute('SELECT 1')
+        return 0.0
+
+
+def _check(alias):
+    try:
+        lag = replica_lag(alias)
+    except DatabaseError as exc:
+        logger.warning('Replica %s unavailable, reading from the primary: %s', alias, exc)
+        connections[alias].close()
+        return False
+    if lag > _setting('REPLICA_MAX_LAG_SECONDS', 5):
+        logger.warning('Replica %s is %.1fs behind, reading from the primary', alias, lag)
+        return False
+    return True
+
+
+def healthy_replicas():
+    """The configured replicas that passed their latest health check"""
+    now = time.monotonic()
+    interval = _setting('REPLICA_CHECK_SECONDS', 5)
+    healthy = []
+    for alias in _setting('DATABASE_REPLICAS', []):
+        checked_at, ok = _health.get(alias, (None, False))
+        if checked_at is None or now - checked_at >= interval:
+            # Record the attempt first so other threads keep the previous answer instead of checking too
+            _health[alias] = (now, ok)
+            ok = _check(alias)
+            _health[alias] = (now, ok)
+        if ok:
+            healthy.append(alias)
+    return healthy
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _setting('DATABASE_REPLICAS', []):
+            return None
+        state = _route.get()
+        if state is None or state.replica is None or state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Explicit, so objects loaded from a replica don't pull their relations from it too
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _route.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *_setting('DATABASE_REPLICAS', [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in _setting('DATABASE_REPLICAS', []):
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        if not _setting('DATABASE_REPLICAS', []):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.views = frozenset(_setting('REPLICA_VIEWS', []))
+        self.pin_seconds = _setting('REPLICA_PIN_SECONDS', 10)
+
+    def __call__(self, request):
+        state = _RouteState()
+        token = _route.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _route.reset(token)
+        if state.wrote or request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _route.get()
+        if (
+            state is None or request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+            or request.resolver_match.view_name not in self.views
+        ):
+            return None
+        replicas = healthy_replicas()
+        if replicas:
+            state.replica = random.choice(replicas)
+        return None
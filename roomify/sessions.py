@@ -0,0 +1,38 @@
+"""
+Session engine that keeps anonymous sessions out of the database.
+
+Logged-in sessions are stored as by Django's cached_db engine: in the
+database, with the cache in front for reads. Sessions without a logged-in
+user live only in the cache (SESSION_CACHE_ALIAS), so anonymous browsing
+never writes a django_session row. The first save after login moves the
+session into the database.
+
+Enable with SESSION_ENGINE = 'roomify.sessions'; `manage.py
+prune_sessions` removes expired rows.
+"""
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+
+class SessionStore(CachedDBStore):
+    def load(self):
+        data = super().load()
+        # Only logged-in sessions were ever written to the database
+        self._in_database = SESSION_KEY in data
+        return data
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        if SESSION_KEY in data:
+            # Right after login the row doesn't exist yet, so it has to be inserted
+            super().save(must_create or not getattr(self, '_in_database', False))
+            self._in_database = True
+            return
+        if must_create:
+            if not self._cache.add(self.cache_key, data, self.get_expiry_age()):
+                raise CreateError
+        else:
+            self._cache.set(self.cache_key, data, self.get_expiry_age())
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Our apps
     'accounts',
@@ -44,9 +45,16 @@ INSTALLED_APPS = [
     'movers',
     'booking',
     'payments',
+    'notifications',
 ]
 
 MIDDLEWARE = [
+    # First, so its total covers every other middleware
+    'roomify.instrumentation.RequestInstrumentationMiddleware',
+    # Outside every middleware that sets cookies, so it sees them all
+    'roomify.conditional.SharedCacheMiddleware',
+    # Before SessionMiddleware, so session writes also pin the client to the primary
+    'roomify.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,14 +64,30 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Anonymous sessions are kept in the cache only; logged-in ones are also stored in the
+# database (roomify/sessions.py). 'django.contrib.sessions.backends.signed_cookies'
+# also works here, at the cost of larger cookies and no server-side revocation.
+SESSION_ENGINE = 'roomify.sessions'
+SESSION_CACHE_ALIAS = 'sessions'  # not 'default', see CACHES
+# Flash messages ride in a cookie, so showing one never touches the session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 ROOT_URLCONF = 'roomify.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timing for roomify.instrumentation
+        'BACKEND': 'roomify.instrumentation.InstrumentedTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept in memory in every environment; runserver's
+            # autoreloader clears them when a template file changes
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -88,9 +112,49 @@ DATABASES = {
         'PASSWORD': 'michelle',
         'HOST': 'localhost',
         'PORT': '5432',
+        # Connections come from a per-process psycopg pool (needs psycopg[pool]) and are
+        # handed back at the end of each request, so requests skip the connect and
+        # authentication round-trip. Pooling replaces persistent connections, so
+        # CONN_MAX_AGE stays 0. CONN_HEALTH_CHECKS makes the pool test a connection before
+        # lending it out. Size max_size for the threads one worker runs: workers x max_size
+        # (plus the replicas' pools) must stay below Postgres max_connections.
+        # `manage.py benchmark_connections` measures the difference.
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': 1,
+                'max_size': 4,
+                'max_lifetime': 30 * 60,  # recycle connections after 30 minutes
+                'max_idle': 5 * 60,  # close spare connections idle for 5 minutes
+                'timeout': 10,  # wait at most 10s for a free connection, then fail the request
+            },
+        },
     }
 }
 
+# Read replicas (roomify/routers.py). List replica aliases added to DATABASES in
+# DATABASE_REPLICAS, e.g.
+#   DATABASES['replica1'] = {**DATABASES['default'], 'HOST': 'replica1.internal',
+#                            'TEST': {'MIRROR': 'default'}}
+#   DATABASE_REPLICAS = ['replica1']
+# Only GET/HEAD requests to REPLICA_VIEWS read from a replica. After a POST the
+# client stays on the primary for REPLICA_PIN_SECONDS, which must be longer than
+# REPLICA_MAX_LAG_SECONDS. roomify/settings_replica.py simulates a replica locally.
+DATABASE_ROUTERS = ['roomify.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_VIEWS = ['home', 'browse_properties', 'property_detail', 'movers_list', 'mover_detail', 'mover_quotes']
+REPLICA_PIN_SECONDS = 10
+REPLICA_MAX_LAG_SECONDS = 5
+REPLICA_CHECK_SECONDS = 5
+
+
+# Email and password login first, then username (e.g. for the admin)
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -134,10 +198,86 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = str(BASE_DIR / 'media')
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50 MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5 MB, larger uploads stream to a temp file instead of RAM
 DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50 MB
 
+# Listing image derivatives (thumbnail + medium), see houses/imaging.py
+HOUSE_IMAGE_ASYNC = True  # generate on a background worker pool after upload
+HOUSE_IMAGE_WORKERS = 2
+
+# On-demand resizing at /media/resize/<w>x<h>/<path> (route /media/resize/ to Django in production)
+RESIZE_CACHE_DIR = str(BASE_DIR / 'var' / 'resize-cache')
+RESIZE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256 MB, least recently used renditions are evicted first
+RESIZE_SIZES = [(64, 64), (128, 128), (320, 240), (480, 360), (960, 720)]  # (width, height); anything else is a 404
+
+# Road graph for mover quotes, built with `manage.py build_road_graph <extract.osm> <output.json>`.
+# Unset, distances fall back to straight-line haversine (see movers/quotes.py).
+MOVER_ROAD_GRAPH = None
+
+# How long shared caches may keep anonymous home, browse and detail pages
+# (roomify/conditional.py); browsers revalidate with their ETag afterwards
+PUBLIC_PAGE_MAX_AGE = 60
+
+# Rendered listing and mover cards (roomify/fragments.py); 0 renders every card
+FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Shared by every worker process on the host, so invalidations (e.g. houses/stats.py) are seen by all of them.
+# Redis rather than files: add() and incr() are atomic across workers (the single-flight
+# locks in houses/listing_cache.py rely on that), and memory pressure evicts the least
+# recently used keys instead of a random third of the cache.
+CACHES = {
+    'default': {
+        # RedisCache that also counts hits and misses for /metrics
+        'BACKEND': 'roomify.metrics.CountingRedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/0',
+        'METRICS_NAME': 'default',
+    },
+    # Anonymous sessions live only here (roomify/sessions.py), so page fragments and
+    # results must never push them out: give this alias a Redis that doesn't evict
+    # (maxmemory-policy noeviction) and let sessions leave only by expiring.
+    'sessions': {
+        'BACKEND': 'roomify.metrics.CountingRedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+        'METRICS_NAME': 'sessions',
+    },
+}
+
+# Request instrumentation (roomify/instrumentation.py): share of requests whose
+# queries and template time are measured, when a request is logged as slow, and
+# how many runs of the same SQL in one request count as a probable N+1
+INSTRUMENTATION_SAMPLE_RATE = 1.0 if DEBUG else 0.05
+INSTRUMENTATION_SLOW_MS = 1000
+INSTRUMENTATION_DUPLICATE_QUERIES = 5
+INSTRUMENTATION_SERVER_TIMING = True
+
+# Prometheus metrics at /metrics (roomify/metrics.py). Every worker process
+# writes its totals to METRICS_DIR at most every METRICS_FLUSH_SECONDS and a
+# scrape adds them up, so the directory must be shared by all workers on the
+# host. Scrapes are allowed from staff users, or with
+# "Authorization: Bearer <METRICS_TOKEN>" when a token is set.
+# METRICS_ALLOWED_IPS matches REMOTE_ADDR, which is the proxy's address behind
+# nginx on the same host, so only list addresses that reach Django directly.
+METRICS_DIR = BASE_DIR / 'var' / 'metrics'
+METRICS_FLUSH_SECONDS = 10
+METRICS_STALE_SECONDS = 3600
+METRICS_ALLOWED_IPS = []
+METRICS_TOKEN = ''
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per sampled or slow request
+        'roomify.requests': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 # Email Configuration
+# Emails are queued in the notifications outbox and delivered by
+# `manage.py send_outbox --loop` (or send_outbox from cron), never inside a request.
 # For development (emails printed to console) - uncomment to test locally
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
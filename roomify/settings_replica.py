@@ -0,0 +1,26 @@
+"""
+Settings for trying the read-replica router on one machine.
+
+The 'replica' alias is a second connection to the same database, so
+routing, stickiness and fallback all behave as they would with a real
+replica:
+
+    DJANGO_SETTINGS_MODULE=roomify.settings_replica python manage.py runserver
+
+Browse pages then read through 'replica' (visible in the DB logs or the
+/metrics query counters), and a POST keeps the browser on 'default' for
+REPLICA_PIN_SECONDS. To see the fallback, point the replica's PORT at a
+closed port: requests keep working, reads go to the primary and a warning
+is logged on 'roomify.db'.
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    # Its own pool, like a real replica would have
+    'OPTIONS': {**DATABASES['default']['OPTIONS'], 'connect_timeout': 2},
+    # Tests use the default database through this alias instead of creating another one
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_REPLICAS = ['replica']
+REPLICA_CHECK_SECONDS = 2
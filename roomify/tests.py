@@ -0,0 +1,272 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from houses.inventory import reserve_units
+from houses.models import House
+
+from . import metrics, routers
+from .pagination import decode_cursor, encode_cursor, ordered_ids, paginate, paginate_ids
+from .routers import PIN_COOKIE, ReplicaMiddleware, ReplicaRouter
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-sessions'},
+}
+
+
+def make_house(landlord, **fields):
+    values = {
+        'title': 'Room',
+        'description': 'A room near campus',
+        'category': 'hostel',
+        'price': Decimal('5000.00'),
+        'location': 'Kahawa West',
+        'contact_phone': '0700000000',
+    }
+    values.update(fields)
+    return House.objects.create(landlord=landlord, **values)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        landlord = User.objects.create_user('landlord', password='x')
+        cls.houses = [make_house(landlord, title=f'House {index}') for index in range(7)]
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.queryset = House.objects.all()
+        self.expected = list(self.queryset.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def walk(self, fetch):
+        """Every page from the first to the last and back, as lists of pks"""
+        forward = [fetch({})]
+        while forward[-1].has_next:
+            forward.append(fetch({'cursor': forward[-1].next_cursor}))
+        backward = [forward[-1]]
+        while backward[-1].has_previous:
+            backward.append(fetch({'cursor': backward[-1].previous_cursor}))
+        return [[house.pk for house in page] for page in forward], [[house.pk for house in page] for page in backward]
+
+    def test_cursors_walk_every_row_once_in_both_directions(self):
+        forward, backward = self.walk(lambda params: paginate(self.factory.get('/', params), self.queryset, per_page=3))
+        self.assertEqual([pk for page in forward for pk in page], self.expected)
+        self.assertEqual([len(page) for page in forward], [3, 3, 1])
+        self.assertEqual(backward, list(reversed(forward)))
+
+    def test_paginate_ids_matches_paginate(self):
+        ids = ordered_ids(self.queryset, 100)
+        self.assertEqual(ids, self.expected)
+        from_ids = self.walk(lambda params: paginate_ids(self.factory.get('/', params), self.queryset, ids, len(ids), per_page=3))
+        from_db = self.walk(lambda params: paginate(self.factory.get('/', params), self.queryset, per_page=3))
+        self.assertEqual(from_ids, from_db)
+
+    def test_paginate_ids_falls_back_past_incomplete_ids(self):
+        ids = ordered_ids(self.queryset, 4)
+        request = self.factory.get('/', {'cursor': encode_cursor([None, ids[-1]], 'next')})
+        self.assertIsNone(paginate_ids(request, self.queryset, ids, 7, complete=False, per_page=3))
+
+    def test_garbled_cursor_starts_over(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        page = paginate(self.factory.get('/', {'cursor': encode_cursor(['yesterday', 'x'], 'next')}), self.queryset, per_page=3)
+        self.assertEqual([house.pk for house in page], self.expected[:3])
+        self.assertFalse(page.has_previous)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = User.objects.create_user('landlord', password='x')
+        cls.house = make_house(cls.landlord, total_units=4, available_units=4)
+
+    def assertRevalidates(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertIn('Cookie', first['Vary'])
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        return first['ETag']
+
+    def test_list_pages_answer_304_until_a_listing_changes(self):
+        for url in ('/', '/browse/'):
+            etag = self.assertRevalidates(url)
+            self.house.title = f'{self.house.title}!'
+            self.house.save()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_partial_reservation_changes_the_browse_etag(self):
+        etag = self.assertRevalidates('/browse/')
+        self.assertEqual(reserve_units(self.house.pk), 3)
+        self.assertEqual(self.client.get('/browse/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_property_page_honours_if_modified_since(self):
+        first = self.client.get(f'/property/{self.house.pk}/')
+        again = self.client.get(f'/property/{self.house.pk}/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_etag_depends_on_the_viewer(self):
+        anonymous = self.assertRevalidates('/')
+        self.client.force_login(self.landlord)
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=anonymous)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_pages_with_flash_messages_are_never_304(self):
+        etag = self.assertRevalidates('/')
+        self.client.cookies['messages'] = 'pending'
+        self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_property_is_404(self):
+        self.assertEqual(self.client.get('/property/999999/').status_code, 404)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_VIEWS=['browse_properties'], REPLICA_PIN_SECONDS=10)
+class ReplicaPinningTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+        patcher = mock.patch.object(routers, 'healthy_replicas', return_value=['replica'])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def serve(self, request, view_name, write=False):
+        """Run `request` through ReplicaMiddleware; returns (response, reads routed before and after any write)"""
+        reads = []
+        request.resolver_match = SimpleNamespace(view_name=view_name)
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            reads.append(self.router.db_for_read(House))
+            if write:
+                self.router.db_for_write(House)
+                reads.append(self.router.db_for_read(House))
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        return middleware(request), reads
+
+    def test_listed_views_read_from_a_replica(self):
+        response, reads = self.serve(self.factory.get('/browse/'), 'browse_properties')
+        self.assertEqual(reads, ['replica'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_other_views_read_from_the_primary(self):
+        _response, reads = self.serve(self.factory.get('/'), 'home')
+        self.assertEqual(reads, ['default'])
+
+    def test_post_pins_the_client_to_the_primary(self):
+        response, reads = self.serve(self.factory.post('/browse/'), 'browse_properties')
+        self.assertEqual(reads, ['default'])
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+
+        request = self.factory.get('/browse/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        _response, reads = self.serve(request, 'browse_properties')
+        self.assertEqual(reads, ['default'])
+
+    def test_a_write_moves_later_reads_to_the_primary_and_pins(self):
+        response, reads = self.serve(self.factory.get('/browse/'), 'browse_properties', write=True)
+        self.assertEqual(reads, ['replica', 'default'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_MAX_LAG_SECONDS=5)
+class ReplicaHealthTests(SimpleTestCase):
+    def setUp(self):
+        routers._health.clear()
+        self.addCleanup(routers._health.clear)
+
+    def test_lagging_replica_gets_no_reads(self):
+        with mock.patch.object(routers, 'replica_lag', return_value=60.0), self.assertLogs('roomify.db', 'WARNING'):
+            self.assertEqual(routers.healthy_replicas(), [])
+
+    def test_caught_up_replica_gets_reads(self):
+        with mock.patch.object(routers, 'replica_lag', return_value=0.5):
+            self.assertEqual(routers.healthy_replicas(), ['replica'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, METRICS_TOKEN='', METRICS_ALLOWED_IPS=[])
+class MetricsAccessTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = override_settings(METRICS_DIR=directory.name)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def test_local_requests_are_not_trusted_by_default(self):
+        # Behind nginx on the same host every request comes from 127.0.0.1
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+
+    def test_staff_and_token_holders_can_scrape(self):
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+
+@override_settings(METRICS_STALE_SECONDS=60)
+class MetricsCollectTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        patcher = override_settings(METRICS_DIR=self.directory)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        # A fresh file for this process, without what earlier tests recorded
+        process_patcher = mock.patch.object(metrics, '_process', metrics._Process())
+        process_patcher.start()
+        self.addCleanup(process_patcher.stop)
+        worker = subprocess.Popen([sys.executable, '-c', ''])
+        worker.wait()
+        self.exited_pid = worker.pid
+
+    def write_worker(self, pid, count, age=0):
+        path = self.directory / f'{pid}-{count}.json'
+        latency = [0] * (len(metrics.LATENCY_BUCKETS) + 2)
+        latency[0], latency[-1] = count, 0.5
+        path.write_text(json.dumps({'requests': [[['home', 'GET', '2xx'], count]], 'latency': [['home', latency]]}))
+        when = os.path.getmtime(path) - age
+        os.utime(path, (when, when))
+        return path
+
+    def home_requests(self):
+        totals, files = metrics.collect()
+        return totals['requests'].get(('home', 'GET', '2xx'), 0), files
+
+    def test_exited_workers_are_folded_into_the_retired_totals(self):
+        first = self.write_worker(self.exited_pid, 5, age=120)
+        self.write_worker(self.exited_pid, 3)
+        self.assertEqual(self.home_requests(), (8, 2))
+        self.assertFalse(first.exists())
+        self.assertTrue((self.directory / metrics.RETIRED_FILE).exists())
+
+        self.write_worker(self.exited_pid, 2, age=120)
+        self.assertEqual(self.home_requests(), (10, 2))
+        totals, _files = metrics.collect()
+        self.assertEqual((totals['latency']['home'][0], totals['latency']['home'][-1]), (10, 1.5))
+
+    def test_silent_workers_that_are_still_running_keep_their_files(self):
+        path = self.write_worker(os.getpid(), 4, age=120)
+        self.assertEqual(self.home_requests(), (4, 2))
+        self.assertTrue(path.exists())
@@ -19,8 +19,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from roomify.metrics import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('accounts/', include('accounts.urls')),
     path('booking/', include('booking.urls')),
     path('movers/', include('movers.urls')),